@@ -1,63 +1,84 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 import csv
 import asyncio
 import time
 import logging
+import threading
 from pathlib import Path
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
-import threading
+from driver_pool import DriverPool, chromedriver_path, start_chrome, take_preloaded
+from http_engine import HttpDayCloseEngine
+from cdp_engine import CdpDayCloseEngine
+from scheduler import RollingScheduler
+import waits
+from result_sink import ResultSink
+from session_cache import LOGIN_PATH, SessionCache
+from metrics import step_metrics
+from concurrency import AdaptiveConcurrency
+from progress import ProgressServer, ProgressTracker
+from history import HistoryStore
+import flows
+import log_pipeline
+from day_status import ALREADY_CLOSED_MESSAGE, CLOSED, DayStatusStore
+import retry
+import browser_profile
+import network_capture
+from network_capture import network_stats
+from watchdog import watchdog
+from browser_profile import session_resources
+from credentials import LoadStats, iter_credentials, route_by_tags
+from urllib.parse import urljoin
 
 # ============ CONFIGURABLE PARAMETERS ============
-CSV_FILE = "creds3.csv"  # CSV format: username,password
+CSV_FILE = "creds3.csv"  # CSV format: username,password ("123456 -- without otr" tags a user)
 RESULTS_DIR = "results"
 URL = "https://sandboxerp.shakti.org.bd:8072/Home/Login?ReturnUrl=%2F"
+HOME_URL = urljoin(URL, "/")
 
 LOOP_DURATION = 60  # Total duration in seconds to keep looping (60 Seconds)
+HARD_DEADLINE = False  # Only start attempts expected to finish inside the window; stop in-flight ones at its end
+CUTOFF_TIME = None  # "HH:MM" end-of-day cutoff; the window ends there if that comes before LOOP_DURATION
+CUTOFF_GRACE = 5  # Seconds in-flight attempts get after the deadline before they are marked as cut off
 CONCURRENCY = 10  # Number of concurrent browser sessions
-DELAY_BETWEEN_LOOPS = 0.5  # Delay between each complete loop cycle
+ADAPTIVE_CONCURRENCY = False  # Let an AIMD controller move concurrency within the bounds below
+CONCURRENCY_MIN = 2
+CONCURRENCY_MAX = 20
+COMPLETION_TIMEOUT = 30  # Max seconds to wait for the ERP to acknowledge the close
+ENGINE = "selenium"  # "selenium" (headless Chrome), "http" (browserless, ERP routes unverified) or "cdp" (DevTools, no chromedriver)
+CDP_BROWSERS = 2  # Chrome processes shared by all sessions in the "cdp" engine (one browser context per attempt)
+SESSION_DEADLINE = 240  # Seconds a checked-out browser may stay busy before the watchdog kills it (None: never)
+RESULTS_FORMAT = "csv"  # Detailed per-attempt results streamed to disk: "csv" or "jsonl"
+RETRY_FAILURES = True  # Requeue timeouts/crashes/unacknowledged closes with exponential backoff (retry.py)
+CIRCUIT_BREAKER = True  # Pause new attempts while the ERP is failing, then probe with one session
+SKIP_CLOSED_USERS = True  # Only touch users whose day is not closed yet (results/day_status.db)
+BUSINESS_DATE = None  # "YYYY-MM-DD" for the day being closed; None means today
+WARM_UP = True  # Start CONCURRENCY browsers on the login page before the LOOP_DURATION clock starts
+PROGRESS_PORT = 8765  # Live progress page on http://127.0.0.1:8765/ while the loop runs; None to disable
+QUIET_CONSOLE = False  # Only warnings and errors on the console; the log files still get everything
+JSON_LOGS = True  # Also write results/day_close_loop_*.jsonl with user/loop/attempt/step fields
+RECORD_HISTORY = True  # Add every finished run to results/history.db for `python history.py report`
+NETWORK_CAPTURE = False  # Log every ERP request per step from Chrome's performance log; HARs of the slowest sessions
+HAR_SLOWEST = 5  # Slowest sessions exported as .har files when NETWORK_CAPTURE is on
+LEAN_PROFILE = True  # Block images/fonts/media/third-party hosts, smaller window, no background services
+TAG_ROUTES = {}  # Tag → sessions on a separate driver pool, e.g. {"without otr": 2}; untagged users get CONCURRENCY
 
 # ---------------- LOGGING ----------------
 def setup_logging():
-    """Configure logging with file and console output."""
-    log_dir = Path(RESULTS_DIR)
-    log_dir.mkdir(exist_ok=True)
-    log_file = log_dir / f"day_close_loop_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
-        handlers=[logging.FileHandler(log_file), logging.StreamHandler()]
-    )
+    """Send every log record through a queue to the text log, a JSONL log and the console."""
+    log_pipeline.setup(RESULTS_DIR, f"day_close_loop_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+                       quiet=QUIET_CONSOLE, jsonl=JSON_LOGS)
     return logging.getLogger(__name__)
 
 logger = setup_logging()
 
 # ---------------- UTILS ----------------
 def load_credentials(csv_file):
-    """Load credentials from CSV file."""
-    credentials = []
-    try:
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for i, row in enumerate(reader):
-                username = (row.get("username") or row.get("user") or 
-                           row.get("id") or row.get("email"))
-                password = (row.get("password") or row.get("pass") or 
-                           row.get("pwd"))
-                if username and password:
-                    credentials.append({
-                        'username': username.strip(),
-                        'password': password.strip()
-                    })
-                else:
-                    logger.warning(f"Row {i+1} missing username or password")
-        logger.info(f"✅ Loaded {len(credentials)} credentials from {csv_file}")
-        return credentials
-    except FileNotFoundError:
+    """Stream credentials from a CSV file (see ``credentials.iter_credentials``).
+    
+    Rows are read as the scheduler asks for them; ``credential_stats`` holds the
+    row counts once the file has been read to the end.
+    """
+    if not Path(csv_file).exists():
         logger.error(f"❌ CSV file not found: {csv_file}")
         logger.info("Creating sample CSV file...")
         with open(csv_file, 'w', newline='') as file:
@@ -66,35 +87,13 @@ def load_credentials(csv_file):
             writer.writerow(['05158', '123456'])
             writer.writerow(['05159', '123456'])
         logger.info(f"✅ Sample {csv_file} created. Please edit with your credentials.")
-        return []
-    except Exception as e:
-        logger.error(f"❌ Error reading CSV: {e}")
-        return []
+        return None
+    return iter_credentials(csv_file, credential_stats)
 
-def write_summary(all_results, elapsed, loop_count):
-    """Write summary statistics to CSV."""
+def write_summary(user_stats, elapsed, loop_count, tag=""):
+    """Write per-user summary statistics (as counted by the result sink) to CSV."""
     Path(RESULTS_DIR).mkdir(exist_ok=True)
-    summary_file = f"{RESULTS_DIR}/day_close_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    
-    # Aggregate results by username
-    user_stats = {}
-    for result in all_results:
-        username = result['username']
-        if username not in user_stats:
-            user_stats[username] = {
-                'username': username,
-                'total_attempts': 0,
-                'successes': 0,
-                'failures': 0,
-                'errors': 0
-            }
-        user_stats[username]['total_attempts'] += 1
-        if result['status'] == 'success':
-            user_stats[username]['successes'] += 1
-        elif result['status'] == 'failure':
-            user_stats[username]['failures'] += 1
-        else:
-            user_stats[username]['errors'] += 1
+    summary_file = f"{RESULTS_DIR}/day_close_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}{tag}.csv"
     
     # Write summary
     fieldnames = ['username', 'total_attempts', 'successes', 'failures', 'errors', 'success_rate']
@@ -103,6 +102,7 @@ def write_summary(all_results, elapsed, loop_count):
             writer = csv.DictWriter(f, fieldnames=fieldnames)
             writer.writeheader()
             for stats in user_stats.values():
+                stats = dict(stats)
                 stats['success_rate'] = f"{stats['successes']/stats['total_attempts']*100:.1f}%"
                 writer.writerow(stats)
         logger.info(f"📊 Summary written to {summary_file}")
@@ -111,255 +111,459 @@ def write_summary(all_results, elapsed, loop_count):
     
     return summary_file
 
+# ---------------- DRIVER ----------------
+def create_driver():
+    """Launch a headless Chrome; only called by the pool on a cold start."""
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--incognito")
+    options.add_argument("--disable-blink-features=AutomationControlled")
+    options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    options.add_experimental_option('useAutomationExtension', False)
+    options.add_argument("--log-level=3")  # Suppress browser logs
+    if LEAN_PROFILE:
+        browser_profile.apply_lean_options(options)
+    else:
+        options.add_argument("--window-size=1920,1080")
+    if NETWORK_CAPTURE:
+        network_capture.enable_performance_log(options)
+    driver = start_chrome(options)
+    if LEAN_PROFILE:
+        browser_profile.block_resources(driver)
+    return driver
+
+# Warm drivers are reused across attempts and loops instead of relaunching Chrome.
+# No logout_url on purpose: the reset clears cookies and storage but leaves the ERP
+# session open, because session_cache restores those cookies on the user's next pass.
+driver_pool = DriverPool(create_driver, size=CONCURRENCY_MAX if ADAPTIVE_CONCURRENCY else CONCURRENCY)
+
+# Users carrying a routed tag run on their own pool, capped at that pool's size
+tag_pools = {tag: DriverPool(create_driver, size=size) for tag, size in TAG_ROUTES.items()}
+user_routes = {}  # username → routed tag, filled in as the scheduler reads users
+credential_stats = LoadStats()
+
+def route_user(cred, _route=route_by_tags(TAG_ROUTES)):
+    """Scheduler lane for a user; remembers it so the attempt checks out from the right pool."""
+    tag = _route(cred)
+    if tag is not None:
+        user_routes[cred['username']] = tag
+    return tag
+
+def pool_for(username):
+    return tag_pools.get(user_routes.get(username), driver_pool)
+
+# Browserless engine; its event loop and connection pool start on first use
+http_engine = HttpDayCloseEngine(URL, limit=CONCURRENCY_MAX if ADAPTIVE_CONCURRENCY else CONCURRENCY)
+
+# DevTools engine; its Chrome processes start on first use (or in the warm-up)
+cdp_engine = CdpDayCloseEngine(URL, browsers=CDP_BROWSERS,
+                               limit=CONCURRENCY_MAX if ADAPTIVE_CONCURRENCY else CONCURRENCY,
+                               lean=LEAN_PROFILE, completion_timeout=COMPLETION_TIMEOUT)
+
+# Auth cookies per user, so later loops skip the login form
+session_cache = SessionCache()
+
+network_stats.keep_slowest = HAR_SLOWEST
+
+# Set by the scheduler at a hard deadline; attempts check it before starting the close
+run_cutoff = threading.Event()
+
 # ---------------- DAY CLOSE PROCESS ----------------
-def process_day_close(username, password, loop_num, attempt_num, semaphore):
+def check_in(pool, driver, steps, username, loop_num, attempt_num, broken=False, tail_step=None):
+    """Return the driver to its pool; with NETWORK_CAPTURE, first collect this attempt's requests."""
+    if NETWORK_CAPTURE:
+        network_stats.record(username, loop_num, attempt_num, network_capture.drain(driver), steps.windows,
+                             time.time() - steps.started, tail_step or network_capture.UNFINISHED_STEP)
+    pool.checkin(driver, broken=broken)
+
+def process_day_close(username, password, loop_num, attempt_num, mode=None):
     """Process day close for a single credential."""
-    with semaphore:  # Control concurrency
-        try:
-            timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-            logger.info(f"[Loop {loop_num}] Attempt {attempt_num} | Starting for user: {username}")
-            
-            # Setup headless browser
-            options = Options()
-            options.add_argument("--headless")
-            options.add_argument("--no-sandbox")
-            options.add_argument("--disable-dev-shm-usage")
-            options.add_argument("--disable-gpu")
-            options.add_argument("--window-size=1920,1080")
-            options.add_argument("--incognito")
-            options.add_argument("--disable-blink-features=AutomationControlled")
-            options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            options.add_experimental_option('useAutomationExtension', False)
-            options.add_argument("--log-level=3")  # Suppress browser logs
-            
-            driver = webdriver.Chrome(options=options)
-            wait = WebDriverWait(driver, 20)
-            
+    mode = mode or ENGINE
+    driver = None
+    steps = step_metrics.timer(username, loop_num, windows=[] if NETWORK_CAPTURE else None)
+    try:
+        timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+        log_fields = log_pipeline.fields(username, loop_num, attempt_num)
+        logger.info("[Loop %s] Attempt %s | Starting for user: %s", loop_num, attempt_num, username, extra=log_fields)
+        
+        if mode == "http":
+            status, message = http_engine.day_close(username, password)
+            steps.lap("http_day_close")
+            icon = "✅" if status == "success" else "❌"
+            logger.info("[Loop %s] %s Attempt %s | User %s: %s - %s", loop_num, icon, attempt_num, username,
+                        status.upper(), message, extra=log_fields)
+            return {
+                "loop": loop_num,
+                "attempt": attempt_num,
+                "username": username,
+                "status": status,
+                "timestamp": timestamp,
+                "message": message
+            }
+        
+        if mode == "cdp":
+            status, message, reason, timings = cdp_engine.day_close(username, password, run_cutoff)
+            steps.extend(timings)
+            icon = "✅" if status == "success" else "❌"
+            logger.info("[Loop %s] %s Attempt %s | User %s: %s - %s", loop_num, icon, attempt_num, username,
+                        status.upper(), message, extra=log_fields)
+            result = {
+                "loop": loop_num,
+                "attempt": attempt_num,
+                "username": username,
+                "status": status,
+                "timestamp": timestamp,
+                "message": message
+            }
+            if reason:
+                result["reason"] = reason
+            return result
+        
+        pool = pool_for(username)
+        driver = pool.checkout(owner=username)
+        if NETWORK_CAPTURE:
+            network_capture.drain(driver)  # Drop the previous attempt's reset and any warm-up page load
+        steps.lap("driver_start")
+        
+        if not take_preloaded(driver, URL):  # Pre-warmed drivers are already on the login page
             driver.get(URL)
-            
-            # ---------------- LOGIN ----------------
-            wait.until(EC.presence_of_element_located((By.ID, "emailaddress"))).send_keys(username)
-            wait.until(EC.presence_of_element_located((By.ID, "password"))).send_keys(password)
-            
-            login_button = wait.until(
-                EC.element_to_be_clickable((By.XPATH, "/html/body/section/div[2]/div/div/div/form/div[5]/button"))
-            )
-            login_button.click()
-            
-            # ---------------- HANDLE OPTIONAL MODAL ----------------
-            try:
-                modal_button = WebDriverWait(driver, 3).until(
-                    EC.element_to_be_clickable((By.XPATH, '//*[@id="responseModal"]/div/div/div[3]/button'))
-                )
-                modal_button.click()
-            except:
-                pass
-            
-            # ---------------- NAVIGATE TO DAY CLOSE ----------------
-            # Click MIS
-            wait.until(EC.element_to_be_clickable(
-                (By.XPATH, '//*[@id="homePage"]/div[1]/div/div[1]/div[7]/a/div'))
-            ).click()
-            
-            # Wait for Day Open/Close menu container
-            wait.until(EC.visibility_of_element_located(
-                (By.XPATH, '/html/body/div[1]/div[3]/div[1]/div/div/div/div[2]/div/div[2]/div/ul')
-            ))
-            
-            # Click Day Open/Close
-            day_open_close_btn = wait.until(
-                EC.element_to_be_clickable(
-                    (By.XPATH, '/html/body/div[1]/div[3]/div[1]/div/div/div/div[2]/div/div[2]/div/ul/li[1]/a')
-                )
-            )
-            day_open_close_btn.click()
-            
-            # Click Day Close button
-            day_close_btn = wait.until(
-                EC.element_to_be_clickable(
-                    (By.XPATH, '/html/body/div[1]/div[3]/div[1]/div[1]/div/div/div[3]/div/button')
-                )
-            )
-            day_close_btn.click()
-            
-            # Click Yes to confirm Day Close (WAIT UNTIL THIS COMPLETES)
-            yes_button = wait.until(
-                EC.element_to_be_clickable(
-                    (By.XPATH, '/html/body/div[1]/div[3]/div[1]/div[5]/div/div/div[3]/button[2]')
-                )
-            )
-            yes_button.click()
-            
-            # Wait for operation to complete
-            time.sleep(3)
-            
-            logger.info(f"[Loop {loop_num}] ✅ Attempt {attempt_num} | User {username}: SUCCESS")
-            
-            driver.quit()
-            
+        steps.lap("page_load")
+        session_resources.sample(driver)
+        steps.skip()
+        
+        # ---------------- REUSE CACHED SESSION ----------------
+        restored = session_cache.restore(driver, username, HOME_URL)
+        if restored:
+            steps.lap("session_restore")
+        
+        if not restored:
+            # ---------------- LOGIN (fill, submit, optional modal) ----------------
+            login = flows.flow_engine.run(driver, flows.LOGIN_FLOW,
+                                          {"username": username, "password": password}, name="login")
+            steps.extend(login.timings)
+            session_cache.save(driver, username)
+        
+        if run_cutoff.is_set():
+            logger.warning("[Loop %s] ⏰ Attempt %s | User %s: deadline reached, close not started",
+                           loop_num, attempt_num, username, extra=log_fields)
+            check_in(pool, driver, steps, username, loop_num, attempt_num)
+            return {
+                "loop": loop_num,
+                "attempt": attempt_num,
+                "username": username,
+                "status": "error",
+                "timestamp": timestamp,
+                "message": "Run deadline reached before the close",
+                "reason": retry.CUTOFF
+            }
+        
+        # ---------------- DAY CLOSE (MIS → Day Open/Close → Close → Yes → acknowledged) ----------------
+        day_close = flows.flow_engine.run(driver, flows.DAY_CLOSE_FLOW, name="day_close",
+                                          timeouts={"verification": COMPLETION_TIMEOUT})
+        steps.extend(day_close.timings)
+        if day_close.stopped == "close_click":
+            logger.info("[Loop %s] ✅ Attempt %s | User %s: %s", loop_num, attempt_num, username,
+                        ALREADY_CLOSED_MESSAGE, extra=dict(log_fields, step=day_close.stopped))
+            check_in(pool, driver, steps, username, loop_num, attempt_num)
             return {
                 "loop": loop_num,
                 "attempt": attempt_num,
                 "username": username,
                 "status": "success",
                 "timestamp": timestamp,
-                "message": "Day close completed"
+                "message": ALREADY_CLOSED_MESSAGE
             }
-            
-        except Exception as e:
-            logger.error(f"[Loop {loop_num}] ❌ Attempt {attempt_num} | User {username}: ERROR - {str(e)}")
-            try:
-                driver.quit()
-            except:
-                pass
-            
+        confirmed = day_close.ok
+        if not confirmed:
+            logger.warning("[Loop %s] ⚠️  Attempt %s | User %s: close not acknowledged",
+                           loop_num, attempt_num, username, extra=dict(log_fields, step=day_close.failed_step))
+            check_in(pool, driver, steps, username, loop_num, attempt_num)
             return {
                 "loop": loop_num,
                 "attempt": attempt_num,
                 "username": username,
-                "status": "error",
-                "timestamp": datetime.now().strftime("%H:%M:%S.%f")[:-3],
-                "message": str(e)
+                "status": "failure",
+                "timestamp": timestamp,
+                "message": f"Day close not acknowledged within {COMPLETION_TIMEOUT}s",
+                "reason": retry.NOT_ACKNOWLEDGED
             }
-
-# ---------------- BATCH EXECUTION ----------------
-def run_single_batch(creds, loop_num, semaphore):
-    """Run one complete batch of all credentials concurrently."""
-    results = []
-    with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
-        futures = [
-            executor.submit(process_day_close, cred['username'], cred['password'], loop_num, i, semaphore)
-            for i, cred in enumerate(creds, 1)
-        ]
         
-        for future in futures:
+        logger.info("[Loop %s] ✅ Attempt %s | User %s: SUCCESS", loop_num, attempt_num, username, extra=log_fields)
+        
+        check_in(pool, driver, steps, username, loop_num, attempt_num)
+        
+        return {
+            "loop": loop_num,
+            "attempt": attempt_num,
+            "username": username,
+            "status": "success",
+            "timestamp": timestamp,
+            "message": "Day close completed"
+        }
+        
+    except Exception as e:
+        logger.error("[Loop %s] ❌ Attempt %s | User %s: ERROR - %s", loop_num, attempt_num, username, e,
+                     extra=log_pipeline.fields(username, loop_num, attempt_num, getattr(e, "step", None)))
+        session_cache.invalidate(username)
+        reason = retry.reason_for_exception(e)
+        if isinstance(e, flows.FlowTimeout) and e.step == "homepage":
             try:
-                result = future.result()
-                results.append(result)
-            except Exception as e:
-                logger.error(f"Thread exception: {e}")
-                results.append({
-                    "loop": loop_num,
-                    "attempt": 0,
-                    "username": "unknown",
-                    "status": "error",
-                    "timestamp": datetime.now().strftime("%H:%M:%S.%f")[:-3],
-                    "message": str(e)
-                })
-    
-    return results
+                if LOGIN_PATH.lower() in driver.current_url.lower():
+                    reason = retry.LOGIN_REJECTED  # Still on the login form after submitting it
+            except Exception:
+                pass
+        if driver is not None and watchdog.killed(driver):
+            reason = retry.DRIVER_CRASH  # Killed by the watchdog after SESSION_DEADLINE, whatever error it surfaced as
+        if driver is not None:
+            check_in(pool, driver, steps, username, loop_num, attempt_num, broken=True,
+                     tail_step=getattr(e, "step", None))
+        
+        return {
+            "loop": loop_num,
+            "attempt": attempt_num,
+            "username": username,
+            "status": "error",
+            "timestamp": datetime.now().strftime("%H:%M:%S.%f")[:-3],
+            "message": str(e),
+            "reason": reason
+        }
+
+# ---------------- WARM-UP ----------------
+def warm_up(count):
+    """Resolve chromedriver once and park ``count`` browsers (plus every tag pool) on the login page.
+
+    Runs before the timed window, so the first attempts start on a loaded page.
+    """
+    start = time.perf_counter()
+    chromedriver_path()
+    warmed = driver_pool.warm_up(count, URL)
+    for pool in tag_pools.values():
+        warmed += pool.warm_up(url=URL)
+    logger.info(f"🌅 Warm-up: {warmed} browsers on the login page in {time.perf_counter() - start:.2f}s "
+                f"(not counted in the run window)")
+
+def seconds_until_cutoff():
+    """Seconds from now until today's CUTOFF_TIME (0 if it has passed)."""
+    hour, minute = map(int, CUTOFF_TIME.split(":"))
+    now = datetime.now()
+    return max(0.0, (now.replace(hour=hour, minute=minute, second=0, microsecond=0) - now).total_seconds())
 
 # ---------------- CONTINUOUS LOOP ----------------
-def continuous_loop(creds, duration):
-    """Continuously loop through credentials for specified duration."""
-    start_time = time.time()
-    end_time = start_time + duration
-    all_results = []
-    loop_count = 0
+def continuous_loop(creds, duration, sink, day_status=None):
+    """Continuously cycle through credentials for the specified duration.
+    
+    With a ``day_status`` store, every result is recorded there and users whose
+    day is already closed are skipped.
+    """
+    controller = None
+    if ADAPTIVE_CONCURRENCY:
+        controller = AdaptiveConcurrency(CONCURRENCY_MIN, CONCURRENCY_MAX, initial=CONCURRENCY)
+    tracker = ProgressTracker() if PROGRESS_PORT else None
     
-    # Semaphore to control concurrency
-    semaphore = threading.Semaphore(CONCURRENCY)
+    def on_result(result):
+        sink.add(result)
+        if day_status is not None:
+            day_status.record_result(result)
+        if tracker is not None:
+            tracker.record(result)
+    skip = day_status.is_closed if day_status is not None else None
+    retry_queue = retry.RetryQueue() if RETRY_FAILURES else None
+    breaker = retry.CircuitBreaker() if CIRCUIT_BREAKER else None
+    route_limits = {None: CONCURRENCY, **TAG_ROUTES} if TAG_ROUTES else None
+    run_cutoff.clear()
+    scheduler = RollingScheduler(CONCURRENCY + sum(TAG_ROUTES.values()), on_result=on_result,
+                                 controller=controller, skip=skip, retry=retry_queue, breaker=breaker,
+                                 route=route_user if TAG_ROUTES else None, route_limits=route_limits,
+                                 deadline_aware=HARD_DEADLINE or bool(CUTOFF_TIME), cutoff=run_cutoff,
+                                 grace=CUTOFF_GRACE)
+    
+    if WARM_UP and ENGINE == "selenium":
+        warm_up(controller.limit if controller is not None else CONCURRENCY)
+    if WARM_UP and ENGINE == "cdp":
+        cdp_engine.start()  # Launch the shared Chrome processes before the window
+    if CUTOFF_TIME:
+        duration = min(duration, seconds_until_cutoff())
+        logger.info(f"⏰ Cutoff at {CUTOFF_TIME}: window is {duration:.0f}s")
     
     logger.info(f"🚀 Starting continuous day close loop for {duration} seconds...")
-    logger.info(f"📋 Credentials: {len(creds)}, Concurrency: {CONCURRENCY}")
+    logger.info(f"📋 Credentials: {len(creds) if hasattr(creds, '__len__') else 'streamed'}, "
+                f"Concurrency: {CONCURRENCY}" + "".join(f", {tag}: {n}" for tag, n in TAG_ROUTES.items()))
     logger.info("=" * 70)
     
-    while time.time() < end_time:
-        loop_count += 1
-        remaining = end_time - time.time()
-        
-        if remaining <= 0:
-            break
-        
-        logger.info(f"[Loop {loop_count}] 🔄 Starting batch (Time remaining: {remaining:.1f}s)...")
-        
-        # Run one complete batch
-        batch_results = run_single_batch(creds, loop_count, semaphore)
-        all_results.extend(batch_results)
-        
-        # Count successes in this batch
-        batch_successes = sum(1 for r in batch_results if r['status'] == 'success')
-        logger.info(f"[Loop {loop_count}] ✅ Completed: {batch_successes}/{len(creds)} successful")
-        
-        # Small delay before next loop (if time permits)
-        remaining = end_time - time.time()
-        if remaining > DELAY_BETWEEN_LOOPS:
-            time.sleep(DELAY_BETWEEN_LOOPS)
-    
-    total_elapsed = time.time() - start_time
+    progress_server = None
+    if tracker is not None:
+        tracker.start(scheduler, duration)
+        try:
+            progress_server = ProgressServer(tracker, PROGRESS_PORT).start()
+            logger.info(f"📡 Live progress: {progress_server.url}")
+        except OSError as e:
+            logger.warning(f"⚠️  Progress page not started on port {PROGRESS_PORT}: {e}")
+    try:
+        scheduler.run(creds, process_day_close, duration)
+    finally:
+        if progress_server is not None:
+            progress_server.stop()
+    total_elapsed = scheduler.elapsed
+    loop_count = scheduler.loop_count
     
     logger.info("=" * 70)
     logger.info(f"🏁 Loop completed: {loop_count} iterations in {total_elapsed:.2f}s")
+    logger.info(f"🎛️  Slot utilization: {scheduler.utilization()*100:.1f}% of {scheduler.concurrency} slots")
+    if scheduler.deadline_aware:
+        logger.info(f"⏰ Deadline: {len(scheduler.held_back)} users held back as they would overrun, "
+                    f"{len(scheduler.cut_off)} attempts cut off ({len(scheduler.late_successes)} closed late anyway), "
+                    f"ended {scheduler.overrun:+.2f}s from the deadline")
+    logger.info(f"👥 Users read: {len(scheduler.creds)}, skipped as done: {len(scheduler.skipped)}")
+    if controller is not None:
+        logger.info(f"🎚️  Concurrency changes: {len(controller.changes)}, final level {controller.limit}")
+    if retry_queue is not None:
+        logger.info(retry_queue.summary())
+    if breaker is not None:
+        logger.info(breaker.summary())
+    for line in waits.wait_stats.summary().splitlines():
+        logger.info(line)
+    for line in step_metrics.summary().splitlines():
+        logger.info(line)
+    for line in flows.flow_stats.summary().splitlines():
+        logger.info(line)
+    if session_resources.page_load.count:
+        for line in session_resources.summary().splitlines():
+            logger.info(line)
+    if network_stats.sessions:
+        for line in network_stats.summary().splitlines():
+            logger.info(line)
+    if watchdog.sessions or watchdog.finished:
+        for line in watchdog.summary().splitlines():
+            logger.info(line)
     
-    return all_results, total_elapsed, loop_count
+    return total_elapsed, loop_count
 
-# ---------------- MAIN ----------------
-def main():
-    logger.info("=" * 70)
-    logger.info("CONTINUOUS DAY CLOSE LOOP AUTOMATION")
+# ---------------- REPORTING ----------------
+def log_final_results(sink, elapsed, loop_count):
+    """Log rate and status breakdown from a result sink's counters; False if nothing ran."""
+    total_attempts = sink.total
+    if not total_attempts:
+        logger.warning("⚠️  No attempts completed")
+        return False
+    
     logger.info("=" * 70)
-    logger.info(f"🎯 Target: {URL}")
-    logger.info(f"⏱️  Loop Duration: {LOOP_DURATION} seconds")
-    logger.info(f"🔢 Concurrency: {CONCURRENCY}")
-    logger.info(f"⏳ Delay Between Loops: {DELAY_BETWEEN_LOOPS}s")
+    logger.info("📊 FINAL RESULTS")
     logger.info("=" * 70)
+    startup = sum(pool.warmup_seconds for pool in (driver_pool, *tag_pools.values())) + cdp_engine.launch_seconds
+    if startup:
+        logger.info(f"🌅 Startup: {startup:.2f}s before the window (browser launch + login page)")
+    logger.info(f"⏱️  Duration: {elapsed:.2f}s")
+    logger.info(f"🔁 Total Loops: {loop_count}")
+    logger.info(f"📝 Total Attempts: {total_attempts}")
+    logger.info(f"⚡ Rate: {total_attempts/elapsed:.2f} attempts/second")
+    logger.info("")
+    logger.info(f"✅ Successes: {sink.counts['success']} ({sink.counts['success']/total_attempts*100:.1f}%)")
+    logger.info(f"❌ Failures: {sink.counts['failure']} ({sink.counts['failure']/total_attempts*100:.1f}%)")
+    logger.info(f"⚠️  Errors: {sink.counts['error']} ({sink.counts['error']/total_attempts*100:.1f}%)")
+    return True
+
+# ---------------- RUN ----------------
+def run(creds, tag=""):
+    """Run the continuous loop over ``creds`` and write every report; ``tag`` suffixes the file names.
     
-    creds = load_credentials(CSV_FILE)
-    if not creds:
-        logger.error(f"❌ No valid credentials found in {CSV_FILE}")
-        return
-    
-    logger.info(f"📊 Loaded {len(creds)} credential pairs")
-    estimated_loops = int(LOOP_DURATION / (len(creds) * 5 + DELAY_BETWEEN_LOOPS))  # ~5s per operation
-    logger.info(f"📈 Estimated loops: ~{estimated_loops}")
-    logger.info(f"📌 Estimated total attempts: ~{estimated_loops * len(creds)}")
-    logger.info("=" * 70)
+    Returns ``(sink, elapsed, loop_count)``, or None if the run was interrupted.
+    """
+    run_stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    sink = ResultSink(f"{RESULTS_DIR}/day_close_detailed_{run_stamp}{tag}.{RESULTS_FORMAT}", fmt=RESULTS_FORMAT)
+    logger.info(f"📄 Streaming detailed results to {sink.path}")
+    day_status = None
+    if SKIP_CLOSED_USERS:
+        day_status = DayStatusStore(f"{RESULTS_DIR}/day_status.db", BUSINESS_DATE)
+        logger.info(f"🗓️  {day_status.counts().get(CLOSED, 0)} users already closed for "
+                    f"{day_status.business_date}; they are skipped as they are read")
     
     try:
-        all_results, elapsed, loop_count = continuous_loop(creds, LOOP_DURATION)
+        elapsed, loop_count = continuous_loop(creds, LOOP_DURATION, sink, day_status)
     except KeyboardInterrupt:
         logger.warning("\n⚠️  Test interrupted by user")
-        return
+        return None
     except Exception as e:
         logger.error(f"❌ Unexpected error: {e}", exc_info=True)
-        return
+        return None
+    finally:
+        sink.close()
+        driver_pool.close()
+        for pool in tag_pools.values():
+            pool.close()
+        http_engine.close()
+        cdp_engine.close()
+        if ENGINE == "selenium":
+            logger.info(driver_pool.summary())
+            for tag, pool in tag_pools.items():
+                logger.info(f"[{tag}] {pool.summary()}")
+        if credential_stats.rows:
+            logger.info(credential_stats.summary())
+        logger.info(session_cache.summary())
+        if day_status is not None:
+            logger.info(day_status.summary())
+            day_status.close()
     
-    # Calculate statistics
-    total_attempts = len(all_results)
-    successes = [r for r in all_results if r['status'] == 'success']
-    failures = [r for r in all_results if r['status'] == 'failure']
-    errors = [r for r in all_results if r['status'] == 'error']
+    if not log_final_results(sink, elapsed, loop_count):
+        return sink, elapsed, loop_count
     
+    # Write per-user summary
+    write_summary(sink.user_stats, elapsed, loop_count, tag)
+    
+    # Export per-step latency histograms (overall, per user, per loop)
+    step_metrics.write_json(f"{RESULTS_DIR}/day_close_metrics_{run_stamp}{tag}.json")
+    step_metrics.write_prometheus(f"{RESULTS_DIR}/day_close_metrics_{run_stamp}{tag}.prom")
+    logger.info(f"📈 Step metrics: {RESULTS_DIR}/day_close_metrics_{run_stamp}{tag}.json (.prom for Prometheus)")
+    
+    if network_stats.sessions:
+        network_stats.write_json(f"{RESULTS_DIR}/day_close_network_{run_stamp}{tag}.json")
+        hars = network_stats.write_har(RESULTS_DIR, f"day_close_slowest_{run_stamp}{tag}")
+        logger.info(f"🌐 Network timings: {RESULTS_DIR}/day_close_network_{run_stamp}{tag}.json, "
+                    f"{len(hars)} HARs of the slowest sessions ({RESULTS_DIR}/day_close_slowest_{run_stamp}{tag}_*.har)")
+        network_stats.reset()
+    
+    if RECORD_HISTORY:
+        history = HistoryStore(f"{RESULTS_DIR}/history.db")
+        history.ingest_run(sink.path, f"{run_stamp}{tag}", f"{RESULTS_DIR}/day_close_metrics_{run_stamp}{tag}.json", elapsed)
+        history.close()
+        logger.info(f"📚 Added to run history: {RESULTS_DIR}/history.db (python history.py report)")
+    
+    logger.info(f"📄 Detailed results: {sink.path}")
     logger.info("=" * 70)
-    logger.info("📊 FINAL RESULTS")
+    logger.info("📊 Check the summary file for per-user statistics")
+    logger.info("=" * 70)
+    return sink, elapsed, loop_count
+
+# ---------------- MAIN ----------------
+def install_watchdog():
+    """Per-process setup every run needs first, whether started by main() or as a shard worker."""
+    watchdog.deadline = SESSION_DEADLINE
+    watchdog.install()  # Kill our browsers on SIGTERM/SIGHUP too, and any left behind by a killed earlier run
+
+
+def main():
+    logger.info("=" * 70)
+    logger.info("CONTINUOUS DAY CLOSE LOOP AUTOMATION")
+    logger.info("=" * 70)
+    logger.info(f"🎯 Target: {URL}")
+    logger.info(f"⏱️  Loop Duration: {LOOP_DURATION} seconds")
+    logger.info(f"🔢 Concurrency: {CONCURRENCY}" + (
+        f" (adaptive {CONCURRENCY_MIN}-{CONCURRENCY_MAX})" if ADAPTIVE_CONCURRENCY else ""))
+    logger.info(f"🧭 Engine: {ENGINE}")
     logger.info("=" * 70)
-    logger.info(f"⏱️  Duration: {elapsed:.2f}s")
-    logger.info(f"🔁 Total Loops: {loop_count}")
-    logger.info(f"📝 Total Attempts: {total_attempts}")
-    logger.info(f"⚡ Rate: {total_attempts/elapsed:.2f} attempts/second")
-    logger.info("")
-    logger.info(f"✅ Successes: {len(successes)} ({len(successes)/total_attempts*100:.1f}%)")
-    logger.info(f"❌ Failures: {len(failures)} ({len(failures)/total_attempts*100:.1f}%)")
-    logger.info(f"⚠️  Errors: {len(errors)} ({len(errors)/total_attempts*100:.1f}%)")
     
-    # Write detailed summary
-    summary_file = write_summary(all_results, elapsed, loop_count)
+    install_watchdog()
     
-    # Write detailed results
-    ''' detailed_file = f"{RESULTS_DIR}/day_close_detailed_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-    try:
-        with open(detailed_file, 'w', newline='', encoding='utf-8') as f:
-            fieldnames = ['loop', 'attempt', 'username', 'status', 'timestamp', 'message']
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(all_results)
-        logger.info(f"📄 Detailed results: {detailed_file}")
-    except Exception as e:
-        logger.error(f"❌ Error writing detailed results: {e}")
+    creds = load_credentials(CSV_FILE)
+    if creds is None:
+        return
     
+    logger.info(f"📊 Streaming credentials from {CSV_FILE}")
     logger.info("=" * 70)
-    logger.info("📊 Check the summary file for per-user statistics")
-    logger.info("=" * 70)'''
+    
+    run(creds)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
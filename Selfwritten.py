@@ -1,72 +1,35 @@
-import time
-import tempfile
-import shutil
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 
+from driver_pool import start_chrome
+import flows
+
 #------------- Create Chrome options-----------
 options = Options()
 options.add_argument("--incognito")  # For avoiding google chrome password save popup
 options.add_argument("--start-maximized")  # Start maximized
-# Launch browser in incognito mode
-driver = webdriver.Chrome(options=options)
-
-# ---------------- CONFIG ---------------
-driver.get("https://sandboxerp.shakti.org.bd:8072/Home/Login?ReturnUrl=%2F")
-time.sleep(3)
-
-username = '08341'
-password =  '123456'
-# ---------------- LOGIN ----------------
-#Username send
-usernameid = driver.find_element(By.ID,"emailaddress")
-usernameid.clear()
-usernameid.send_keys(username)
-
-#password send
-passwordid = driver.find_element(By.ID, "password")
-passwordid.clear()
-passwordid.send_keys(password)
-
-time.sleep(2)
-
-#Click Login Button
-login_button = driver.find_element(By.XPATH, "/html/body/section/div[2]/div/div/div/form/div[5]/button")
-login_button.click()
-time.sleep(2)
+# Launch browser in incognito mode (watchdog-tracked: a failed launch leaves no chromedriver behind)
+driver = start_chrome(options)
 
-#Wait for modal button and clickable
-wait = WebDriverWait(driver, 5)
-modal_button = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="responseModal"]/div/div/div[3]/button')))
-modal_button.click()
-time.sleep(2)
+try:
+    # ---------------- CONFIG ---------------
+    driver.get("https://sandboxerp.shakti.org.bd:8072/Home/Login?ReturnUrl=%2F")
 
-#Click on MIS 
-mis_button = driver.find_element(By.XPATH, '//*[@id="homePage"]/div[1]/div/div[1]/div[7]/a/div')
-mis_button.click()
-time.sleep(2)
+    username = '08341'
+    password =  '123456'
 
-#Click Day Open or Close
-Day_open_or_close_button = driver.find_element(By.XPATH, '/html/body/div[1]/div[3]/div[1]/div/div/div/div[2]/div/div[2]/div/ul/li[1]/a')
-Day_open_or_close_button.click()
-time.sleep(5)
+    # ---------------- LOGIN ----------------
+    # Fill username and password, click Login, dismiss the response modal (flows.LOGIN_FLOW)
+    flows.flow_engine.run(driver, flows.LOGIN_FLOW, {"username": username, "password": password}, name="login")
 
-#Click Day Close
-Day_Close = driver.find_element(By.XPATH, '/html/body/div[1]/div[3]/div[1]/div[1]/div/div/div[3]/div/button')
-Day_Close.click()
-time.sleep(5)
+    # ---------------- DAY CLOSE ----------------
+    # MIS → Day Open/Close → Day Close → Yes, then wait up to 5 minutes for the close to be confirmed
+    day_close = flows.flow_engine.run(driver, flows.DAY_CLOSE_FLOW, name="day_close", timeouts={"verification": 5*60})
 
-#Wait for modal button and Yes clickable
-wait = WebDriverWait(driver, 3)
-yes_button = wait.until(EC.element_to_be_clickable((By.XPATH, '/html/body/div[1]/div[3]/div[1]/div[5]/div/div/div[3]/button[2]')))
-yes_button.click()
-time.sleep(5)
+    #Dismiss the success dialog
+    flows.flow_engine.run(driver, [flows.Step("success_ok", '/html/body/div[1]/div[3]/div[2]/div/div/div[3]/button',
+                                              click=True, optional=True, timeout=5)], name="success_ok")
+finally:
+    driver.quit()  # Chrome and chromedriver exit even if a step raised
 
-#confirmed the Day Close
-wait = webdriver(driver, 5*60)
-succes_button = wait.until(EC.element_to_be_clickable((By.XPATH, '/html/body/div[1]/div[3]/div[2]/div/div/div[3]/button')))
-succes_button.click()
-time.sleep(1)
+print(f"Day close {'confirmed' if day_close.ok else 'NOT confirmed'}")
+print(flows.flow_stats.summary())
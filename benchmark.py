@@ -0,0 +1,245 @@
+"""End-to-end benchmark of the day-close flows against the local mock ERP.
+
+    python benchmark.py --flow http --users 50 --concurrency 10 --duration 30
+    python benchmark.py --flow multipleselem --latency 0.1 --jitter 0.05
+    python benchmark.py --flow dayclosebutton2 --users 10 --concurrency 2
+    python benchmark.py --flow multipleselem cdp --users 20 --concurrency 10   # side by side
+
+Reports attempts/sec, p50/p95/p99 per step (measured at the mock server per
+session, plus the client-side step histograms from ``metrics``) and peak RSS
+of this process tree, and writes a JSON report to ``results/``.
+"""
+import argparse
+import importlib.util
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urljoin
+
+import psutil
+
+from browser_profile import session_resources
+from flows import flow_stats
+from metrics import step_metrics
+from mock_erp import DEFAULT_PASSWORD, MockErpServer
+from session_cache import LOGOUT_PATH
+from watchdog import watchdog
+
+ROOT = Path(__file__).resolve().parent
+RESULTS_DIR = "results"
+FLOWS = ("multipleselem", "http", "cdp", "dayclosebutton2", "openclosebutton")
+ENGINES = {"multipleselem": "selenium", "http": "http", "cdp": "cdp"}  # Multipleselem engine per flow
+CSV_FLOWS = {
+    "dayclosebutton2": (ROOT / "csv" / "dayclosebutton2.py", "create_driver"),
+    "openclosebutton": (ROOT / "csv" / "openclosebutton.py", "create_headless_driver"),
+}
+
+# ---------------- STATS ----------------
+def percentile(values, pct):
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered))))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+    }
+
+
+class RssSampler:
+    """Samples RSS of this process and its children (Chrome, chromedriver) in the background."""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _sample(self):
+        proc = psutil.Process()
+        total = proc.memory_info().rss
+        for child in proc.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_bytes = max(self.peak_bytes, self._sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self._sample())
+
+# ---------------- FLOW RUNNERS ----------------
+def run_multipleselem(server, creds, concurrency, duration, engine, lean=True):
+    """Drive Multipleselem.continuous_loop for ``duration`` seconds."""
+    import Multipleselem as M
+    from cdp_engine import CdpDayCloseEngine
+    from driver_pool import DriverPool
+    from http_engine import HttpDayCloseEngine
+    from result_sink import ResultSink
+
+    M.URL = server.login_url
+    M.HOME_URL = server.base_url + "/"
+    M.CONCURRENCY = concurrency
+    M.ENGINE = engine
+    M.LEAN_PROFILE = lean
+    M.driver_pool = DriverPool(M.create_driver, size=concurrency)
+    M.http_engine = HttpDayCloseEngine(server.login_url, limit=concurrency)
+    M.cdp_engine = CdpDayCloseEngine(server.login_url, browsers=M.CDP_BROWSERS, limit=concurrency, lean=lean)
+    if engine == "cdp":
+        M.cdp_engine.start()  # Chrome launch counts as startup, like the Selenium warm-up
+    sink = ResultSink(Path(RESULTS_DIR) / f"benchmark_detailed_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    try:
+        elapsed, _ = M.continuous_loop(creds, duration, sink)
+    finally:
+        sink.close()
+        M.driver_pool.close()
+        M.http_engine.close()
+        M.cdp_engine.close()
+    return sink.total, elapsed, M.driver_pool.warmup_seconds + M.cdp_engine.launch_seconds
+
+
+def run_csv_flow(name, server, creds, concurrency):
+    """Run one pass of a csv/ script's run_single_session over every user."""
+    from driver_pool import DriverPool
+
+    path, factory_name = CSV_FLOWS[name]
+    spec = importlib.util.spec_from_file_location(f"bench_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    module.URL = server.login_url
+    module.LOGOUT_URL = urljoin(server.login_url, LOGOUT_PATH)
+    module.driver_pool = DriverPool(getattr(module, factory_name), size=concurrency, logout_url=module.LOGOUT_URL)
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(lambda c: module.run_single_session(c['username'], c['password']), creds))
+    finally:
+        module.driver_pool.close()
+    return len(creds), time.perf_counter() - start, 0.0
+
+# ---------------- MAIN ----------------
+def run_benchmark(flow, users=20, concurrency=5, duration=30, latency=0.0, jitter=0.0,
+                  failure_rate=0.0, error_rate=0.0, lean=True):
+    """Run one flow against a fresh mock ERP and return the report dict."""
+    for stats in (step_metrics, session_resources, flow_stats, watchdog):
+        stats.reset()  # Several flows may run in one process (--flow a b)
+    server = MockErpServer(port=0, latency=latency, jitter=jitter,
+                           failure_rate=failure_rate, error_rate=error_rate).start()
+    creds = [{'username': f"{10000 + i:05d}", 'password': DEFAULT_PASSWORD} for i in range(users)]
+    try:
+        with RssSampler() as rss:
+            if flow in CSV_FLOWS:
+                attempts, elapsed, startup = run_csv_flow(flow, server, creds, concurrency)
+            else:
+                attempts, elapsed, startup = run_multipleselem(server, creds, concurrency, duration, ENGINES[flow], lean)
+    finally:
+        server.stop()
+
+    return {
+        "flow": flow,
+        "users": users,
+        "concurrency": concurrency,
+        "latency": latency,
+        "jitter": jitter,
+        "failure_rate": failure_rate,
+        "error_rate": error_rate,
+        "lean_profile": lean,
+        "attempts": attempts,
+        "confirmed_closes": server.closes,
+        "startup": startup,
+        "elapsed": elapsed,
+        "attempts_per_sec": attempts / elapsed if elapsed else 0.0,
+        "peak_rss_mb": rss.peak_bytes / 1024 / 1024,
+        "steps": {step: summarize(values) for step, values in server.step_timings().items()},
+        "client_steps": step_metrics.to_dict()["steps"],
+        "sessions": session_resources.to_dict(),
+        "round_trips": flow_stats.to_dict(),
+        "browsers": watchdog.to_dict(),
+    }
+
+
+def print_report(report):
+    print("=" * 70)
+    print(f"🏎️  Benchmark: {report['flow']} | users {report['users']} | concurrency {report['concurrency']}")
+    print("=" * 70)
+    print(f"📝 Attempts: {report['attempts']} ({report['confirmed_closes']} confirmed by the server)")
+    print(f"⚡ Rate: {report['attempts_per_sec']:.2f} attempts/second over {report['elapsed']:.2f}s")
+    if report["startup"]:
+        print(f"🌅 Startup: {report['startup']:.2f}s before the window (not in the rate)")
+    print(f"🧠 Peak RSS: {report['peak_rss_mb']:.1f} MB")
+    if report["sessions"]["page_load"]["count"]:
+        print(session_resources.summary())
+    if report["browsers"]["sessions"]:
+        print(watchdog.summary())
+    print(f"{'step':<32}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for step, s in report["steps"].items():
+        print(f"{step:<32}{s['count']:>8}{s['p50']:>10.3f}{s['p95']:>10.3f}{s['p99']:>10.3f}")
+    for step, s in report["client_steps"].items():
+        print(f"{'client: ' + step:<32}{s['count']:>8}{s['p50']:>10.3f}{s['p95']:>10.3f}{s['p99']:>10.3f}")
+    if report["round_trips"]:
+        print(flow_stats.summary())
+
+
+def print_comparison(reports):
+    """One line per flow, for runs of several flows against the same mock settings."""
+    print("=" * 70)
+    print(f"{'flow':<18}{'attempts/s':>12}{'startup':>10}{'peak RSS':>11}{'flow round-trips':>21}")
+    for report in reports:
+        trips = sum(e["avg"] for e in report["round_trips"].values())
+        print(f"{report['flow']:<18}{report['attempts_per_sec']:>12.2f}{report['startup']:>9.2f}s"
+              f"{report['peak_rss_mb']:>8.1f} MB{trips:>21.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark day-close flows against the mock ERP")
+    parser.add_argument("--flow", choices=FLOWS, nargs="+", default=["http"], help="one or more flows to compare")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--duration", type=float, default=30, help="run window for multipleselem/http flows")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--full-profile", action="store_true", help="multipleselem without the lean Chrome profile")
+    args = parser.parse_args()
+
+    reports = []
+    for flow in args.flow:
+        report = run_benchmark(flow, users=args.users, concurrency=args.concurrency, duration=args.duration,
+                               latency=args.latency, jitter=args.jitter,
+                               failure_rate=args.failure_rate, error_rate=args.error_rate,
+                               lean=not args.full_profile)
+        print_report(report)
+
+        Path(RESULTS_DIR).mkdir(exist_ok=True)
+        report_file = Path(RESULTS_DIR) / f"benchmark_{flow}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        report_file.write_text(json.dumps(report, indent=2))
+        print(f"📄 Report: {report_file}")
+        reports.append(report)
+    if len(reports) > 1:
+        print_comparison(reports)
+
+if __name__ == "__main__":
+    main()
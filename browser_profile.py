@@ -0,0 +1,102 @@
+import threading
+
+from metrics import Histogram
+
+# ============ CONFIGURABLE PARAMETERS ============
+LEAN_WINDOW_SIZE = "1280,800"  # Smaller than 1920x1080 but still above the ERP's desktop breakpoint
+BLOCKED_EXTENSIONS = (
+    "png", "jpg", "jpeg", "gif", "webp", "svg", "ico", "bmp",  # Images
+    "woff", "woff2", "ttf", "otf", "eot",  # Web fonts
+    "mp4", "webm", "mp3", "wav", "ogg",  # Media
+)
+BLOCKED_HOSTS = (  # Third-party analytics and font hosts; the ERP's own host is never blocked
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net",
+    "fonts.googleapis.com", "fonts.gstatic.com",
+    "connect.facebook.net", "hotjar.com", "clarity.ms",
+)
+LEAN_ARGUMENTS = (
+    "--disable-extensions",
+    "--disable-component-extensions-with-background-pages",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-features=Translate,MediaRouter,OptimizationHints",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--metrics-recording-only",
+    "--mute-audio",
+    "--blink-settings=imagesEnabled=false",
+)
+
+NAVIGATION_TIMING_JS = """
+const nav = performance.getEntriesByType('navigation')[0];
+if (nav && nav.loadEventEnd) return nav.loadEventEnd - nav.startTime;
+const t = performance.timing;
+return t.loadEventEnd ? t.loadEventEnd - t.navigationStart : null;
+"""
+
+# ---------------- LEAN PROFILE ----------------
+def blocked_url_patterns():
+    """URL patterns for ``Network.setBlockedURLs`` (``*`` wildcards, with and without a query string)."""
+    patterns = []
+    for ext in BLOCKED_EXTENSIONS:
+        patterns += [f"*.{ext}", f"*.{ext}?*"]
+    for host in BLOCKED_HOSTS:
+        patterns += [f"*://{host}/*", f"*://*.{host}/*"]
+    return patterns
+
+
+def apply_lean_options(options):
+    """Add the lean-profile switches and prefs to a Chrome ``Options`` object."""
+    for argument in LEAN_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_argument(f"--window-size={LEAN_WINDOW_SIZE}")
+    options.add_experimental_option("prefs", {
+        "profile.managed_default_content_settings.images": 2,
+        "profile.default_content_setting_values.notifications": 2,
+    })
+    return options
+
+
+def block_resources(driver, patterns=None):
+    """Block images, fonts, media and third-party hosts for this tab via the DevTools protocol.
+
+    The block list lives on the tab, so it survives the pool's reset to
+    about:blank and applies to every later attempt on this driver.
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns or blocked_url_patterns())})
+
+# ---------------- PER-SESSION RESOURCES ----------------
+class SessionResources:
+    """Page-load time (navigation timing) per browser session; memory is sampled by ``watchdog``."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.page_load = Histogram()
+
+    def sample(self, driver):
+        """Record the last navigation's load time."""
+        try:
+            load_ms = driver.execute_script(NAVIGATION_TIMING_JS)
+        except Exception:
+            load_ms = None
+        if load_ms:
+            with self._lock:
+                self.page_load.observe(load_ms / 1000)
+
+    def reset(self):
+        with self._lock:
+            self.page_load = Histogram()
+
+    def to_dict(self):
+        with self._lock:
+            return {"page_load": self.page_load.to_dict()}
+
+    def summary(self):
+        load = self.to_dict()["page_load"]
+        return f"📄 Page load: p50 {load['p50']:.2f}s, p95 {load['p95']:.2f}s ({load['count']} loads)"
+
+session_resources = SessionResources()
@@ -0,0 +1,448 @@
+"""Day close over the Chrome DevTools protocol, without chromedriver in between.
+
+Selenium sends every command Python → chromedriver (HTTP) → Chrome
+(DevTools). This engine keeps one DevTools websocket per Chrome process and
+talks to it asynchronously from a background event loop, like the HTTP
+engine. Every attempt gets its own browser context (separate cookies and
+storage, like an incognito window), so a few Chrome processes carry all
+concurrent users instead of one Chrome per user.
+
+It runs the same ``flows.LOGIN_FLOW`` and ``flows.DAY_CLOSE_FLOW`` through
+the same in-page runner as the Selenium path, so locators, waits and step
+timings stay in one place.
+
+    engine = CdpDayCloseEngine(URL, browsers=2, limit=20)
+    status, message, reason, timings = engine.day_close("05158", "123456")
+    engine.close()
+"""
+import asyncio
+import itertools
+import json
+import logging
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import aiohttp
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+import browser_profile
+import flows
+import retry
+import waits
+from day_status import ALREADY_CLOSED_MESSAGE
+from session_cache import LOGIN_PATH
+from watchdog import watchdog
+
+logger = logging.getLogger(__name__)
+
+# ============ CONFIGURABLE PARAMETERS ============
+CHROME_BINARY = None  # Path to Chrome/Chromium; None = first one on PATH, else Selenium Manager's download
+CHROME_CANDIDATES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+BROWSERS = 2  # Chrome processes; users are spread over them as browser contexts
+LAUNCH_TIMEOUT = 30  # Seconds for Chrome to open its DevTools port
+COMMAND_TIMEOUT = 30  # Seconds for a single DevTools command (flows have their own step timeouts)
+NAVIGATION_TIMEOUT = 30  # Seconds for the login page's load event
+COMPLETION_TIMEOUT = 30  # Max seconds to wait for the ERP to acknowledge the close
+NAVIGATION_ERRORS = ("context was destroyed", "navigated or closed", "cannot find context")
+CHROME_ARGUMENTS = (
+    "--headless=new",
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--disable-blink-features=AutomationControlled",
+    "--remote-debugging-port=0",
+)
+
+# ---------------- ERRORS ----------------
+class CdpError(WebDriverException):
+    """A DevTools command failed or the browser went away (classified like a driver crash)."""
+
+
+class CdpTimeout(TimeoutException):
+    """A DevTools command or page load did not finish in time."""
+
+
+def chrome_binary():
+    """CHROME_BINARY, else the first Chrome/Chromium on PATH, else the browser Selenium Manager resolves."""
+    if CHROME_BINARY:
+        return CHROME_BINARY
+    for name in CHROME_CANDIDATES:
+        path = shutil.which(name)
+        if path:
+            return path
+    from selenium.webdriver.common.selenium_manager import SeleniumManager
+    return SeleniumManager().binary_paths(["--browser", "chrome"])["browser_path"]
+
+# ---------------- DEVTOOLS CONNECTION ----------------
+class CdpBrowser:
+    """One headless Chrome process and its browser-level DevTools websocket (flattened target sessions)."""
+
+    def __init__(self, binary, lean=True, name="chrome"):
+        self.binary = binary
+        self.lean = lean
+        self.name = name
+        self.process = None
+        self.profile_dir = None
+        self.contexts = 0  # Browser contexts currently open (used to spread users)
+        self.commands = 0
+        self._ids = itertools.count(1)
+        self._pending = {}  # command id → future
+        self._listeners = []  # (session id, event method, future)
+        self._http = None
+        self._ws = None
+        self._reader = None
+
+    @property
+    def alive(self):
+        return self._ws is not None and not self._ws.closed and self.process is not None and self.process.poll() is None
+
+    async def launch(self):
+        self.profile_dir = tempfile.mkdtemp(prefix="dayclose-cdp-")
+        args = [self.binary, *CHROME_ARGUMENTS, f"--user-data-dir={self.profile_dir}"]
+        if self.lean:
+            args += [*browser_profile.LEAN_ARGUMENTS, f"--window-size={browser_profile.LEAN_WINDOW_SIZE}"]
+        args.append("about:blank")
+        self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        watchdog.track(self.process.pid, self.name)
+        port_file = Path(self.profile_dir) / "DevToolsActivePort"
+        deadline = time.monotonic() + LAUNCH_TIMEOUT
+        while not (port_file.exists() and len(port_file.read_text().splitlines()) >= 2):
+            if self.process.poll() is not None:
+                raise CdpError(f"Chrome exited with code {self.process.returncode} before opening DevTools")
+            if time.monotonic() > deadline:
+                raise CdpTimeout(f"Chrome did not open DevTools within {LAUNCH_TIMEOUT}s")
+            await asyncio.sleep(0.05)
+        port, path = port_file.read_text().splitlines()[:2]
+        self._http = aiohttp.ClientSession()
+        self._ws = await self._http.ws_connect(f"ws://127.0.0.1:{port}{path}", max_msg_size=0)
+        self._reader = asyncio.ensure_future(self._read())
+
+    async def _read(self):
+        try:
+            async for message in self._ws:
+                if message.type != aiohttp.WSMsgType.TEXT:
+                    continue
+                data = json.loads(message.data)
+                if "id" in data:
+                    future = self._pending.pop(data["id"], None)
+                    if future is None or future.done():
+                        continue
+                    if "error" in data:
+                        future.set_exception(CdpError(data["error"].get("message", str(data["error"]))))
+                    else:
+                        future.set_result(data.get("result", {}))
+                else:
+                    key = (data.get("sessionId"), data.get("method"))
+                    for listener in [l for l in self._listeners if l[:2] == key]:
+                        self._listeners.remove(listener)
+                        if not listener[2].done():
+                            listener[2].set_result(data.get("params", {}))
+        finally:
+            error = CdpError(f"DevTools connection to {self.name} closed")
+            for future in list(self._pending.values()) + [l[2] for l in self._listeners]:
+                if not future.done():
+                    future.set_exception(error)
+            self._pending.clear()
+            self._listeners.clear()
+
+    async def send(self, method, params=None, session_id=None, timeout=COMMAND_TIMEOUT):
+        """Send one command and wait for its result."""
+        if self._ws is None or self._ws.closed:
+            raise CdpError(f"DevTools connection to {self.name} closed")
+        command_id = next(self._ids)
+        message = {"id": command_id, "method": method, "params": params or {}}
+        if session_id:
+            message["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[command_id] = future
+        self.commands += 1
+        await self._ws.send_str(json.dumps(message))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._pending.pop(command_id, None)
+            raise CdpTimeout(f"{method}: no reply within {timeout}s")
+
+    def wait_for(self, method, session_id):
+        """Future for the next ``method`` event on ``session_id`` (register before triggering it)."""
+        future = asyncio.get_running_loop().create_future()
+        self._listeners.append((session_id, method, future))
+        return future
+
+    async def close(self):
+        try:
+            if self._ws is not None and not self._ws.closed:
+                await self.send("Browser.close", timeout=5)
+        except Exception:
+            pass
+        if self._ws is not None:
+            await self._ws.close()
+        if self._http is not None:
+            await self._http.close()
+        if self.process is not None:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            watchdog.release(self.process.pid)  # Renderers/GPU process that outlived the browser
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class CdpPage:
+    """A tab inside its own browser context, driven through a flattened target session."""
+
+    def __init__(self, browser, context_id, target_id, session_id):
+        self.browser = browser
+        self.context_id = context_id
+        self.target_id = target_id
+        self.session_id = session_id
+        self.commands = 0
+
+    @classmethod
+    async def open(cls, browser, lean=True):
+        context = await browser.send("Target.createBrowserContext", {"disposeOnDetach": True})
+        browser.contexts += 1
+        page = None
+        try:
+            target = await browser.send("Target.createTarget", {"url": "about:blank",
+                                                                "browserContextId": context["browserContextId"]})
+            session = await browser.send("Target.attachToTarget", {"targetId": target["targetId"], "flatten": True})
+            page = cls(browser, context["browserContextId"], target["targetId"], session["sessionId"])
+            setup = [page.send("Page.enable")]
+            if lean:
+                setup += [page.send("Network.enable"),
+                          page.send("Network.setBlockedURLs", {"urls": browser_profile.blocked_url_patterns()})]
+            await asyncio.gather(*setup)
+            return page
+        except Exception:
+            await cls._dispose(browser, context["browserContextId"])
+            raise
+
+    async def send(self, method, params=None, timeout=COMMAND_TIMEOUT):
+        self.commands += 1
+        return await self.browser.send(method, params, self.session_id, timeout)
+
+    async def navigate(self, url, timeout=NAVIGATION_TIMEOUT):
+        loaded = self.browser.wait_for("Page.loadEventFired", self.session_id)
+        reply = await self.send("Page.navigate", {"url": url})
+        if reply.get("errorText"):
+            loaded.cancel()
+            raise CdpError(f"Navigation to {url} failed: {reply['errorText']}")
+        try:
+            await asyncio.wait_for(loaded, timeout)
+        except asyncio.TimeoutError:
+            raise CdpTimeout(f"Page load of {url} took longer than {timeout}s")
+
+    async def evaluate(self, expression, timeout):
+        """Evaluate ``expression`` in the page, awaiting a returned promise; returns its JSON value."""
+        reply = await self.send("Runtime.evaluate", {"expression": expression, "awaitPromise": True,
+                                                     "returnByValue": True}, timeout=timeout)
+        if "exceptionDetails" in reply:
+            details = reply["exceptionDetails"]
+            raise CdpError(details.get("exception", {}).get("description") or details.get("text", "script error"))
+        return reply["result"].get("value")
+
+    async def current_url(self):
+        return await self.evaluate("location.href", COMMAND_TIMEOUT)
+
+    @staticmethod
+    async def _dispose(browser, context_id):
+        browser.contexts -= 1
+        try:
+            await browser.send("Target.disposeBrowserContext", {"browserContextId": context_id}, timeout=5)
+        except Exception:
+            pass  # Browser already gone; nothing left to clean up
+
+    async def close(self):
+        await self._dispose(self.browser, self.context_id)
+
+# ---------------- FLOW RUNNER ----------------
+ASYNC_SCRIPT = "new Promise((resolve) => (function () {\n%s\n}).call(null, %s, resolve))"
+
+
+class CdpFlowEngine(flows.FlowEngine):
+    """``flows.FlowEngine`` over a CdpPage: the same batches and RUNNER_JS, one Runtime.evaluate per batch."""
+
+    async def run_async(self, page, flow, values=None, name="flow", timeouts=None):
+        timeouts = timeouts or {}
+        result = flows.FlowResult(name)
+        try:
+            for batch in flows.batches(flow):
+                script, budget = self.batch_script(batch, timeouts)
+                reply = await self._evaluate(page, ASYNC_SCRIPT % (script, json.dumps(values or {})), budget, result)
+                if not self.apply_reply(batch, reply, result):
+                    break
+        finally:
+            self.stats.record(f"cdp_{name}", result.round_trips)
+        return result
+
+    @staticmethod
+    async def _evaluate(page, expression, budget, result):
+        for attempt in range(flows.NAVIGATION_RETRIES + 1):
+            result.round_trips += 1
+            try:
+                return await page.evaluate(expression, budget + 5)
+            except CdpError as e:
+                # The page navigated away under the script (e.g. after the login click); run again on the new one
+                if attempt == flows.NAVIGATION_RETRIES or not any(m in str(e).lower() for m in NAVIGATION_ERRORS):
+                    raise
+                await asyncio.sleep(waits.POLL_FREQUENCY)
+
+# ---------------- ENGINE ----------------
+class CdpDayCloseEngine:
+    """Day close on a few shared Chrome processes over DevTools.
+
+    Like ``HttpDayCloseEngine``, one event loop runs in a background thread
+    so worker threads can call :meth:`day_close` synchronously; at most
+    ``limit`` attempts run at once, each in its own browser context on the
+    least busy of ``browsers`` Chrome processes.
+    """
+
+    def __init__(self, login_url, browsers=BROWSERS, limit=10, lean=True, completion_timeout=COMPLETION_TIMEOUT):
+        self.login_url = login_url
+        self.browsers = browsers
+        self.limit = limit
+        self.lean = lean
+        self.completion_timeout = completion_timeout
+        self.flow_engine = CdpFlowEngine()
+        self.launch_seconds = 0.0
+        self._chrome = []
+        self._loop = None
+        self._thread = None
+        self._slots = None
+        self._launching = None
+        self._lock = threading.Lock()
+
+    # ---------------- LIFECYCLE ----------------
+    def start(self):
+        """Start the event loop and launch the Chrome processes (idempotent)."""
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="cdp-engine", daemon=True)
+            self._thread.start()
+            start = time.perf_counter()
+            try:
+                self._submit(self._launch_all()).result()
+            except Exception:
+                self._submit(self._close_all()).result()
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+                self._loop.close()
+                self._loop = None
+                raise
+            self.launch_seconds = time.perf_counter() - start
+            logger.info(f"🧪 CDP engine: {self.browsers} Chrome processes up in {self.launch_seconds:.2f}s")
+
+    async def _launch_all(self):
+        self._slots = asyncio.Semaphore(self.limit)
+        self._launching = asyncio.Lock()
+        binary = chrome_binary()
+        self._chrome = [CdpBrowser(binary, self.lean, name=f"chrome-{i}") for i in range(self.browsers)]
+        await asyncio.gather(*(browser.launch() for browser in self._chrome))
+
+    async def _close_all(self):
+        await asyncio.gather(*(browser.close() for browser in self._chrome))
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    async def _browser(self):
+        """Least busy live Chrome; a crashed one is relaunched in place."""
+        async with self._launching:
+            browser = min(self._chrome, key=lambda b: (not b.alive, b.contexts))
+            if not browser.alive:
+                logger.warning(f"⚠️  {browser.name} is gone; relaunching")
+                await browser.close()
+                replacement = CdpBrowser(browser.binary, self.lean, browser.name)
+                await replacement.launch()
+                self._chrome[self._chrome.index(browser)] = replacement
+                browser = replacement
+            return browser
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            self._submit(self._close_all()).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
+            self._chrome = []
+
+    def commands(self):
+        """DevTools commands sent so far over every browser connection."""
+        return sum(browser.commands for browser in self._chrome)
+
+    # ---------------- DAY CLOSE ----------------
+    def day_close(self, username, password, cutoff=None):
+        """Run the day close for one user; returns ``(status, message, reason, timings)``.
+
+        ``timings`` are (step, seconds) pairs in flow order, starting with
+        ``context_start`` and ``page_load``. If the ``cutoff`` event is set
+        once the user is logged in, the close is not started.
+        """
+        self.start()
+        return self._submit(self.day_close_async(username, password, cutoff)).result()
+
+    async def day_close_async(self, username, password, cutoff=None):
+        timings = []
+        page = None
+        async with self._slots:
+            last = time.perf_counter()
+
+            def lap(step):
+                nonlocal last
+                now = time.perf_counter()
+                timings.append((step, now - last))
+                last = now
+
+            try:
+                page = await CdpPage.open(await self._browser(), self.lean)
+                lap("context_start")
+                await page.navigate(self.login_url)
+                lap("page_load")
+
+                # ---------------- LOGIN (fill, submit, optional modal) ----------------
+                try:
+                    login = await self.flow_engine.run_async(page, flows.LOGIN_FLOW,
+                                                             {"username": username, "password": password},
+                                                             name="login")
+                except flows.FlowTimeout as e:
+                    timings.extend(e.timings)  # The login steps that did run
+                    if e.step == "homepage" and LOGIN_PATH.lower() in (await page.current_url()).lower():
+                        # Still on the login form after submitting it
+                        return "failure", "Login rejected", retry.LOGIN_REJECTED, timings
+                    raise
+                timings.extend(login.timings)
+                if cutoff is not None and cutoff.is_set():
+                    return "error", "Run deadline reached before the close", retry.CUTOFF, timings
+
+                # ---------------- DAY CLOSE (MIS → Day Open/Close → Close → Yes → acknowledged) ----------------
+                try:
+                    day_close = await self.flow_engine.run_async(page, flows.DAY_CLOSE_FLOW, name="day_close",
+                                                                 timeouts={"verification": self.completion_timeout})
+                except flows.FlowTimeout as e:
+                    timings.extend(e.timings)
+                    raise
+                timings.extend(day_close.timings)
+                if day_close.stopped == "close_click":
+                    return "success", ALREADY_CLOSED_MESSAGE, None, timings
+                if not day_close.ok:
+                    return ("failure", f"Day close not acknowledged within {self.completion_timeout}s",
+                            retry.NOT_ACKNOWLEDGED, timings)
+                return "success", "Day close completed", None, timings
+            except (CdpError, TimeoutException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                reason = retry.TIMEOUT if isinstance(e, asyncio.TimeoutError) else retry.reason_for_exception(e)
+                return "error", f"{type(e).__name__}: {e}", reason, timings
+            finally:
+                if page is not None:
+                    await page.close()
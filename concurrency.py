@@ -0,0 +1,83 @@
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# ============ CONFIGURABLE PARAMETERS ============
+WINDOW_SIZE = 20  # Recent attempts the controller looks at
+ERROR_RATE_LIMIT = 0.2  # Back off when more than this share of recent attempts errored
+LATENCY_P95_LIMIT = 30.0  # Back off when p95 attempt duration (seconds) exceeds this
+DECREASE_FACTOR = 0.5  # Multiplicative decrease on back-off
+INCREASE_STEP = 1  # Additive increase when the window is healthy
+ADJUST_INTERVAL = 5.0  # Minimum seconds between adjustments
+
+# ---------------- AIMD CONTROLLER ----------------
+class AdaptiveConcurrency:
+    """AIMD controller for the number of live sessions.
+
+    Every finished attempt is recorded. At most once per ``interval`` the
+    rolling window is checked: a high error rate or a slow p95 halves the
+    limit, a healthy full window adds one slot. The limit stays within
+    ``[minimum, maximum]`` and every change is logged.
+    """
+
+    def __init__(self, minimum, maximum, initial=None, window=WINDOW_SIZE,
+                 error_rate_limit=ERROR_RATE_LIMIT, latency_p95_limit=LATENCY_P95_LIMIT,
+                 decrease_factor=DECREASE_FACTOR, increase_step=INCREASE_STEP, interval=ADJUST_INTERVAL):
+        if not 1 <= minimum <= maximum:
+            raise ValueError(f"Invalid concurrency bounds: {minimum}..{maximum}")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = min(max(initial or minimum, minimum), maximum)
+        self.window = window
+        self.error_rate_limit = error_rate_limit
+        self.latency_p95_limit = latency_p95_limit
+        self.decrease_factor = decrease_factor
+        self.increase_step = increase_step
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)  # (errored, duration)
+        self._last_adjust = time.monotonic()
+        self._last_change = 0.0
+        self.changes = []  # (elapsed seconds, old, new, reason)
+        self._started = time.monotonic()
+
+    def record(self, errored, duration):
+        with self._lock:
+            if time.monotonic() - duration < self._last_change:
+                return  # Started under the previous limit; says nothing about this one
+            self._outcomes.append((errored, duration))
+
+    def _stats(self):
+        errors = sum(1 for errored, _ in self._outcomes if errored)
+        durations = sorted(d for _, d in self._outcomes)
+        p95 = durations[max(0, int(round(0.95 * len(durations))) - 1)] if durations else 0.0
+        return errors / len(self._outcomes), p95
+
+    def adjust(self):
+        """Apply one AIMD step if the interval has passed; returns the current limit."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_adjust < self.interval or not self._outcomes:
+                return self.limit
+            error_rate, p95 = self._stats()
+            old = self.limit
+            if error_rate > self.error_rate_limit or p95 > self.latency_p95_limit:
+                new = max(self.minimum, int(old * self.decrease_factor))
+                reason = f"error rate {error_rate:.0%}, p95 {p95:.1f}s"
+            elif len(self._outcomes) == self.window:
+                new = min(self.maximum, old + self.increase_step)
+                reason = f"healthy: error rate {error_rate:.0%}, p95 {p95:.1f}s"
+            else:
+                return old  # Not enough evidence to grow yet
+            self._last_adjust = now
+            if new != old:
+                self.limit = new
+                self._last_change = now
+                self._outcomes.clear()  # Judge the new level on its own results
+                self.changes.append((round(now - self._started, 2), old, new, reason))
+                arrow = "⬆️ " if new > old else "⬇️ "
+                logger.info(f"🎚️  Concurrency {arrow}{old} → {new} ({reason})")
+            return self.limit
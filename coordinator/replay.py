@@ -0,0 +1,281 @@
+"""Replay the recorded coordinates (coords.json) without fixed sleeps.
+
+After every click the engine grabs screenshots and diffs them with NumPy
+until the screen has changed and settled again (or a template image shows
+up), so each step moves on as soon as the ERP has reacted and fails with
+ReplayTimeout instead of clicking blindly into the wrong page.
+
+    # browser already open on the login page (as for record_corr.py)
+    python replay.py run --username 08341 --password 123456
+
+    # unattended check of the engine itself on a virtual display
+    xvfb-run -s "-screen 0 1280x800x24" python replay.py selftest
+"""
+import argparse
+import json
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+# ============ CONFIGURABLE PARAMETERS ============
+COORDS_FILE = Path(__file__).with_name("coords.json")
+STEP_TIMEOUT = 15  # Seconds a step waits for the screen to react before giving up
+POLL_INTERVAL = 0.05  # Seconds between screenshots while waiting
+DOWNSAMPLE = 4  # Compare every Nth pixel in both directions (full-screen grabs stay cheap)
+PIXEL_TOLERANCE = 24  # Grey-level difference that counts as a changed pixel (ignores anti-aliasing noise)
+CHANGE_THRESHOLD = 0.002  # Share of pixels that must change before a step counts as "reacted"
+STABLE_FRAMES = 3  # Consecutive unchanged frames that count as "settled" (fade-ins, spinners)
+FIELD_BOX = 160  # Half-width of the box watched around a field while typing into it
+
+# ---------------- IMAGE DIFFS ----------------
+def to_gray(image, step=DOWNSAMPLE):
+    """PIL image → downsampled int16 grey-level array."""
+    return np.asarray(image.convert("L"), dtype=np.int16)[::step, ::step]
+
+
+def changed_fraction(before, after, tolerance=PIXEL_TOLERANCE):
+    """Share of pixels whose grey level moved by more than ``tolerance``."""
+    if before.shape != after.shape:
+        return 1.0
+    return np.count_nonzero(np.abs(after - before) > tolerance) / before.size
+
+
+def match_template(frame, template, tolerance=PIXEL_TOLERANCE):
+    """Top-left (x, y) in ``frame`` where ``template`` fits with a mean difference within ``tolerance``, or None.
+
+    The best offset has the smallest sum of squared differences, found for
+    every offset at once: window sums of frame² from an integral image, the
+    cross term from one FFT correlation. Only that offset's mean absolute
+    difference is then checked against ``tolerance``.
+    """
+    h, w = template.shape
+    height, width = frame.shape
+    if h > height or w > width:
+        return None
+    f = frame.astype(np.float64)
+    t = template.astype(np.float64)
+    shape = (height + h - 1, width + w - 1)
+    cross = np.fft.irfft2(np.fft.rfft2(f, shape) * np.fft.rfft2(t[::-1, ::-1], shape), shape)[h - 1:height, w - 1:width]
+    integral = np.pad(np.cumsum(np.cumsum(f * f, axis=0), axis=1), ((1, 0), (1, 0)))
+    window_sq = integral[h:, w:] - integral[:-h, w:] - integral[h:, :-w] + integral[:-h, :-w]
+    y, x = np.unravel_index(np.argmin(window_sq - 2 * cross), cross.shape)  # + sum(t²), the same everywhere
+    mean_diff = np.abs(frame[y:y + h, x:x + w] - template).mean()
+    return (int(x), int(y)) if mean_diff <= tolerance else None
+
+# ---------------- SCREEN ----------------
+class Screen:
+    """Screenshots and input through pyautogui (move the mouse to a corner to abort)."""
+
+    def __init__(self):
+        import pyautogui  # Needs a display, so only imported for the real screen
+
+        self.gui = pyautogui
+
+    def size(self):
+        return tuple(self.gui.size())
+
+    def grab(self, region=None):
+        return to_gray(self.gui.screenshot(region=region))
+
+    def click(self, x, y):
+        self.gui.click(x, y)
+
+    def type(self, text):
+        self.gui.write(text)
+
+# ---------------- REPLAY FLOW ----------------
+class ReplayStep:
+    """Click the recorded point ``coord`` (a coords.json key), optionally type ``values[text]``.
+
+    The step then waits until the watched area changes and settles: the box
+    around the click for ``region="field"``, otherwise the whole screen. With
+    ``expect`` (path to a PNG cut from a screenshot) it waits for that image
+    to appear instead. ``optional`` steps that see no change are skipped.
+    """
+
+    def __init__(self, name, coord=None, text=None, region="screen", expect=None, optional=False, timeout=None):
+        self.name = name
+        self.coord = coord or name
+        self.text = text
+        self.region = region
+        self.expect = expect
+        self.optional = optional
+        self.timeout = timeout
+
+
+REPLAY_FLOW = [
+    ReplayStep("username", text="username", region="field"),
+    ReplayStep("password", text="password", region="field"),
+    ReplayStep("login"),
+    ReplayStep("warning", optional=True, timeout=3),
+    ReplayStep("MIS"),
+    ReplayStep("day open or close"),
+    ReplayStep("day close"),
+    ReplayStep("yes"),  # Add expect="day_closed.png" (cut from a screenshot) to wait for the ERP's confirmation
+]
+
+
+class ReplayTimeout(Exception):
+    """The screen never reacted to a required step."""
+
+    def __init__(self, step, timeout):
+        super().__init__(f"step '{step}': no screen change within {timeout}s")
+        self.step = step
+
+# ---------------- ENGINE ----------------
+class ReplayEngine:
+    def __init__(self, coords, screen=None, step_timeout=STEP_TIMEOUT):
+        self.coords = coords
+        self.screen = screen or Screen()
+        self.step_timeout = step_timeout
+
+    def region_for(self, step, x, y):
+        """(left, top, width, height) watched for ``step``; None means the whole screen."""
+        if step.region != "field":
+            return None
+        width, height = self.screen.size()
+        left, top = max(0, x - FIELD_BOX), max(0, y - FIELD_BOX)
+        return left, top, min(width, x + FIELD_BOX) - left, min(height, y + FIELD_BOX) - top
+
+    def wait_for_change(self, region, before, timeout):
+        """Wait until the region differs from ``before``, then until it stops changing; False on timeout."""
+        deadline = time.monotonic() + timeout
+        while True:
+            frame = self.screen.grab(region)
+            if changed_fraction(before, frame) >= CHANGE_THRESHOLD:
+                break
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(POLL_INTERVAL)
+        stable = 0
+        while stable < STABLE_FRAMES and time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            latest = self.screen.grab(region)
+            stable = stable + 1 if changed_fraction(frame, latest) < CHANGE_THRESHOLD else 0
+            frame = latest
+        return True  # Still animating at the deadline is fine: it did react
+
+    def wait_for_template(self, region, template, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if match_template(self.screen.grab(region), template) is not None:
+                return True
+            time.sleep(POLL_INTERVAL)
+        return False
+
+    def run_step(self, step, values):
+        """Run one step; returns the seconds it took, or None for a skipped optional step."""
+        timeout = step.timeout or self.step_timeout
+        x, y = self.coords[step.coord]["x"], self.coords[step.coord]["y"]
+        region = self.region_for(step, x, y)
+        start = time.monotonic()
+        before = self.screen.grab(region)
+        self.screen.click(x, y)
+        if step.text is not None:
+            self.screen.type(values[step.text])
+        if step.expect:
+            from PIL import Image
+
+            reacted = self.wait_for_template(region, to_gray(Image.open(step.expect)), timeout)
+        else:
+            reacted = self.wait_for_change(region, before, timeout)
+        if not reacted:
+            if step.optional:
+                return None
+            raise ReplayTimeout(step.name, timeout)
+        return time.monotonic() - start
+
+    def run(self, flow=REPLAY_FLOW, values=None):
+        """Replay ``flow``; returns [(step, seconds)] with None for skipped optional steps."""
+        timings = []
+        for step in flow:
+            seconds = self.run_step(step, values or {})
+            timings.append((step.name, seconds))
+            print(f"{step.name}: " + ("skipped" if seconds is None else f"{seconds:.2f}s"))
+        return timings
+
+
+def load_coords(path=COORDS_FILE):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+# ---------------- SELF-TEST ----------------
+def selftest():
+    """Replay a flow against a local Tk window that reacts after random delays (run it under Xvfb)."""
+    import random
+    import tkinter as tk
+
+    root = tk.Tk()
+    root.geometry("800x600+0+0")
+    root.configure(bg="white")
+    pages = ["login", "home", "mis", "day", "confirm", "done"]
+    state = {"page": 0}
+    label = tk.Label(root, text=pages[0], font=("Helvetica", 48), bg="white")
+    label.place(x=200, y=40)
+    entry = tk.Entry(root, font=("Helvetica", 24))
+    entry.place(x=200, y=200, width=300)
+
+    def next_page(event=None):
+        def show():
+            state["page"] += 1
+            label.configure(text=pages[state["page"]])
+            root.configure(bg=random.choice(["#dde", "#ded", "#edd", "#eed"]))
+        root.after(random.randint(100, 1500), show)  # ERP-like variable latency
+
+    button = tk.Button(root, text="Next", font=("Helvetica", 24), command=next_page)
+    button.place(x=200, y=400)
+    root.update()
+
+    coords = {"field": {"x": 350, "y": 220}, "next": {"x": 250, "y": 420}, "nowhere": {"x": 750, "y": 580}}
+    flow = [ReplayStep("type", "field", text="username", region="field")]
+    flow += [ReplayStep(f"next{i}", "next") for i in range(len(pages) - 1)]
+    flow += [ReplayStep("optional", "nowhere", optional=True, timeout=1)]
+    outcome = {}
+
+    def replay():
+        try:
+            outcome["timings"] = ReplayEngine(coords, step_timeout=5).run(flow, {"username": "08341"})
+            ReplayEngine(coords).run([ReplayStep("dead", "nowhere", timeout=1)])
+        except ReplayTimeout as e:
+            outcome["timeout"] = e.step
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            root.after(0, root.destroy)
+
+    threading.Thread(target=replay, daemon=True).start()
+    root.mainloop()
+
+    if "error" in outcome or "timings" not in outcome:
+        raise SystemExit(f"❌ Self-test failed: {outcome.get('error') or outcome.get('timeout')}")
+    assert outcome.get("timeout") == "dead", "a dead click must raise ReplayTimeout"
+    total = sum(s for _, s in outcome["timings"] if s is not None)
+    print(f"✅ Self-test passed: {len(flow)} steps in {total:.2f}s, dead click timed out as expected")
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="replay coords.json on the browser that is open on screen")
+    run_cmd.add_argument("--username", required=True)
+    run_cmd.add_argument("--password", required=True)
+    run_cmd.add_argument("--coords", default=str(COORDS_FILE))
+    run_cmd.add_argument("--timeout", type=float, default=STEP_TIMEOUT, help="per-step timeout in seconds")
+    sub.add_parser("selftest", help="replay against a local Tk window (use xvfb-run when headless)")
+    args = parser.parse_args()
+
+    if args.command == "selftest":
+        selftest()
+        return
+    engine = ReplayEngine(load_coords(args.coords), step_timeout=args.timeout)
+    try:
+        timings = engine.run(REPLAY_FLOW, {"username": args.username, "password": args.password})
+    except ReplayTimeout as e:
+        raise SystemExit(f"❌ {e}")
+    print(f"✅ Replay finished in {sum(s for _, s in timings if s is not None):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
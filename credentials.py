@@ -0,0 +1,93 @@
+import csv
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# ============ CONFIGURABLE PARAMETERS ============
+USERNAME_COLUMNS = ("username", "user", "id", "email")
+PASSWORD_COLUMNS = ("password", "pass", "pwd")
+ANNOTATION_MARK = "--"  # "123456   -- without otr" → password "123456", tag "without otr"
+USERNAME_PATTERN = re.compile(r"^\S+$")  # No spaces inside a username
+
+# ---------------- PARSING ----------------
+def parse_annotation(value):
+    """Split a trailing ``-- note`` off a cell; returns (value, tags).
+
+    Several notes may be separated by commas. Tags are lower-cased with
+    single spaces and extra dashes dropped, so "---Without  OTR" and
+    "-- without otr" match.
+    """
+    value = (value or "").strip()
+    if ANNOTATION_MARK not in value:
+        return value, frozenset()
+    value, _, note = value.partition(ANNOTATION_MARK)
+    tags = {" ".join(part.strip("-").lower().split()) for part in note.split(",")}
+    return value.strip(), frozenset(tag for tag in tags if tag)
+
+
+def first_column(row, columns):
+    for column in columns:
+        if row.get(column):
+            return row[column]
+    return None
+
+
+class LoadStats:
+    """Row counts from the last pass over a credentials file."""
+
+    def __init__(self):
+        self.rows = 0
+        self.loaded = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.tags = {}
+
+    def summary(self):
+        tags = ", ".join(f"{tag} {n}" for tag, n in sorted(self.tags.items())) or "none"
+        return (f"✅ Loaded {self.loaded} credentials from {self.rows} rows "
+                f"({self.duplicates} duplicates, {self.invalid} invalid skipped) | tags: {tags}")
+
+# ---------------- STREAMING LOADER ----------------
+def iter_credentials(csv_file, stats=None):
+    """Yield ``{'username', 'password', 'tags'}`` one row at a time.
+
+    Annotations on any cell become tags, rows without a usable username or
+    password are skipped with a warning, and a username seen before is
+    dropped (the first row wins). Memory use is one set of usernames, so a
+    50k-row branch list starts feeding the scheduler immediately.
+    """
+    stats = stats if stats is not None else LoadStats()
+    seen = set()
+    with open(csv_file, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.DictReader(file)
+        if reader.fieldnames:
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+        for line, row in enumerate(reader, start=2):
+            stats.rows += 1
+            username, user_tags = parse_annotation(first_column(row, USERNAME_COLUMNS))
+            password, password_tags = parse_annotation(first_column(row, PASSWORD_COLUMNS))
+            if not username or not password or not USERNAME_PATTERN.match(username):
+                stats.invalid += 1
+                logger.warning(f"Line {line}: missing or invalid username/password, skipped")
+                continue
+            if username in seen:
+                stats.duplicates += 1
+                logger.warning(f"Line {line}: duplicate user {username}, skipped")
+                continue
+            seen.add(username)
+            tags = user_tags | password_tags
+            for tag in tags:
+                stats.tags[tag] = stats.tags.get(tag, 0) + 1
+            stats.loaded += 1
+            yield {'username': username, 'password': password, 'tags': tags}
+
+# ---------------- ROUTING ----------------
+def route_by_tags(routes):
+    """Route function for ``RollingScheduler``: the first tag of a user found in ``routes``, else None."""
+    def route(cred):
+        for tag in routes:
+            if tag in cred.get('tags', ()):
+                return tag
+        return None
+    return route
@@ -1,20 +1,34 @@
-import csv
+import logging
+import sys
 import time
+from pathlib import Path
+from urllib.parse import urljoin
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException, ElementClickInterceptedException
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from credentials import LoadStats, iter_credentials
+from day_status import ALREADY_CLOSED_MESSAGE, DayStatusStore
+from driver_pool import DriverPool, start_chrome
+from session_cache import LOGOUT_PATH
+from watchdog import watchdog
+import flows
+import log_pipeline
+import retry
+import waits
+from metrics import step_metrics
+
+log = logging.getLogger(__name__)
 
 # ---------------- CONFIG ----------------
 URL = "https://sandboxerp.shakti.org.bd:8072/Home/Login?ReturnUrl=%2F"
+LOGOUT_URL = urljoin(URL, LOGOUT_PATH)  # Opened before a pooled Chrome is handed to the next user
 CSV_FILE = "creds3.csv"
 WAIT_TIME = 10            # wait for page elements
-POST_CONFIRM_WAIT = 10    # wait after clicking Yes
 MAX_CONCURRENT_SESSIONS = 2
-DAY_CLOSE_MAX_WAIT = 180
-POLL_INTERVAL = 5
+DAY_CLOSE_MAX_WAIT = 180  # max wait for the close to be acknowledged after clicking Yes
+RESULTS_DIR = "results"
+QUIET_CONSOLE = False     # per-session lines only in results/dayclosebutton2_*.log/.jsonl
 
 # ---------------- DRIVER ----------------
 def create_driver():
@@ -26,132 +40,159 @@ def create_driver():
     options.add_argument("--disable-notifications")
     options.add_argument("--disable-popup-blocking")
     options.add_argument("--window-size=1920,1080")
-    driver = webdriver.Chrome(options=options)
+    driver = start_chrome(options)
     driver.set_page_load_timeout(60)
     return driver
 
+# Chrome instances are reused across users instead of relaunched per session
+driver_pool = DriverPool(create_driver, size=MAX_CONCURRENT_SESSIONS, logout_url=LOGOUT_URL)
+
+# Shared login/day-close flow definition; each batch of steps is one WebDriver call
+flow_engine = flows.FlowEngine(default_timeout=WAIT_TIME)
+
+# Per-user day status for today (set in main); reruns skip users already closed
+day_status = None
+
+# Shared by every worker thread: stops new sessions while the ERP is failing
+breaker = retry.CircuitBreaker()
+
 # ---------------- LOGIN + DAY CLOSE FLOW ----------------
 def run_single_session(username, password):
+    """One login + day close; returns a result dict (status, message, reason) like Multipleselem's."""
     start_time = time.time()
-    print(f"\n[{username}] → Starting session")
-    driver = create_driver()
-    driver.get(URL)
+    log.info("[%s] → Starting session", username, extra=log_pipeline.fields(username))
+    steps = step_metrics.timer(username)
+    driver = None
+    broken = False
+    result = {"username": username, "status": "success", "message": "Day close confirmed"}
 
     try:
-        wait = WebDriverWait(driver, WAIT_TIME)
-
-        # --- LOGIN ---
-        username_field = wait.until(EC.presence_of_element_located((By.XPATH, '//*[@id="emailaddress"]')))
-        username_field.clear()
-        username_field.send_keys(username)
+        driver = driver_pool.checkout(owner=username)
+        steps.lap("driver_start")
+        driver.get(URL)
+        steps.lap("page_load")
 
-        password_field = driver.find_element(By.XPATH, '//*[@id="password"]')
-        password_field.clear()
-        password_field.send_keys(password)
-
-        login_btn = wait.until(EC.element_to_be_clickable((By.XPATH, '/html/body/section/div[2]/div/div/div/form/div[5]/button')))
-        driver.execute_script("arguments[0].click();", login_btn)
-
-        # --- WAIT FOR HOMEPAGE ---
-        try:
-            WebDriverWait(driver, WAIT_TIME).until(
-                EC.presence_of_element_located((By.XPATH, '//*[@id="homePage"]/div[1]/div/div[1]/div[7]/a/div/div/p'))
-            )
-            print(f"[{username}] Logged in successfully")
-        except TimeoutException:
-            print(f"[{username}] Homepage not detected but continuing")
-
-        # --- NAVIGATE TO DAY INFORMATION ---
-        mis_menu = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="homePage"]/div[1]/div/div[1]/div[7]/a/div/div/p')))
-        driver.execute_script("arguments[0].click();", mis_menu)
-        time.sleep(1.5)
-
-        day_info = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="02"]/div[2]/div/div[2]/div/ul/li[1]/a')))
-        driver.execute_script("arguments[0].click();", day_info)
-        time.sleep(2)
-
-        # --- CLICK DAY CLOSE BUTTON ---
+        # --- LOGIN (fill, submit, optional modal, homepage) ---
         try:
-            close_btn = wait.until(
-                EC.element_to_be_clickable((By.XPATH, '//*[@id="day-information"]/div[1]/div/div/div[3]/div/button'))
-            )
-            driver.execute_script("arguments[0].scrollIntoView(true);", close_btn)
-            time.sleep(0.5)
-            driver.execute_script("arguments[0].click();", close_btn)
-            print(f"[{username}] Clicked Day Close button")
-        except (TimeoutException, NoSuchElementException):
-            print(f"[{username}] ❌ No Day Close button found — possibly already closed")
-            driver.quit()
-            return
-
-        # --- CLICK CONFIRMATION YES BUTTON ---
+            login = flow_engine.run(driver, flows.LOGIN_FLOW, {"username": username, "password": password},
+                                    name="login")
+            steps.extend(login.timings)
+            log.info("[%s] Logged in successfully", username, extra=log_pipeline.fields(username, step="login"))
+        except flows.FlowTimeout as e:
+            if e.step != "homepage":
+                raise
+            steps.extend(e.timings)
+            log.warning("[%s] Homepage not detected but continuing", username,
+                        extra=log_pipeline.fields(username, step="homepage"))
+
+        # --- MIS → DAY INFORMATION → DAY CLOSE → YES → CONFIRMATION ---
         try:
-            print(f"[{username}] Waiting for confirmation modal...")
-            yes_btn = WebDriverWait(driver, WAIT_TIME).until(
-                EC.element_to_be_clickable((By.XPATH, '//*[@id="dayOpenConfirmation"]/div/div/div[3]/button[2]'))
-            )
-            driver.execute_script("arguments[0].scrollIntoView(true);", yes_btn)
-            time.sleep(0.8)
-            driver.execute_script("arguments[0].click();", yes_btn)
-            print(f"[{username}] ✅ Clicked confirmation 'Yes'")
-        except (TimeoutException, ElementClickInterceptedException):
-            # fallback
-            try:
-                time.sleep(2)
-                yes_btn = driver.find_element(By.XPATH, '//*[@id="dayOpenConfirmation"]/div/div/div[3]/button[2]')
-                driver.execute_script("arguments[0].click();", yes_btn)
-                print(f"[{username}] ✅ Clicked confirmation 'Yes' (via fallback)")
-            except Exception:
-                print(f"[{username}] ❌ Could not click confirmation 'Yes'")
-
-        # --- WAIT FOR CONFIRMATION SUCCESS ---
-        time.sleep(POST_CONFIRM_WAIT)
-        confirmed = False
-        for _ in range(0, DAY_CLOSE_MAX_WAIT, POLL_INTERVAL):
-            try:
-                success_message = driver.find_elements(By.XPATH, "//div[contains(text(),'Day Closed Successfully')]")
-                if success_message:
-                    print(f"[{username}] ✅ Day Close confirmed via success message")
-                    confirmed = True
-                    break
-
-                close_btn_check = driver.find_elements(By.XPATH, '//*[@id="day-information"]/div[1]/div/div/div[3]/div/button')
-                if not close_btn_check or not close_btn_check[0].is_enabled():
-                    print(f"[{username}] ✅ Day Close confirmed (button disappeared/disabled)")
-                    confirmed = True
-                    break
-            except Exception:
-                pass
-            time.sleep(POLL_INTERVAL)
-
-        if not confirmed:
-            print(f"[{username}] ⚠ Day Close not confirmed — backend may still be processing")
-
-        print(f"[{username}] ✓ Session completed in {time.time() - start_time:.2f}s")
+            day_close = flow_engine.run(driver, flows.DAY_CLOSE_FLOW, name="day_close",
+                                        timeouts={"verification": DAY_CLOSE_MAX_WAIT})
+        except flows.FlowTimeout as e:
+            if e.step != "close_click":
+                raise
+            steps.extend(e.timings)  # MIS and Day Information did run
+            log.warning("[%s] ❌ No Day Close button found — possibly already closed", username,
+                        extra=log_pipeline.fields(username, step="close_click"))
+            result.update(status="failure", message="No Day Close button found — possibly already closed",
+                          reason=retry.OTHER)
+            return result
+        steps.extend(day_close.timings)
+        if day_close.stopped == "close_click":
+            log.info("[%s] ✅ Day Close button disabled — already closed", username,
+                     extra=log_pipeline.fields(username, step="close_click"))
+            result["message"] = ALREADY_CLOSED_MESSAGE
+        elif day_close.ok:
+            log.info("[%s] ✅ Day Close confirmed (success message or button disabled)", username,
+                     extra=log_pipeline.fields(username, step="verification"))
+        else:
+            log.warning("[%s] ⚠ Day Close not confirmed — backend may still be processing", username,
+                        extra=log_pipeline.fields(username, step="verification"))
+            result.update(status="failure", message="Day close not confirmed", reason=retry.NOT_ACKNOWLEDGED)
+
+        log.info("[%s] ✓ Session completed in %.2fs", username, time.time() - start_time,
+                 extra=log_pipeline.fields(username))
 
     except Exception as e:
-        print(f"[{username}] ✗ Error: {e}")
+        log.error("[%s] ✗ Error: %s", username, e, extra=log_pipeline.fields(username, step=getattr(e, "step", None)))
+        steps.extend(getattr(e, "timings", ()))  # Steps a FlowTimeout got through before failing
+        result.update(status="error", message=str(e), reason=retry.reason_for_exception(e))
+        broken = True
 
     finally:
-        driver.quit()
+        if driver is not None:  # None if checkout timed out or Chrome failed to start
+            driver_pool.checkin(driver, broken=broken)
+        if day_status is not None:
+            day_status.record_result(result)
+    return result
+
+
+def run_with_retries(username, password):
+    """run_single_session, retried with exponential backoff on retryable failures."""
+    for attempt in range(retry.MAX_RETRIES + 1):
+        breaker.wait_until_allowed()
+        started = time.perf_counter()
+        result = run_single_session(username, password)
+        breaker.record(result, time.perf_counter() - started)
+        reason = retry.classify(result)
+        if reason not in retry.RETRYABLE or attempt == retry.MAX_RETRIES:
+            return result
+        delay = retry.backoff_delay(attempt + 1)
+        log.info("[%s] 🔁 Retry %s/%s (%s) in %.1fs", username, attempt + 1, retry.MAX_RETRIES, reason, delay,
+                 extra=log_pipeline.fields(username, attempt=attempt + 1))
+        time.sleep(delay)
 
 # ---------------- MAIN ----------------
 def main():
-    users = []
-    with open(CSV_FILE, newline='') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            if row.get("username") and row.get("password"):
-                users.append((row["username"], row["password"]))
+    global day_status
+    log_pipeline.setup(RESULTS_DIR, f"dayclosebutton2_{time.strftime('%Y%m%d_%H%M%S')}", quiet=QUIET_CONSOLE,
+                       console_format="%(message)s")
+    watchdog.install()
+    stats = LoadStats()
+    users = [(c['username'], c['password']) for c in iter_credentials(CSV_FILE, stats)]
+    print(stats.summary())
+
+    day_status = DayStatusStore(f"{RESULTS_DIR}/day_status.db")
+    pending = [(u, p) for u, p in users if not day_status.is_closed(u)]
+    print(f"{len(users) - len(pending)} users already closed for {day_status.business_date}, skipping them")
+    users = pending
 
     print(f"Launching {len(users)} users with {MAX_CONCURRENT_SESSIONS} concurrent sessions...\n")
+    failed = []
 
-    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SESSIONS) as executor:
-        futures = [executor.submit(run_single_session, u, p) for u, p in users]
-        for future in as_completed(futures):
-            pass
-
-    print("\n✅ All sessions completed successfully.")
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SESSIONS) as executor:
+            futures = {executor.submit(run_with_retries, u, p): u for u, p in users}
+            for future in as_completed(futures):
+                username = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    log.error("[%s] ✗ Worker crashed: %s", username, e, exc_info=True,
+                              extra=log_pipeline.fields(username))
+                    result = {"username": username, "status": "error", "message": str(e)}
+                    day_status.record_result(result)
+                if result["status"] != "success":
+                    failed.append(username)
+    finally:
+        driver_pool.close()
+
+    print(day_status.summary())
+    print(breaker.summary())
+    day_status.close()
+    print(driver_pool.summary())
+    print(watchdog.summary())
+    print(waits.wait_stats.summary())
+    print(step_metrics.summary())
+    print(flows.flow_stats.summary())
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    step_metrics.write_json(f"{RESULTS_DIR}/dayclosebutton2_metrics_{stamp}.json")
+    step_metrics.write_prometheus(f"{RESULTS_DIR}/dayclosebutton2_metrics_{stamp}.prom")
+    if failed:
+        print(f"\n⚠️  {len(failed)} of {len(users)} users not closed: {', '.join(sorted(failed))}")
+    else:
+        print("\n✅ All sessions completed successfully.")
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,9 @@
 import csv
+import logging
+import sys
 import time
+from pathlib import Path
+from urllib.parse import urljoin
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from selenium import webdriver
 from selenium.webdriver.common.by import By
@@ -8,13 +12,25 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from driver_pool import DriverPool, start_chrome
+from session_cache import LOGOUT_PATH
+from watchdog import watchdog
+import waits
+import log_pipeline
+
+log = logging.getLogger(__name__)
+
 # ---------------- CONFIG ----------------
 URL = "https://sandboxerp.shakti.org.bd:8072/Home/Login?ReturnUrl=%2F"
+LOGOUT_URL = urljoin(URL, LOGOUT_PATH)  # Opened before a pooled Chrome is handed to the next user
 CSV_FILE = "creds3.csv"
 WAIT_TIME = 8
 SHORT_WAIT = 2
 INITIAL_POPUP_WAIT = 5
 MAX_CONCURRENT_SESSIONS = 5   # <-- how many browsers to run in parallel
+RESULTS_DIR = "results"
+QUIET_CONSOLE = False         # per-session lines only in results/openclosebutton_*.log/.jsonl
 
 # ---------------- DRIVER (Headless Only) ----------------
 def create_headless_driver():
@@ -26,18 +42,22 @@ def create_headless_driver():
     options.add_argument("--disable-notifications")
     options.add_argument("--disable-popup-blocking")
     options.add_argument("--window-size=1920,1080")
-    driver = webdriver.Chrome(options=options)
+    driver = start_chrome(options)
     return driver
 
+# Chrome instances are reused across users instead of relaunched per session
+driver_pool = DriverPool(create_headless_driver, size=MAX_CONCURRENT_SESSIONS, logout_url=LOGOUT_URL)
+
 # ---------------- LOGIN FLOW ----------------
 def run_single_session(username, password):
     start_time = time.time()
-    print(f"[{username}] → Starting session")
-    driver = create_headless_driver()
-    driver.get(URL)
+    log.info("[%s] → Starting session", username, extra=log_pipeline.fields(username))
+    driver = driver_pool.checkout(owner=username)
+    broken = False
 
     try:
-        wait = WebDriverWait(driver, WAIT_TIME)
+        driver.get(URL)
+        wait = WebDriverWait(driver, WAIT_TIME, poll_frequency=waits.POLL_FREQUENCY)
 
         # login
         username_field = wait.until(EC.presence_of_element_located((By.XPATH, '//*[@id="emailaddress"]')))
@@ -51,12 +71,12 @@ def run_single_session(username, password):
 
         # wait for homepage
         try:
-            WebDriverWait(driver, INITIAL_POPUP_WAIT).until(
-                EC.presence_of_element_located((By.XPATH, '//*[@id="homePage"]/div[1]/div/div[1]/div[7]/a/div/div/p'))
-            )
-            print(f"[{username}] Logged in successfully")
+            waits.until(driver, EC.presence_of_element_located(
+                (By.XPATH, '//*[@id="homePage"]/div[1]/div/div[1]/div[7]/a/div/div/p')), INITIAL_POPUP_WAIT, "homepage")
+            log.info("[%s] Logged in successfully", username, extra=log_pipeline.fields(username, step="login"))
         except TimeoutException:
-            print(f"[{username}] Homepage not detected but continuing")
+            log.warning("[%s] Homepage not detected but continuing", username,
+                        extra=log_pipeline.fields(username, step="homepage"))
 
         # navigate to MIS → Day Information
         mis_menu = wait.until(EC.element_to_be_clickable((By.XPATH, '//*[@id="homePage"]/div[1]/div/div[1]/div[7]/a/div/div/p')))
@@ -65,29 +85,37 @@ def run_single_session(username, password):
         driver.execute_script("arguments[0].click();", day_info)
 
        # try to click Day Open / Close
+        waits.track_network(driver)
         try:
             open_btn = driver.find_element(By.XPATH, '//*[@id="day-information"]/div[1]/div/div/div[3]/div/button')
             driver.execute_script("arguments[0].click();", open_btn)
-            print(f"[{username}] Clicked Day Open")
+            log.info("[%s] Clicked Day Open", username, extra=log_pipeline.fields(username, step="day_open"))
         except NoSuchElementException:
             try:
                 close_btn = driver.find_element(By.XPATH, '//*[@id="day-information"]/div[1]/div/div/div[3]/div/button[2]')
                 driver.execute_script("arguments[0].click();", close_btn)
-                print(f"[{username}] Clicked Day Close")
+                log.info("[%s] Clicked Day Close", username, extra=log_pipeline.fields(username, step="day_close"))
             except NoSuchElementException:
-                print(f"[{username}] No Day Open/Close button found")
+                log.warning("[%s] No Day Open/Close button found", username,
+                            extra=log_pipeline.fields(username, step="day_open_close"))
 
-        time.sleep(0.5)
-        print(f"[{username}] ✓ Session completed in {time.time()-start_time:.2f}s")
+        # let the open/close request finish instead of a fixed sleep
+        waits.until_js(driver, waits.network_idle(), SHORT_WAIT, "network_idle")
+        log.info("[%s] ✓ Session completed in %.2fs", username, time.time() - start_time,
+                 extra=log_pipeline.fields(username))
 
     except Exception as e:
-        print(f"[{username}] ✗ Error: {e}")
+        log.error("[%s] ✗ Error: %s", username, e, extra=log_pipeline.fields(username))
+        broken = True
     finally:
-        driver.quit() 
+        driver_pool.checkin(driver, broken=broken) 
        
        
 # ---------------- MAIN ----------------
 def main():
+    log_pipeline.setup(RESULTS_DIR, f"openclosebutton_{time.strftime('%Y%m%d_%H%M%S')}", quiet=QUIET_CONSOLE,
+                       console_format="%(message)s")
+    watchdog.install()
     users = []
     with open(CSV_FILE, newline='') as csvfile:
         reader = csv.DictReader(csvfile)
@@ -97,11 +125,17 @@ def main():
 
     print(f"Launching {len(users)} users with {MAX_CONCURRENT_SESSIONS} concurrent sessions...\n")
 
-    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SESSIONS) as executor:
-        futures = [executor.submit(run_single_session, u, p) for u, p in users]
-        for future in as_completed(futures):
-            pass  # just wait for all to finish
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_SESSIONS) as executor:
+            futures = [executor.submit(run_single_session, u, p) for u, p in users]
+            for future in as_completed(futures):
+                pass  # just wait for all to finish
+    finally:
+        driver_pool.close()
 
+    print(driver_pool.summary())
+    print(watchdog.summary())
+    print(waits.wait_stats.summary())
     print("\n✅ Load test completed.")
 
 if __name__ == "__main__":
@@ -0,0 +1,99 @@
+import sqlite3
+import threading
+from datetime import date, datetime
+from pathlib import Path
+
+# ============ CONFIGURABLE PARAMETERS ============
+DB_FILE = "results/day_status.db"
+OPEN = "open"
+CLOSE_PENDING = "close_pending"  # Yes was clicked but the ERP never acknowledged it
+CLOSED = "closed"
+ALREADY_CLOSED_MESSAGE = "Day already closed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS day_status (
+    username      TEXT NOT NULL,
+    business_date TEXT NOT NULL,
+    status        TEXT NOT NULL,
+    updated_at    TEXT NOT NULL,
+    confirmed_at  TEXT,
+    message       TEXT,
+    PRIMARY KEY (username, business_date)
+)
+"""
+
+# ---------------- DAY STATUS STORE ----------------
+class DayStatusStore:
+    """Last known day status per user and business date, kept in a local SQLite file.
+
+    Closed users for the business date are loaded once and kept in a set, so
+    the scheduler can ask ``is_closed`` on every dispatch without a query.
+    """
+
+    def __init__(self, path=DB_FILE, business_date=None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.business_date = business_date or date.today().isoformat()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # Sharded processes can share one file
+        self._conn.execute(SCHEMA)
+        self._conn.commit()
+        self._closed = {row[0] for row in self._conn.execute(
+            "SELECT username FROM day_status WHERE business_date = ? AND status = ?",
+            (self.business_date, CLOSED))}
+
+    def mark(self, username, status, message=""):
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            # Never downgrade a confirmed close for the same business date
+            self._conn.execute(
+                """INSERT INTO day_status (username, business_date, status, updated_at, confirmed_at, message)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (username, business_date) DO UPDATE SET
+                       status = excluded.status, updated_at = excluded.updated_at,
+                       confirmed_at = COALESCE(excluded.confirmed_at, day_status.confirmed_at),
+                       message = excluded.message
+                   WHERE day_status.status != ?""",
+                (username, self.business_date, status, now, now if status == CLOSED else None, message, CLOSED))
+            self._conn.commit()
+            if status == CLOSED:
+                self._closed.add(username)
+
+    def record_result(self, result):
+        """Update the store from one attempt's result dict."""
+        if result['status'] == 'success':
+            self.mark(result['username'], CLOSED, result.get('message', ''))
+        elif result['status'] == 'failure':
+            self.mark(result['username'], CLOSE_PENDING, result.get('message', ''))
+        else:
+            self.mark(result['username'], OPEN, result.get('message', ''))
+
+    def is_closed(self, username):
+        return username in self._closed
+
+    def pending(self, creds):
+        """Credentials whose day is not yet closed for the business date."""
+        return [c for c in creds if c['username'] not in self._closed]
+
+    def status(self, username):
+        """(status, confirmed_at) for the business date, or None if never seen."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT status, confirmed_at FROM day_status WHERE username = ? AND business_date = ?",
+                (username, self.business_date)).fetchone()
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM day_status WHERE business_date = ? GROUP BY status",
+                (self.business_date,)).fetchall())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def summary(self):
+        counts = self.counts()
+        return (f"🗓️  Day status {self.business_date}: {counts.get(CLOSED, 0)} closed, "
+                f"{counts.get(CLOSE_PENDING, 0)} close pending, {counts.get(OPEN, 0)} open")
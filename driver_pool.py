@@ -0,0 +1,307 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from selenium import webdriver
+from selenium.common.exceptions import SessionNotCreatedException
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.selenium_manager import SeleniumManager
+
+from watchdog import kill_tree, watchdog
+
+logger = logging.getLogger(__name__)
+
+# ============ CONFIGURABLE PARAMETERS ============
+MAX_USES_PER_DRIVER = 25  # Recycle a Chrome instance after this many checkouts
+CHECKOUT_TIMEOUT = 120  # Seconds to wait for a free driver before giving up
+BLANK_PAGE = "about:blank"
+DRIVER_PATH_FILE = "results/chromedriver_path.txt"  # Selenium Manager's answer, reused by later runs and shards
+
+# ---------------- CHROMEDRIVER RESOLUTION ----------------
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def chromedriver_path(refresh=False):
+    """Path of the chromedriver binary, resolved by Selenium Manager once per machine.
+
+    ``webdriver.Chrome()`` without a service runs Selenium Manager on every
+    launch; the answer is kept in memory and in ``DRIVER_PATH_FILE`` instead.
+    """
+    global _driver_path
+    with _driver_path_lock:
+        cache = Path(DRIVER_PATH_FILE)
+        if _driver_path is None and not refresh and cache.exists():
+            cached = cache.read_text(encoding='utf-8').strip()
+            if cached and Path(cached).exists():
+                _driver_path = cached
+        if _driver_path is None or refresh:
+            start = time.perf_counter()
+            _driver_path = SeleniumManager().binary_paths(["--browser", "chrome"])["driver_path"]
+            logger.info(f"🔎 chromedriver resolved in {time.perf_counter() - start:.2f}s: {_driver_path}")
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            cache.write_text(_driver_path, encoding='utf-8')
+        return _driver_path
+
+
+def _launch(options, path):
+    """One ``webdriver.Chrome`` launch, tracked by the watchdog; kills the half-started tree if it fails."""
+    service = Service(path)
+    launched = time.time()
+    try:
+        driver = webdriver.Chrome(options=options, service=service)
+    except Exception:
+        # Chrome() raised, so there is no driver to quit(): chromedriver and the Chrome it spawned would leak
+        if service.process is not None:
+            kill_tree(service.process.pid)
+        watchdog.reap_orphans(since=launched)  # Chrome outlives a chromedriver Selenium already stopped
+        raise
+    watchdog.track_driver(driver)
+    return driver
+
+
+def start_chrome(options):
+    """``webdriver.Chrome`` on the cached chromedriver; re-resolves once if Chrome was updated under it."""
+    try:
+        return _launch(options, chromedriver_path())
+    except SessionNotCreatedException as e:
+        logger.warning(f"⚠️  Cached chromedriver rejected ({e.msg}); resolving again")
+        return _launch(options, chromedriver_path(refresh=True))
+
+
+def take_preloaded(driver, url):
+    """True (once) if ``warm_up`` left ``driver`` on ``url``, so the caller can skip loading it."""
+    preloaded = getattr(driver, "_pool_preloaded", None) == url
+    driver._pool_preloaded = None
+    return preloaded
+
+# ---------------- POOLED DRIVER ----------------
+class PooledDriver:
+    """A live WebDriver plus the bookkeeping the pool needs to recycle it."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.uses = 0
+        self.created_at = time.time()
+
+
+# ---------------- DRIVER POOL ----------------
+class DriverPool:
+    """Bounded pool of warm Chrome drivers shared across worker threads.
+
+    ``factory`` is a zero-argument callable returning a new WebDriver; each
+    entry point keeps its own Chrome options and hands its factory to the pool.
+    With ``logout_url`` every reset opens it first, ending the previous user's
+    ERP session; without it the reset only clears cookies and storage.
+    """
+
+    def __init__(self, factory, size, max_uses=MAX_USES_PER_DRIVER, logout_url=None):
+        self.factory = factory
+        self.size = size
+        self.max_uses = max_uses
+        self.logout_url = logout_url
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._live = 0
+        self._closed = False
+        self._owners = {}
+        self.cold_starts = []
+        self.warm_checkouts = []
+        self.recycled = 0
+        self.warmed = 0
+        self.warmup_seconds = 0.0
+
+    # ---------------- CHECKOUT / CHECKIN ----------------
+    def checkout(self, timeout=CHECKOUT_TIMEOUT, owner=None):
+        """Return a clean driver, reusing an idle one or starting a new one.
+
+        ``owner`` (the username) is shown by the watchdog if the session hangs.
+        """
+        start = time.perf_counter()
+        deadline = start + timeout
+        warm = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+                break
+            except queue.Empty:
+                pass
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                can_start = self._live < self.size
+                if can_start:
+                    self._live += 1
+            if can_start:
+                warm = False
+                pooled = self._start_driver()
+                break
+            # Pool is full: wait for a checkin (or a retirement freeing a slot)
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise TimeoutError(f"No driver became free within {timeout}s")
+            try:
+                pooled = self._idle.get(timeout=min(remaining, 0.5))
+                break
+            except queue.Empty:
+                continue
+
+        if warm:
+            self.warm_checkouts.append(time.perf_counter() - start)
+        pooled.uses += 1
+        with self._lock:
+            self._owners[id(pooled.driver)] = pooled
+        watchdog.busy(pooled.driver, owner)
+        return pooled.driver
+
+    def checkin(self, driver, broken=False):
+        """Return a driver to the pool; broken or worn-out drivers are recycled."""
+        with self._lock:
+            pooled = self._owners.pop(id(driver), None)
+        watchdog.idle(driver)
+        if pooled is None:
+            logger.warning("⚠️  Checkin of a driver not owned by this pool; quitting it")
+            self._quit(driver)
+            return
+
+        if broken or pooled.uses >= self.max_uses or self._closed:
+            self._retire(pooled)
+            return
+
+        try:
+            self._reset(driver)
+        except Exception as e:
+            logger.warning(f"⚠️  Driver reset failed, recycling: {e}")
+            self._retire(pooled)
+            return
+        self._idle.put(pooled)
+
+    @contextmanager
+    def driver(self):
+        """Check a driver out for the duration of a ``with`` block."""
+        driver = self.checkout()
+        broken = False
+        try:
+            yield driver
+        except Exception:
+            broken = True
+            raise
+        finally:
+            self.checkin(driver, broken=broken)
+
+    # ---------------- LIFECYCLE ----------------
+    def _start_driver(self):
+        start = time.perf_counter()
+        try:
+            driver = self.factory()
+        except Exception:
+            with self._lock:
+                self._live -= 1
+            raise
+        self.cold_starts.append(time.perf_counter() - start)
+        return PooledDriver(driver)
+
+    def warm_up(self, count=None, url=None):
+        """Start ``count`` drivers (default: the pool size) in parallel and park them idle.
+
+        With ``url`` each one loads that page first (see ``take_preloaded``).
+        Drivers that fail to start are left for a normal cold start later.
+        Returns how many drivers were warmed.
+        """
+        count = min(count or self.size, self.size)
+        start = time.perf_counter()
+
+        def start_one(_):
+            with self._lock:
+                if self._closed or self._live >= self.size:
+                    return False
+                self._live += 1
+            try:
+                pooled = self._start_driver()
+            except Exception as e:
+                logger.warning(f"⚠️  Warm-up driver failed to start: {e}")
+                return False
+            if url:
+                try:
+                    pooled.driver.get(url)
+                    pooled.driver._pool_preloaded = url
+                except Exception as e:
+                    logger.warning(f"⚠️  Warm-up page load failed: {e}")
+                    self._retire(pooled)
+                    return False
+            self._idle.put(pooled)
+            return True
+
+        if count > 0:
+            with ThreadPoolExecutor(max_workers=count) as executor:
+                warmed = sum(executor.map(start_one, range(count)))
+            self.warmed += warmed
+            self.warmup_seconds += time.perf_counter() - start
+            return warmed
+        return 0
+
+    def _reset(self, driver):
+        """Log out and wipe cookies and storage so the next user starts clean."""
+        driver._pool_preloaded = None
+        if self.logout_url:
+            driver.get(self.logout_url)
+        try:
+            driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except Exception:
+            pass  # about:blank and error pages have no storage
+        driver.delete_all_cookies()
+        driver.get(BLANK_PAGE)
+
+    def _retire(self, pooled):
+        self.recycled += 1
+        self._quit(pooled.driver)
+        with self._lock:
+            self._live -= 1
+
+    @staticmethod
+    def _quit(driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.debug(f"driver.quit() failed: {e}")
+        watchdog.release_driver(driver)  # Kills whatever Chrome left behind
+
+    def close(self):
+        """Quit every idle driver and refuse further checkouts."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(pooled.driver)
+            with self._lock:
+                self._live -= 1
+
+    # ---------------- REPORTING ----------------
+    def stats(self):
+        """Cold-start vs warm-checkout latency figures."""
+        def avg(values):
+            return sum(values) / len(values) if values else 0.0
+
+        return {
+            "cold_starts": len(self.cold_starts),
+            "cold_start_avg": avg(self.cold_starts),
+            "warm_checkouts": len(self.warm_checkouts),
+            "warm_checkout_avg": avg(self.warm_checkouts),
+            "recycled": self.recycled,
+            "warmed": self.warmed,
+            "warmup_seconds": self.warmup_seconds,
+        }
+
+    def summary(self):
+        s = self.stats()
+        warm_up = f"🌅 Pre-warmed: {s['warmed']} in {s['warmup_seconds']:.2f}s | " if s['warmed'] else ""
+        return (warm_up + f"🧊 Cold starts: {s['cold_starts']} (avg {s['cold_start_avg']:.2f}s) | "
+                f"🔥 Warm checkouts: {s['warm_checkouts']} (avg {s['warm_checkout_avg']:.3f}s) | "
+                f"♻️  Recycled: {s['recycled']}")
@@ -0,0 +1,289 @@
+import json
+import threading
+import time
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+import waits
+
+# ============ CONFIGURABLE PARAMETERS ============
+DEFAULT_STEP_TIMEOUT = 20  # Seconds a step waits for its element or condition
+NAVIGATION_RETRIES = 3  # Re-issue a batch this many times if the page unloads under it
+
+# ---------------- LOCATORS ----------------
+# One set of locators for every entry point; anchored on ids where the ERP has them
+LOGIN_USERNAME = "#emailaddress"
+LOGIN_PASSWORD = "#password"
+LOGIN_BUTTON = "/html/body/section/div[2]/div/div/div/form/div[5]/button"
+RESPONSE_MODAL_OK = '//*[@id="responseModal"]/div/div/div[3]/button'
+MIS_TILE = '//*[@id="homePage"]/div[1]/div/div[1]/div[7]/a/div'
+DAY_OPEN_CLOSE_LINK = '//*[@id="02"]/div[2]/div/div[2]/div/ul/li[1]/a'
+DAY_CLOSE_BUTTON = '//*[@id="day-information"]/div[1]/div/div/div[3]/div/button'
+CONFIRM_YES = '//*[@id="dayOpenConfirmation"]/div/div/div[3]/button[2]'
+SUCCESS_TEXT = "Day Closed Successfully"
+
+# ---------------- FLOW DEFINITION ----------------
+class Step:
+    """One declarative step.
+
+    With a ``target`` the step waits until that element is displayed and
+    enabled (and ``settle`` element id has finished fading in), then fills it
+    with ``values[fill]`` and/or clicks it. With ``expect`` (a JS expression,
+    see ``waits``) it waits for that success condition instead. ``optional``
+    steps that time out are skipped; ``navigates`` marks a click that loads a
+    new page, which ends the current batch (if the page is updated over XHR
+    instead, the next batch starts once the URL changes or its elements
+    appear). If ``stop_if`` (a JS expression) holds while waiting, the flow
+    ends there without error (``result.stopped``).
+    """
+
+    def __init__(self, name, target=None, fill=None, click=False, settle=None, track_network=False,
+                 expect=None, optional=False, navigates=False, stop_if=None, timeout=None):
+        self.name = name
+        self.target = target
+        self.fill = fill
+        self.click = click
+        self.settle = settle
+        self.track_network = track_network
+        self.expect = expect
+        self.optional = optional
+        self.navigates = navigates
+        self.stop_if = stop_if
+        self.timeout = timeout
+
+
+LOGIN_FLOW = [
+    Step("fill_username", LOGIN_USERNAME, fill="username"),
+    Step("fill_password", LOGIN_PASSWORD, fill="password"),
+    Step("login", LOGIN_BUTTON, click=True, navigates=True),
+    Step("modal", RESPONSE_MODAL_OK, click=True, optional=True, timeout=3),
+    Step("homepage", MIS_TILE),
+]
+
+DAY_CLOSE_FLOW = [
+    Step("mis_nav", MIS_TILE, click=True),
+    Step("day_open_close_nav", DAY_OPEN_CLOSE_LINK, click=True),
+    Step("close_click", DAY_CLOSE_BUTTON, click=True, stop_if=waits.xpath_disabled(DAY_CLOSE_BUTTON)),
+    Step("confirm", CONFIRM_YES, click=True, settle="dayOpenConfirmation", track_network=True),
+    Step("verification", expect=waits.any_of(waits.text_present(SUCCESS_TEXT),
+                                              waits.xpath_gone_or_disabled(DAY_CLOSE_BUTTON))),
+]
+
+
+def batches(flow):
+    """Split a flow into runs of steps that can share one execute_async_script call.
+
+    Everything up to and including a navigating click runs in one call; the
+    next call starts on the new page.
+    """
+    batch = []
+    for step in flow:
+        batch.append(step)
+        if step.navigates:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# ---------------- IN-PAGE RUNNER ----------------
+RUNNER_JS = """
+const done = arguments[arguments.length - 1];
+const values = arguments[0];
+const find = (loc) => (loc[0] === '/' || loc[0] === '(')
+    ? document.evaluate(loc, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue
+    : document.querySelector(loc);
+const settled = (id) => {
+    const el = document.getElementById(id);
+    if (!el) return false;
+    const style = getComputedStyle(el);
+    return style.display !== 'none' && style.opacity === '1';
+};
+const ready = (step) => {
+    const el = find(step.target);
+    if (!el || el.offsetParent === null || el.disabled) return null;
+    return (!step.settle || settled(step.settle)) ? el : null;
+};
+const trackNetwork = () => { %(track_js)s };
+const waitFor = (check, ms) => new Promise((resolve) => {
+    const attempt = () => { try { return check(); } catch (e) { return null; } };
+    const first = attempt();
+    if (first) { resolve(first); return; }
+    let finished = false;
+    const finish = (value) => {
+        if (finished) return;
+        finished = true;
+        observer.disconnect(); clearInterval(tick); clearTimeout(timer);
+        resolve(value);
+    };
+    const observer = new MutationObserver(() => { const v = attempt(); if (v) finish(v); });
+    const tick = setInterval(() => { const v = attempt(); if (v) finish(v); }, %(tick_ms)d);
+    const timer = setTimeout(() => finish(null), ms);
+    observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+});
+const steps = [%(steps)s];
+(async () => {
+    if (window.__dcFlowNav) {
+        // The previous batch ended on a click expected to load a new page, and this is still the old one.
+        // A real page load ends this script and the batch is run again on the new page (FlowEngine._execute);
+        // if the click was handled over XHR instead, go on once the URL changes or this batch's elements appear.
+        const from = window.__dcFlowNav;
+        const inPlace = () => location.href !== from || steps.some((s) => s.expect ? s.expect() : ready(s));
+        if (!await waitFor(inPlace, %(nav_timeout)d)) return done({ok: false, step: 'navigation', timings: []});
+        window.__dcFlowNav = null;
+    }
+    const timings = [];
+    let last = performance.now();
+    for (const step of steps) {
+        if (step.expect) {
+            if (!await waitFor(step.expect, step.timeout)) return done({ok: false, step: step.name, timings});
+        } else {
+            const el = await waitFor(() => (step.stopIf && step.stopIf()) ? 'stop' : ready(step), step.timeout);
+            if (el === 'stop') return done({ok: true, step: null, stopped: step.name, timings});
+            if (!el && !step.optional) return done({ok: false, step: step.name, timings});
+            if (el && step.fill !== null) {
+                el.focus();
+                el.value = values[step.fill];
+                el.dispatchEvent(new Event('input', {bubbles: true}));
+                el.dispatchEvent(new Event('change', {bubbles: true}));
+            }
+            if (el && step.track) trackNetwork();
+            if (el && step.navigates) window.__dcFlowNav = location.href;
+            if (el && step.click) el.click();
+        }
+        const now = performance.now();
+        timings.push([step.name, (now - last) / 1000]);
+        last = now;
+    }
+    done({ok: true, step: null, timings});
+})();
+"""
+
+
+def step_literal(step, timeout):
+    expect = f"() => ({step.expect})" if step.expect else "null"
+    stop_if = f"() => ({step.stop_if})" if step.stop_if else "null"
+    return ("{" + f"name: {json.dumps(step.name)}, target: {json.dumps(step.target)}, "
+            f"fill: {json.dumps(step.fill)}, click: {json.dumps(step.click)}, "
+            f"settle: {json.dumps(step.settle)}, track: {json.dumps(step.track_network)}, "
+            f"optional: {json.dumps(step.optional)}, navigates: {json.dumps(step.navigates)}, "
+            f"expect: {expect}, stopIf: {stop_if}, timeout: {int(timeout * 1000)}" + "}")
+
+# ---------------- ENGINE ----------------
+class FlowTimeout(TimeoutException):
+    """A required step's element never became ready; ``timings`` has the steps that did run."""
+
+    def __init__(self, step, flow, timings=()):
+        super().__init__(f"{flow}: step '{step}' timed out")
+        self.step = step
+        self.timings = list(timings)
+
+
+class FlowResult:
+    def __init__(self, name):
+        self.name = name
+        self.ok = True
+        self.failed_step = None  # Name of the ``expect`` step that was not met
+        self.stopped = None  # Name of the step whose ``stop_if`` ended the flow
+        self.round_trips = 0
+        self.timings = []  # (step, seconds) measured inside the page
+
+
+class FlowStats:
+    """WebDriver round-trips per flow run, to compare against one command per wait/click."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flows = {}
+
+    def record(self, name, round_trips):
+        with self._lock:
+            entry = self._flows.setdefault(name, {"runs": 0, "round_trips": 0, "max": 0})
+            entry["runs"] += 1
+            entry["round_trips"] += round_trips
+            entry["max"] = max(entry["max"], round_trips)
+
+    def reset(self):
+        with self._lock:
+            self._flows.clear()
+
+    def to_dict(self):
+        with self._lock:
+            return {name: dict(e, avg=round(e["round_trips"] / e["runs"], 2)) for name, e in self._flows.items()}
+
+    def summary(self):
+        return "\n".join(f"🔁 {name}: {e['avg']:.2f} round-trips/run (max {e['max']}, {e['runs']} runs)"
+                         for name, e in self.to_dict().items())
+
+flow_stats = FlowStats()
+
+
+class FlowEngine:
+    """Runs declarative flows with as few WebDriver calls as the page allows."""
+
+    def __init__(self, default_timeout=DEFAULT_STEP_TIMEOUT, stats=flow_stats):
+        self.default_timeout = default_timeout
+        self.stats = stats
+
+    def run(self, driver, flow, values=None, name="flow", timeouts=None):
+        """Run ``flow`` on ``driver``; ``timeouts`` overrides per-step timeouts by step name.
+
+        Raises FlowTimeout if a required element never shows up. An unmet
+        ``expect`` step is not an exception: it comes back as ``ok=False``.
+        """
+        timeouts = timeouts or {}
+        result = FlowResult(name)
+        try:
+            for batch in batches(flow):
+                script, budget = self.batch_script(batch, timeouts)
+                reply = self._execute(driver, script, values or {}, budget, result)
+                if not self.apply_reply(batch, reply, result):
+                    break
+        finally:
+            self.stats.record(name, result.round_trips)
+        return result
+
+    def batch_script(self, batch, timeouts):
+        """RUNNER_JS for one batch and the seconds it may take in total."""
+        limits = [timeouts.get(s.name, s.timeout or self.default_timeout) for s in batch]
+        script = RUNNER_JS % {
+            "nav_timeout": int(self.default_timeout * 1000),
+            "track_js": waits.TRACK_NETWORK_JS,
+            "tick_ms": waits.JS_TICK_MS,
+            "steps": ",\n".join(step_literal(s, t) for s, t in zip(batch, limits)),
+        }
+        return script, sum(limits) + self.default_timeout
+
+    @staticmethod
+    def apply_reply(batch, reply, result):
+        """Fold a batch's reply into ``result``; False when the flow ends here (stopped or unmet expect)."""
+        result.timings.extend((step, seconds) for step, seconds in reply["timings"])
+        if reply.get("stopped"):
+            result.stopped = reply["stopped"]
+            return False
+        if not reply["ok"]:
+            failed = next((s for s in batch if s.name == reply["step"]), None)
+            if failed is None or not failed.expect:
+                raise FlowTimeout(reply["step"], result.name, result.timings)
+            result.ok = False
+            result.failed_step = failed.name
+            return False
+        return True
+
+    @staticmethod
+    def _execute(driver, script, values, budget, result):
+        # The script timeout is a driver setting, so only send it when a longer batch needs more
+        if getattr(driver, "_flow_script_timeout", 0) < budget + 5:
+            driver.set_script_timeout(budget + 5)
+            driver._flow_script_timeout = budget + 5
+            result.round_trips += 1
+        for attempt in range(NAVIGATION_RETRIES + 1):
+            result.round_trips += 1
+            try:
+                return driver.execute_async_script(script, values)
+            except WebDriverException as e:
+                # The page we started on navigated away (e.g. after the login click); run again on the new one
+                if attempt == NAVIGATION_RETRIES or "unload" not in str(e).lower():
+                    raise
+                time.sleep(waits.POLL_FREQUENCY)
+
+flow_engine = FlowEngine()
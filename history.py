@@ -0,0 +1,371 @@
+"""Cross-run history: every run's attempts and step timings in one local SQLite file.
+
+Multipleselem adds each finished run (``RECORD_HISTORY``); older runs can be
+pulled in from the results directory. Then:
+
+    python history.py ingest                       # pick up runs not indexed yet
+    python history.py runs                         # what is in the store
+    python history.py report                       # latest run vs the one before it
+    python history.py report --baseline 20240101_213000
+    python history.py trend 05158                  # one user's p95 over the last runs
+    python history.py slowest --limit 20           # slowest users of the latest run
+"""
+import argparse
+import json
+import math
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from result_sink import read_results
+from retry import CUTOFF, LATE_SUCCESS
+
+# ============ CONFIGURABLE PARAMETERS ============
+DB_FILE = "results/history.db"
+RESULTS_DIR = "results"
+DETAILED_PATTERN = re.compile(r"^day_close_detailed_(?P<run>.+)\.(?P<fmt>csv|jsonl)$")
+SHARD_PATTERN = re.compile(r"_shard\d+of\d+$")  # Run ids of sharding.py workers; the merged run covers them
+REGRESSION_RATIO = 1.2  # p95 at least 20% slower than the baseline...
+REGRESSION_MIN_SECONDS = 0.5  # ...and by at least this much, to count as a regression
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT PRIMARY KEY,
+    started_at  TEXT,
+    elapsed     REAL,
+    attempts    INTEGER NOT NULL,
+    successes   INTEGER NOT NULL,
+    source      TEXT NOT NULL,
+    ingested_at TEXT NOT NULL,
+    kind        TEXT NOT NULL DEFAULT 'single'
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    run_id   TEXT NOT NULL,
+    username TEXT NOT NULL,
+    loop     INTEGER,
+    attempt  INTEGER,
+    status   TEXT NOT NULL,
+    reason   TEXT,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS attempts_by_run ON attempts (run_id, username);
+CREATE INDEX IF NOT EXISTS attempts_by_user ON attempts (username, run_id);
+CREATE TABLE IF NOT EXISTS steps (
+    run_id TEXT NOT NULL,
+    step   TEXT NOT NULL,
+    count  INTEGER,
+    p50    REAL,
+    p95    REAL,
+    p99    REAL,
+    max    REAL,
+    PRIMARY KEY (run_id, step)
+);
+"""
+
+# ---------------- HELPERS ----------------
+def percentile(values, pct):
+    """Nearest-rank percentile of a sorted list (None when empty)."""
+    if not values:
+        return None
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+def run_started_at(run_id):
+    """Run ids start with the run's YYYYmmdd_HHMMSS stamp; None for other ids."""
+    try:
+        return datetime.strptime(run_id[:15], "%Y%m%d_%H%M%S").isoformat()
+    except ValueError:
+        return None
+
+
+def run_kind(run_id):
+    """'shard' for one worker of a sharded run, 'merged' for the merged result, else 'single'."""
+    if SHARD_PATTERN.search(run_id):
+        return "shard"
+    return "merged" if run_id.endswith("_merged") else "single"
+
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+# ---------------- STORE ----------------
+class HistoryStore:
+    """Attempts, step percentiles and run totals for every ingested run."""
+
+    def __init__(self, path=DB_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        self._conn.commit()
+
+    def _migrate(self):
+        """Stores written before runs had a kind: add the column and fill it from the run ids."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(runs)")}
+        if "kind" not in columns:
+            self._conn.execute("ALTER TABLE runs ADD COLUMN kind TEXT NOT NULL DEFAULT 'single'")
+            self._conn.executemany("UPDATE runs SET kind = ? WHERE run_id = ?",
+                                   [(run_kind(run_id), run_id) for (run_id,) in self._conn.execute(
+                                       "SELECT run_id FROM runs").fetchall()])
+
+    # ---------------- INGEST ----------------
+    def ingest_run(self, detailed_path, run_id=None, metrics_path=None, elapsed=None, started_at=None):
+        """Index one run's detailed results (and its step metrics JSON, if any); False if already there.
+
+        ``started_at`` defaults to the stamp in the run id, else the file's modification time.
+        """
+        detailed_path = Path(detailed_path)
+        if run_id is None:
+            match = DETAILED_PATTERN.match(detailed_path.name)
+            run_id = match.group("run") if match else detailed_path.stem
+        if metrics_path is None:
+            candidate = detailed_path.with_name(f"day_close_metrics_{run_id}.json")
+            metrics_path = candidate if candidate.exists() else None
+        started_at = started_at or run_started_at(run_id) or datetime.fromtimestamp(
+            detailed_path.stat().st_mtime).isoformat(timespec='seconds')
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM runs WHERE run_id = ?", (run_id,)).fetchone():
+                return False
+            rows = [(run_id, r['username'], to_int(r.get('loop')), to_int(r.get('attempt')), r['status'],
+                     r.get('reason') or None, to_float(r.get('duration')))
+                    for r in read_results(detailed_path)]
+            # A late success replaces the cutoff error of the same attempt
+            late = {row[1:4] for row in rows if row[5] == LATE_SUCCESS}
+            rows = [row for row in rows if not (row[5] == CUTOFF and row[1:4] in late)]
+            self._conn.executemany("INSERT INTO attempts VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            if metrics_path is not None:
+                steps = json.loads(Path(metrics_path).read_text(encoding='utf-8')).get("steps", {})
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO steps VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [(run_id, step, h["count"], h["p50"], h["p95"], h["p99"], h["max"]) for step, h in steps.items()])
+            self._conn.execute(
+                "INSERT INTO runs (run_id, started_at, elapsed, attempts, successes, source, ingested_at, kind) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (run_id, started_at, elapsed, len(rows), sum(1 for r in rows if r[4] == 'success'),
+                 detailed_path.name, datetime.now().isoformat(timespec='seconds'), run_kind(run_id)))
+            self._conn.commit()
+        return True
+
+    def ingest_dir(self, results_dir=RESULTS_DIR):
+        """Index every detailed-results file in ``results_dir`` not seen before; returns the new run ids."""
+        added = []
+        for path in sorted(Path(results_dir).glob("day_close_detailed_*")):
+            match = DETAILED_PATTERN.match(path.name)
+            if match and self.ingest_run(path, match.group("run")):
+                added.append(match.group("run"))
+        return added
+
+    # ---------------- QUERIES ----------------
+    def runs(self, limit=None, shards=False):
+        """Runs newest first: (run_id, started_at, elapsed, attempts, successes, kind).
+
+        Shard runs are left out unless ``shards``: their merged run stands for them.
+        """
+        sql = ("SELECT run_id, started_at, elapsed, attempts, successes, kind FROM runs"
+               + ("" if shards else " WHERE kind != 'shard'") + " ORDER BY started_at DESC, run_id DESC")
+        with self._lock:
+            return self._conn.execute(sql + (" LIMIT ?" if limit else ""), (limit,) if limit else ()).fetchall()
+
+    def previous_run(self, run_id):
+        """The non-shard run that started last before ``run_id``."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT r.run_id FROM runs r JOIN runs cur ON cur.run_id = ? "
+                "WHERE r.kind != 'shard' AND (r.started_at < cur.started_at "
+                "OR (r.started_at = cur.started_at AND r.run_id < cur.run_id)) "
+                "ORDER BY r.started_at DESC, r.run_id DESC LIMIT 1", (run_id,)).fetchone()
+        return row[0] if row else None
+
+    def run_stats(self, run_id):
+        """Totals and duration percentiles for one run."""
+        with self._lock:
+            run = self._conn.execute("SELECT elapsed, attempts, successes FROM runs WHERE run_id = ?",
+                                     (run_id,)).fetchone()
+            durations = [d for (d,) in self._conn.execute(
+                "SELECT duration FROM attempts WHERE run_id = ? AND duration IS NOT NULL ORDER BY duration",
+                (run_id,))]
+            reasons = dict(self._conn.execute(
+                "SELECT COALESCE(reason, status), COUNT(*) FROM attempts WHERE run_id = ? AND status != 'success' "
+                "GROUP BY 1", (run_id,)).fetchall())
+        if run is None:
+            raise KeyError(f"Unknown run: {run_id}")
+        elapsed, attempts, successes = run
+        return {
+            "run_id": run_id,
+            "attempts": attempts,
+            "success_rate": successes / attempts if attempts else 0.0,
+            "rate": attempts / elapsed if elapsed else None,
+            "p50": percentile(durations, 50),
+            "p95": percentile(durations, 95),
+            "failures": reasons,
+        }
+
+    def user_percentiles(self, run_id, pct=95):
+        """{username: (p<pct> duration, attempts)} for one run."""
+        per_user = {}
+        with self._lock:
+            for username, duration in self._conn.execute(
+                    "SELECT username, duration FROM attempts WHERE run_id = ? AND duration IS NOT NULL "
+                    "ORDER BY username, duration", (run_id,)):
+                per_user.setdefault(username, []).append(duration)
+        return {user: (percentile(values, pct), len(values)) for user, values in per_user.items()}
+
+    def step_percentiles(self, run_id):
+        with self._lock:
+            return {step: {"count": count, "p50": p50, "p95": p95}
+                    for step, count, p50, p95 in self._conn.execute(
+                        "SELECT step, count, p50, p95 FROM steps WHERE run_id = ?", (run_id,))}
+
+    def trend(self, username, limit=10):
+        """One user's (run_id, attempts, success rate, p50, p95) over the last ``limit`` runs, oldest first."""
+        with self._lock:
+            run_ids = [r for (r,) in self._conn.execute(
+                "SELECT r.run_id FROM runs r WHERE r.kind != 'shard' AND EXISTS "
+                "(SELECT 1 FROM attempts a WHERE a.run_id = r.run_id AND a.username = ?) "
+                "ORDER BY r.started_at DESC, r.run_id DESC LIMIT ?", (username, limit))]
+            rows = []
+            for run_id in reversed(run_ids):
+                attempts = self._conn.execute(
+                    "SELECT status, duration FROM attempts WHERE username = ? AND run_id = ?",
+                    (username, run_id)).fetchall()
+                durations = sorted(d for _, d in attempts if d is not None)
+                successes = sum(1 for status, _ in attempts if status == 'success')
+                rows.append((run_id, len(attempts), successes / len(attempts),
+                             percentile(durations, 50), percentile(durations, 95)))
+        return rows
+
+    def slowest(self, run_id, limit=10):
+        """Users of ``run_id`` with the highest p95 attempt duration."""
+        users = self.user_percentiles(run_id)
+        return sorted(((user, p95, n) for user, (p95, n) in users.items()), key=lambda row: row[1], reverse=True)[:limit]
+
+    def regressions(self, baseline, latest):
+        """Users whose p95 grew by REGRESSION_RATIO and REGRESSION_MIN_SECONDS; worst first."""
+        before = self.user_percentiles(baseline)
+        after = self.user_percentiles(latest)
+        rows = []
+        for user, (p95, _) in after.items():
+            old = before.get(user, (None, 0))[0]
+            if old and p95 >= old * REGRESSION_RATIO and p95 - old >= REGRESSION_MIN_SECONDS:
+                rows.append((user, old, p95))
+        return sorted(rows, key=lambda row: row[2] - row[1], reverse=True)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# ---------------- REPORT ----------------
+def fmt_seconds(value):
+    return "-" if value is None else f"{value:.2f}s"
+
+
+def delta(before, after):
+    if before is None or after is None:
+        return ""
+    change = (after - before) / before * 100 if before else 0.0
+    return f"{'🔺' if change > 0 else '🔻'}{change:+.1f}%"
+
+
+def report(store, latest=None, baseline=None, limit=10):
+    """Print the latest run against a baseline (default: the run before it)."""
+    runs = store.runs(limit=1)
+    if not runs:
+        print("No runs in the history store; run `python history.py ingest` first")
+        return
+    latest = latest or runs[0][0]
+    baseline = baseline or store.previous_run(latest)
+    now = store.run_stats(latest)
+    print("=" * 70)
+    print(f"📚 Run {latest}" + (f" vs baseline {baseline}" if baseline else " (no baseline)"))
+    print("=" * 70)
+    before = store.run_stats(baseline) if baseline else {}
+    for label, key, show in (("Attempts", "attempts", str),
+                             ("Success rate", "success_rate", lambda v: f"{v * 100:.1f}%"),
+                             ("Attempts/sec", "rate", lambda v: "-" if v is None else f"{v:.2f}"),
+                             ("Attempt p50", "p50", fmt_seconds),
+                             ("Attempt p95", "p95", fmt_seconds)):
+        old = before.get(key)
+        line = f"{label:<16}{show(now[key]):>12}"
+        if baseline:
+            line += f"{show(old) if old is not None else '-':>12}  {delta(old, now[key])}"
+        print(line)
+    print(f"Failures: {now['failures'] or 'none'}" + (f" (baseline {before['failures'] or 'none'})" if baseline else ""))
+
+    steps_now = store.step_percentiles(latest)
+    if steps_now:
+        steps_before = store.step_percentiles(baseline) if baseline else {}
+        print(f"\n{'step':<24}{'p95':>10}{'baseline':>10}")
+        for step, s in steps_now.items():
+            old = steps_before.get(step, {}).get("p95")
+            print(f"{step:<24}{fmt_seconds(s['p95']):>10}{fmt_seconds(old):>10}  {delta(old, s['p95'])}")
+
+    if baseline:
+        regressions = store.regressions(baseline, latest)
+        print(f"\n🐌 {len(regressions)} users regressed (p95 ≥{REGRESSION_RATIO:.1f}x and +{REGRESSION_MIN_SECONDS}s)")
+        for user, old, new in regressions[:limit]:
+            print(f"   {user:<12}{fmt_seconds(old):>10} → {fmt_seconds(new)}")
+    print(f"\n🐢 Slowest users in {latest}:")
+    for user, p95, n in store.slowest(latest, limit):
+        print(f"   {user:<12} p95 {fmt_seconds(p95)} over {n} attempts")
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Cross-run day-close history")
+    parser.add_argument("--db", default=DB_FILE)
+    sub = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = sub.add_parser("ingest", help="index runs from a results directory")
+    ingest_parser.add_argument("results_dir", nargs="?", default=RESULTS_DIR)
+    runs_parser = sub.add_parser("runs", help="list indexed runs")
+    runs_parser.add_argument("--shards", action="store_true", help="also list the shards of sharded runs")
+    report_parser = sub.add_parser("report", help="compare a run with a baseline")
+    report_parser.add_argument("--latest", default=None, help="run id (default: newest)")
+    report_parser.add_argument("--baseline", default=None, help="run id (default: the run before --latest)")
+    report_parser.add_argument("--limit", type=int, default=10)
+    trend_parser = sub.add_parser("trend", help="one user's p95 over recent runs")
+    trend_parser.add_argument("username")
+    trend_parser.add_argument("--limit", type=int, default=10)
+    slowest_parser = sub.add_parser("slowest", help="slowest users of a run")
+    slowest_parser.add_argument("--run", default=None, help="run id (default: newest)")
+    slowest_parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    try:
+        if args.command == "ingest":
+            added = store.ingest_dir(args.results_dir)
+            print(f"📚 Indexed {len(added)} new runs" + (f": {', '.join(added)}" if added else ""))
+        elif args.command == "runs":
+            for run_id, started_at, elapsed, attempts, successes, kind in store.runs(shards=args.shards):
+                rate = f"{attempts / elapsed:.2f}/s" if elapsed else "-"
+                print(f"{run_id:<36}{kind:<8}{attempts:>8} attempts {successes / attempts * 100 if attempts else 0:>6.1f}% ok {rate:>10}")
+        elif args.command == "report":
+            report(store, args.latest, args.baseline, args.limit)
+        elif args.command == "trend":
+            print(f"{'run':<36}{'attempts':>9}{'ok':>8}{'p50':>9}{'p95':>9}")
+            for run_id, attempts, success_rate, p50, p95 in store.trend(args.username, args.limit):
+                print(f"{run_id:<36}{attempts:>9}{success_rate * 100:>7.1f}%{fmt_seconds(p50):>9}{fmt_seconds(p95):>9}")
+        elif args.command == "slowest":
+            run_id = args.run or (store.runs(limit=1) or [[None]])[0][0]
+            for user, p95, n in store.slowest(run_id, args.limit) if run_id else []:
+                print(f"{user:<12} p95 {fmt_seconds(p95)} over {n} attempts")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
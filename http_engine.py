@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import threading
+from urllib.parse import urljoin
+
+import aiohttp
+from lxml import html
+
+from day_status import ALREADY_CLOSED_MESSAGE
+
+logger = logging.getLogger(__name__)
+
+# ============ CONFIGURABLE PARAMETERS ============
+# ERP routes behind the Day Information page and the #dayOpenConfirmation "Yes"
+# button. UNVERIFIED: inferred from the UI, never checked against the real ERP's
+# XHRs (mock_erp.py serves the same guesses, so tests and benchmarks cannot catch
+# a mismatch). Confirm them in Chrome DevTools before using ENGINE = "http".
+DAY_INFO_PATH = "/DayOpenClose/Index"
+DAY_CLOSE_PATH = "/DayOpenClose/DayClose"
+REQUEST_TIMEOUT = 20  # Seconds per HTTP request
+VERIFY_SSL = True  # Set False for sandbox hosts with self-signed certificates
+SUCCESS_TEXT = "Day Closed Successfully"
+TOKEN_FIELD = "__RequestVerificationToken"
+
+# ---------------- PARSING HELPERS ----------------
+def find_login_form(doc):
+    """Return the form holding the #emailaddress field (or the first form)."""
+    for form in doc.forms:
+        if form.xpath('.//*[@id="emailaddress"]'):
+            return form
+    if doc.forms:
+        return doc.forms[0]
+    raise ValueError("Login form not found")
+
+
+def build_login_payload(form, username, password):
+    """All form fields (anti-forgery token included) with credentials filled in."""
+    payload = dict(form.form_values())
+    user_field = form.xpath('.//*[@id="emailaddress"]')
+    pass_field = form.xpath('.//*[@id="password"]')
+    payload[user_field[0].get("name", "emailaddress") if user_field else "emailaddress"] = username
+    payload[pass_field[0].get("name", "password") if pass_field else "password"] = password
+    return payload
+
+
+def extract_token(doc):
+    """Anti-forgery token from a hidden input or a meta tag, if the page has one."""
+    values = doc.xpath(f'//input[@name="{TOKEN_FIELD}"]/@value')
+    if not values:
+        values = doc.xpath(f'//meta[@name="{TOKEN_FIELD}"]/@content')
+    return values[0] if values else None
+
+
+def is_login_page(doc):
+    return bool(doc.xpath('//*[@id="emailaddress"]'))
+
+
+# ---------------- ENGINE ----------------
+class HttpDayCloseEngine:
+    """Browserless day close over plain HTTP.
+
+    One event loop runs in a background thread and every user gets its own
+    cookie jar on top of a single shared ``TCPConnector``, so worker threads
+    can call :meth:`day_close` synchronously while connections are pooled.
+    """
+
+    def __init__(self, login_url, limit=10, timeout=REQUEST_TIMEOUT, verify_ssl=VERIFY_SSL):
+        self.login_url = login_url
+        self.limit = limit
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.verify_ssl = verify_ssl
+        self._loop = None
+        self._thread = None
+        self._connector = None
+        self._lock = threading.Lock()
+
+    # ---------------- LIFECYCLE ----------------
+    def start(self):
+        """Start the background event loop and shared connector (idempotent)."""
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever,
+                                            name="http-engine", daemon=True)
+            self._thread.start()
+            self._connector = self._submit(self._make_connector()).result()
+
+    async def _make_connector(self):
+        return aiohttp.TCPConnector(limit=self.limit, ssl=None if self.verify_ssl else False)
+
+    def _submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            self._submit(self._connector.close()).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop.close()
+            self._loop = None
+
+    # ---------------- DAY CLOSE ----------------
+    def day_close(self, username, password):
+        """Run the day close for one user; returns ``(status, message)``."""
+        self.start()
+        return self._submit(self.day_close_async(username, password)).result()
+
+    async def day_close_async(self, username, password):
+        async with aiohttp.ClientSession(connector=self._connector, connector_owner=False,
+                                         timeout=self.timeout,
+                                         cookie_jar=aiohttp.CookieJar(unsafe=True)) as session:
+            try:
+                return await self._flow(session, username, password)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                return "error", f"{type(e).__name__}: {e}"
+
+    async def _flow(self, session, username, password):
+        # ---------------- LOGIN ----------------
+        async with session.get(self.login_url) as resp:
+            resp.raise_for_status()
+            login_doc = html.fromstring(await resp.text(), base_url=str(resp.url))
+        form = find_login_form(login_doc)
+        action = urljoin(self.login_url, form.action) if form.action else self.login_url
+        payload = build_login_payload(form, username, password)
+
+        async with session.post(action, data=payload) as resp:
+            resp.raise_for_status()
+            body = await resp.text()
+        if is_login_page(html.fromstring(body)):
+            return "failure", "Login rejected"
+
+        # ---------------- DAY INFORMATION ----------------
+        async with session.get(urljoin(self.login_url, DAY_INFO_PATH)) as resp:
+            resp.raise_for_status()
+            info_doc = html.fromstring(await resp.text())
+        if is_login_page(info_doc):
+            return "failure", "Session not authenticated"
+        close_buttons = info_doc.xpath('//*[@id="day-information"]//button')
+        if not close_buttons:
+            return "failure", "No Day Close button found — possibly already closed"
+        if close_buttons[0].get("disabled") is not None:
+            return "success", ALREADY_CLOSED_MESSAGE
+
+        # ---------------- CONFIRM (dayOpenConfirmation → Yes) ----------------
+        token = extract_token(info_doc) or payload.get(TOKEN_FIELD)
+        data = {TOKEN_FIELD: token} if token else {}
+        headers = {"RequestVerificationToken": token,
+                   "X-Requested-With": "XMLHttpRequest"} if token else {"X-Requested-With": "XMLHttpRequest"}
+        async with session.post(urljoin(self.login_url, DAY_CLOSE_PATH), data=data, headers=headers) as resp:
+            resp.raise_for_status()
+            if resp.content_type == "application/json":
+                reply = await resp.json()
+                ok = bool(reply.get("success", reply.get("Success", True))) if isinstance(reply, dict) else True
+                message = str(reply.get("message", reply.get("Message", ""))) if isinstance(reply, dict) else ""
+                return ("success", message or "Day close completed") if ok else ("failure", message or "Day close rejected")
+            body = await resp.text()
+        if SUCCESS_TEXT.lower() in body.lower():
+            return "success", "Day close completed"
+        return "failure", "Day close not acknowledged"
@@ -0,0 +1,364 @@
+"""Open-model load test: day-close attempts arrive at a target rate, whether or not earlier ones finished.
+
+Multipleselem is a closed loop: a new attempt starts only when a slot frees,
+so a slow ERP quietly lowers the offered load and the latencies look better
+than they are. Here arrivals follow a rate profile on their own clock; when
+every worker is busy they wait in a queue (or are dropped), and latency is
+measured from the *intended* arrival time, which corrects for coordinated
+omission.
+
+    # ramp 0 → 2/s over 30s, hold 60s, ramp to 5/s over 30s, hold 60s, against the mock ERP
+    python load_generator.py --profile 30:2,60:2,30:5,60:5 --workers 20 --mock --latency 0.3
+
+    # the real ERP (URL and CSV_FILE from Multipleselem), Selenium engine, drop what can't start at once
+    python load_generator.py --profile 60:1,120:1 --workers 10 --engine selenium --overflow drop
+
+A profile is ``seconds:rate`` stages; each stage moves linearly from the
+previous stage's rate (``--start-rate`` for the first) to its own.
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from benchmark import summarize
+
+# ============ CONFIGURABLE PARAMETERS ============
+RESULTS_DIR = "results"
+OVERFLOW_MODES = ("queue", "drop")  # queue: wait for a worker (up to --max-queue); drop: only start if one is idle
+ARRIVAL_PROCESSES = ("uniform", "poisson")
+DRAIN_TIMEOUT = 120  # Seconds queued/in-flight attempts get after the last arrival before the rest is abandoned
+DROPPED = "dropped"
+ABANDONED = "abandoned"
+
+# ---------------- RATE PROFILE ----------------
+class RateProfile:
+    """Piecewise-linear arrival rate: stages of (seconds, rate at the end of the stage)."""
+
+    def __init__(self, stages, start_rate=0.0):
+        if not stages or any(seconds <= 0 or rate < 0 for seconds, rate in stages):
+            raise ValueError("profile needs stages with seconds > 0 and rate >= 0")
+        self.stages = []  # (start, seconds, from_rate, to_rate)
+        at, rate = 0.0, start_rate
+        for seconds, to_rate in stages:
+            self.stages.append((at, seconds, rate, to_rate))
+            at, rate = at + seconds, to_rate
+        self.duration = at
+
+    @classmethod
+    def parse(cls, text, start_rate=0.0):
+        """``"30:2,60:2,30:5"`` → ramp to 2/s over 30s, hold 60s, ramp to 5/s over 30s."""
+        stages = []
+        for part in text.split(","):
+            seconds, _, rate = part.strip().partition(":")
+            stages.append((float(seconds), float(rate)))
+        return cls(stages, start_rate)
+
+    def stage_at(self, t):
+        for index, (start, seconds, _, _) in enumerate(self.stages):
+            if t < start + seconds:
+                return index
+        return len(self.stages) - 1
+
+    def expected(self):
+        """Expected number of arrivals over the whole profile."""
+        return sum(seconds * (r0 + r1) / 2 for _, seconds, r0, r1 in self.stages)
+
+    def arrival_times(self, process="uniform", rng=None):
+        """Intended arrival offsets (seconds from the start) for the whole profile.
+
+        The k-th arrival is where the integrated rate reaches k (uniform) or a
+        running sum of exponential gaps (poisson); inside a linear stage that is
+        the root of a quadratic, so ramps are exact.
+        """
+        rng = rng or random.Random()
+        gap = (lambda: rng.expovariate(1.0)) if process == "poisson" else (lambda: 1.0)
+        times = []
+        target = gap()
+        passed = 0.0  # Integrated rate up to the start of the current stage
+        for start, seconds, r0, r1 in self.stages:
+            slope = (r1 - r0) / seconds
+            area = seconds * (r0 + r1) / 2
+            while target <= passed + area:
+                need = target - passed
+                if slope == 0:
+                    t = need / r0
+                else:
+                    t = (-r0 + math.sqrt(max(r0 * r0 + 2 * slope * need, 0.0))) / slope
+                times.append(start + min(max(t, 0.0), seconds))
+                target += gap()
+            passed += area
+        return times
+
+# ---------------- GENERATOR ----------------
+class OpenLoadGenerator:
+    """Fires ``attempt(cred, index)`` at the profile's arrival times on a fixed pool of ``workers`` threads.
+
+    ``attempt`` is any day-close callable returning a result dict with a
+    ``status`` (e.g. ``Multipleselem.process_day_close`` for either engine).
+    Every arrival gets a record with its intended, start and finish offsets;
+    dropped and abandoned arrivals are recorded too.
+    """
+
+    def __init__(self, attempt, workers, overflow="queue", max_queue=None, drain_timeout=DRAIN_TIMEOUT):
+        if overflow not in OVERFLOW_MODES:
+            raise ValueError(f"overflow must be one of {OVERFLOW_MODES}")
+        self.attempt = attempt
+        self.workers = workers
+        self.overflow = overflow
+        self.max_queue = max_queue
+        self.drain_timeout = drain_timeout
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._abandon = threading.Event()
+        self._waiting = 0
+        self._busy = 0
+        self.records = []
+        self.max_waiting = 0
+        self.max_lag = 0.0  # Worst delay of the dispatcher itself behind the schedule
+        self.t0 = None
+
+    def _now(self):
+        return time.monotonic() - self.t0
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            record, cred = item
+            with self._lock:
+                self._waiting -= 1
+                if self._abandon.is_set():
+                    record.update(status=ABANDONED, finished=None)
+                    continue
+                self._busy += 1
+            record["started"] = self._now()
+            try:
+                result = self.attempt(cred, record["index"]) or {}
+            except Exception as e:  # The attempt callable is expected to catch its own errors
+                result = {"status": "error", "message": str(e)}
+            record["finished"] = self._now()
+            record.update(status=result.get("status", "error"), reason=result.get("reason"),
+                          message=result.get("message", ""))
+            with self._lock:
+                self._busy -= 1
+
+    def _admit(self):
+        with self._lock:
+            if self.overflow == "drop":
+                admitted = self._busy + self._waiting < self.workers
+            else:
+                admitted = self.max_queue is None or self._waiting < self.max_queue
+            if admitted:
+                self._waiting += 1
+                self.max_waiting = max(self.max_waiting, self._waiting)
+            return admitted
+
+    def run(self, creds, profile, process="uniform", seed=None):
+        """Run the whole profile over ``creds`` (cycled), wait for the backlog, return the records."""
+        arrivals = profile.arrival_times(process, random.Random(seed))
+        users = itertools.cycle(creds)
+        threads = [threading.Thread(target=self._worker, name=f"load-{i}", daemon=True) for i in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        self.t0 = time.monotonic()
+        for index, intended in enumerate(arrivals):
+            delay = intended - self._now()
+            if delay > 0:
+                time.sleep(delay)
+            self.max_lag = max(self.max_lag, -delay)
+            cred = next(users)
+            record = {"index": index, "stage": profile.stage_at(intended), "username": cred['username'],
+                      "intended": intended, "started": None, "finished": None, "status": None,
+                      "reason": None, "message": ""}
+            self.records.append(record)
+            if self._admit():
+                self._queue.put((record, cred))
+            else:
+                record["status"] = DROPPED
+        self.schedule_end = self._now()
+        for _ in threads:
+            self._queue.put(None)
+        deadline = time.monotonic() + self.drain_timeout
+        for thread in threads:
+            thread.join(max(deadline - time.monotonic(), 0))
+        self._abandon.set()  # Workers still busy finish their attempt; queued arrivals are abandoned
+        for thread in threads:
+            thread.join()
+        self.elapsed = self._now()
+        return self.records
+
+# ---------------- REPORT ----------------
+def latency_stats(records):
+    """Service time (start → finish, what a closed loop reports) vs response time (intended → finish)."""
+    done = [r for r in records if r["finished"] is not None]
+    service = [r["finished"] - r["started"] for r in done]
+    response = [r["finished"] - r["intended"] for r in done]
+    delay = [r["started"] - r["intended"] for r in done]
+    return {
+        "service": dict(summarize(service), max=max(service, default=0.0)),
+        "response": dict(summarize(response), max=max(response, default=0.0)),
+        "queue_delay": dict(summarize(delay), max=max(delay, default=0.0)),
+    }
+
+
+def build_report(generator, profile, process, creds_count):
+    records = generator.records
+    done = [r for r in records if r["finished"] is not None]
+    last_finish = max((r["finished"] for r in done), default=0.0)
+    stages = []
+    for index, (start, seconds, r0, r1) in enumerate(profile.stages):
+        mine = [r for r in records if r["stage"] == index]
+        mine_done = [r for r in mine if r["finished"] is not None]
+        finished_inside = sum(1 for r in done if start <= r["finished"] < start + seconds)
+        stages.append(dict({
+            "stage": index + 1,
+            "seconds": seconds,
+            "target_rate": f"{r0:g}→{r1:g}" if r0 != r1 else f"{r1:g}",
+            "arrivals": len(mine),
+            "offered_rate": len(mine) / seconds,
+            "throughput": finished_inside / seconds,
+            "dropped": sum(1 for r in mine if r["status"] == DROPPED),
+            "success_rate": (sum(1 for r in mine_done if r["status"] == "success") / len(mine_done)
+                             if mine_done else 0.0),
+        }, **latency_stats(mine)))
+    return dict({
+        "profile": [(seconds, r1) for _, seconds, _, r1 in profile.stages],
+        "arrival_process": process,
+        "workers": generator.workers,
+        "overflow": generator.overflow,
+        "max_queue": generator.max_queue,
+        "users": creds_count,
+        "arrivals": len(records),
+        "expected_arrivals": round(profile.expected(), 1),
+        "completed": len(done),
+        "successes": sum(1 for r in done if r["status"] == "success"),
+        "dropped": sum(1 for r in records if r["status"] == DROPPED),
+        "abandoned": sum(1 for r in records if r["status"] == ABANDONED),
+        "max_queue_depth": generator.max_waiting,
+        "dispatcher_max_lag": generator.max_lag,
+        "offered_rate": len(records) / profile.duration,
+        "throughput": len(done) / last_finish if last_finish else 0.0,
+        "elapsed": generator.elapsed,
+        "stages": stages,
+    }, **latency_stats(records))
+
+
+def print_report(report):
+    print("=" * 78)
+    print(f"🌊 Open-model load: {report['arrivals']} arrivals ({report['arrival_process']}), "
+          f"{report['workers']} workers, overflow={report['overflow']}")
+    print("=" * 78)
+    print(f"📬 Offered {report['offered_rate']:.2f}/s · completed {report['completed']} "
+          f"({report['successes']} ok) at {report['throughput']:.2f}/s · dropped {report['dropped']} · "
+          f"abandoned {report['abandoned']} · max queue {report['max_queue_depth']}")
+    for label, key in (("Service time (closed-loop view)", "service"),
+                       ("Response time (from intended start)", "response"),
+                       ("Queue delay", "queue_delay")):
+        s = report[key]
+        print(f"⏱️  {label:<38} p50 {s['p50']:7.3f}s  p95 {s['p95']:7.3f}s  p99 {s['p99']:7.3f}s  max {s['max']:7.3f}s")
+    print(f"\n{'stage':>5}{'target/s':>10}{'offered':>9}{'done/s':>8}{'drop':>6}{'ok%':>7}"
+          f"{'svc p95':>9}{'resp p95':>10}{'resp p99':>10}")
+    for s in report["stages"]:
+        print(f"{s['stage']:>5}{s['target_rate']:>10}{s['offered_rate']:>9.2f}{s['throughput']:>8.2f}"
+              f"{s['dropped']:>6}{s['success_rate'] * 100:>7.1f}{s['service']['p95']:>9.3f}"
+              f"{s['response']['p95']:>10.3f}{s['response']['p99']:>10.3f}")
+    if report["dispatcher_max_lag"] > 0.05:
+        print(f"⚠️  The dispatcher itself fell {report['dispatcher_max_lag']:.3f}s behind the schedule "
+              f"(latencies are still measured from the intended time)")
+
+
+def write_records(records, path):
+    """One CSV row per arrival, offsets in seconds from the start of the run."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    fields = ['index', 'stage', 'username', 'intended', 'started', 'finished', 'status', 'reason', 'message']
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        for record in records:
+            writer.writerow({k: round(v, 4) if isinstance(v, float) else v for k, v in record.items()})
+    return path
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profile", required=True, help="seconds:rate stages, e.g. 30:2,60:2,30:5")
+    parser.add_argument("--start-rate", type=float, default=0.0, help="arrivals/sec at the start of the first stage")
+    parser.add_argument("--arrivals", choices=ARRIVAL_PROCESSES, default="poisson")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=10, help="attempts allowed in flight (browsers/sessions)")
+    parser.add_argument("--overflow", choices=OVERFLOW_MODES, default="queue")
+    parser.add_argument("--max-queue", type=int, default=None, help="queued arrivals beyond this are dropped")
+    parser.add_argument("--drain-timeout", type=float, default=DRAIN_TIMEOUT)
+    parser.add_argument("--engine", default="http", help="Multipleselem engine: selenium, http or cdp")
+    parser.add_argument("--mock", action="store_true", help="run against a local mock ERP instead of URL")
+    parser.add_argument("--users", type=int, default=50, help="mock users")
+    parser.add_argument("--latency", type=float, default=0.2, help="mock latency per request")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    import Multipleselem as M
+    from cdp_engine import CdpDayCloseEngine
+    from driver_pool import DriverPool
+    from http_engine import HttpDayCloseEngine
+    from mock_erp import DEFAULT_PASSWORD, MockErpServer
+
+    server = None
+    if args.mock:
+        server = MockErpServer(port=0, latency=args.latency, jitter=args.jitter,
+                               failure_rate=args.failure_rate).start()
+        M.URL, M.HOME_URL = server.login_url, server.base_url + "/"
+        creds = [{'username': f"{10000 + i:05d}", 'password': DEFAULT_PASSWORD} for i in range(args.users)]
+    else:
+        creds = M.load_credentials(M.CSV_FILE)
+        if creds is None:
+            return
+        creds = list(creds)
+    M.driver_pool = DriverPool(M.create_driver, size=args.workers)
+    M.http_engine = HttpDayCloseEngine(M.URL, limit=args.workers)
+    M.cdp_engine = CdpDayCloseEngine(M.URL, browsers=M.CDP_BROWSERS, limit=args.workers, lean=M.LEAN_PROFILE,
+                                     completion_timeout=M.COMPLETION_TIMEOUT)
+    if args.engine == "selenium" and M.WARM_UP:
+        M.warm_up(args.workers)
+    if args.engine == "cdp":
+        M.cdp_engine.start()
+
+    users = len(creds)
+
+    def attempt(cred, index):
+        return M.process_day_close(cred['username'], cred['password'], index // users + 1, index + 1, mode=args.engine)
+
+    profile = RateProfile.parse(args.profile, args.start_rate)
+    generator = OpenLoadGenerator(attempt, args.workers, args.overflow, args.max_queue, args.drain_timeout)
+    M.logger.info(f"🌊 Open-model load against {M.URL}: profile {args.profile} "
+                  f"(~{profile.expected():.0f} arrivals over {profile.duration:.0f}s), engine {args.engine}")
+    try:
+        generator.run(creds, profile, args.arrivals, args.seed)
+    finally:
+        M.driver_pool.close()
+        M.http_engine.close()
+        M.cdp_engine.close()
+        if server is not None:
+            server.stop()
+
+    report = build_report(generator, profile, args.arrivals, users)
+    print_report(report)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    Path(RESULTS_DIR).mkdir(exist_ok=True)
+    report_file = Path(RESULTS_DIR) / f"load_{args.engine}_{stamp}.json"
+    report_file.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    records_file = write_records(generator.records, Path(RESULTS_DIR) / f"load_{args.engine}_{stamp}.csv")
+    print(f"📄 Report: {report_file} · per-arrival records: {records_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import bisect
+import json
+import threading
+import time
+from pathlib import Path
+
+# ============ CONFIGURABLE PARAMETERS ============
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)  # Seconds; +Inf is implicit
+METRIC_NAME = "dayclose_step_duration_seconds"
+
+# ---------------- HISTOGRAM ----------------
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus layout) with count, sum and max."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, pct):
+        """Estimate a percentile by interpolating inside the bucket that holds it."""
+        if not self.count:
+            return 0.0
+        target = pct / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= target:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (target - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "avg": round(self.sum / self.count, 4) if self.count else 0.0,
+            "max": round(self.max, 4),
+            "p50": round(self.percentile(50), 4),
+            "p95": round(self.percentile(95), 4),
+            "p99": round(self.percentile(99), 4),
+        }
+
+# ---------------- REGISTRY ----------------
+class StepMetrics:
+    """Step histograms overall, per user and per loop."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.steps = {}
+        self.by_user = {}
+        self.by_loop = {}
+
+    def observe(self, step, seconds, user=None, loop=None):
+        with self._lock:
+            self.steps.setdefault(step, Histogram()).observe(seconds)
+            if user is not None:
+                self.by_user.setdefault(user, {}).setdefault(step, Histogram()).observe(seconds)
+            if loop is not None:
+                self.by_loop.setdefault(loop, {}).setdefault(step, Histogram()).observe(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.steps.clear()
+            self.by_user.clear()
+            self.by_loop.clear()
+
+    def timer(self, user=None, loop=None, windows=None):
+        return StepTimer(self, user, loop, windows)
+
+    # ---------------- EXPORT ----------------
+    def to_dict(self):
+        with self._lock:
+            return {
+                "steps": {step: h.to_dict() for step, h in self.steps.items()},
+                "by_user": {user: {step: h.to_dict() for step, h in steps.items()}
+                            for user, steps in self.by_user.items()},
+                "by_loop": {str(loop): {step: h.to_dict() for step, h in steps.items()}
+                            for loop, steps in sorted(self.by_loop.items())},
+            }
+
+    def write_json(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2), encoding='utf-8')
+        return path
+
+    def write_prometheus(self, path):
+        """Write a node_exporter textfile: step histograms plus per-user sum/count."""
+        lines = [f"# HELP {METRIC_NAME} Duration of each day-close step.",
+                 f"# TYPE {METRIC_NAME} histogram"]
+        with self._lock:
+            for step, h in self.steps.items():
+                cumulative = 0
+                for bound, n in zip(list(h.buckets) + ["+Inf"], h.counts):
+                    cumulative += n
+                    lines.append(f'{METRIC_NAME}_bucket{{step="{step}",le="{bound}"}} {cumulative}')
+                lines.append(f'{METRIC_NAME}_sum{{step="{step}"}} {h.sum:.6f}')
+                lines.append(f'{METRIC_NAME}_count{{step="{step}"}} {h.count}')
+            lines.append(f"# HELP {METRIC_NAME}_user Per-user step duration totals.")
+            lines.append(f"# TYPE {METRIC_NAME}_user summary")
+            for user, steps in self.by_user.items():
+                for step, h in steps.items():
+                    lines.append(f'{METRIC_NAME}_user_sum{{user="{user}",step="{step}"}} {h.sum:.6f}')
+                    lines.append(f'{METRIC_NAME}_user_count{{user="{user}",step="{step}"}} {h.count}')
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so a scraping node_exporter never reads a half-written file
+        tmp = Path(f"{path}.tmp")
+        tmp.write_text("\n".join(lines) + "\n", encoding='utf-8')
+        tmp.replace(path)
+        return path
+
+    def summary(self):
+        with self._lock:
+            return "\n".join(
+                f"⏱️  {step}: p50 {h.percentile(50):.2f}s, p95 {h.percentile(95):.2f}s, max {h.max:.2f}s ({h.count})"
+                for step, h in self.steps.items()
+            )
+
+
+class StepTimer:
+    """Lap timer for one attempt: ``lap(step)`` records the time since the previous lap.
+
+    Pass a ``windows`` list to also collect each step's (step, start, end)
+    wall-clock window, e.g. to attribute network requests to steps.
+    """
+
+    __slots__ = ("metrics", "user", "loop", "_last", "windows", "started", "_wall")
+
+    def __init__(self, metrics, user=None, loop=None, windows=None):
+        self.metrics = metrics
+        self.user = user
+        self.loop = loop
+        self._last = time.perf_counter()
+        self.windows = windows
+        self.started = time.time()
+        self._wall = self.started - self._last  # perf_counter → epoch seconds
+
+    def _window(self, step, start, end):
+        if self.windows is not None:
+            self.windows.append((step, start + self._wall, end + self._wall))
+
+    def lap(self, step):
+        now = time.perf_counter()
+        self.metrics.observe(step, now - self._last, self.user, self.loop)
+        self._window(step, self._last, now)
+        self._last = now
+
+    def extend(self, timings):
+        """Record (step, seconds) pairs measured elsewhere (e.g. inside the page by ``flows``).
+
+        The last step gets the rest of the time since the previous lap, so the
+        WebDriver overhead around them is not lost.
+        """
+        timings = list(timings)
+        if not timings:
+            return
+        cursor = self._last
+        for step, seconds in timings[:-1]:
+            self.metrics.observe(step, seconds, self.user, self.loop)
+            self._window(step, cursor, cursor + seconds)
+            cursor += seconds
+        now = time.perf_counter()
+        rest = now - self._last - sum(seconds for _, seconds in timings[:-1])
+        self.metrics.observe(timings[-1][0], max(rest, 0.0), self.user, self.loop)
+        self._window(timings[-1][0], cursor, now)
+        self._last = now
+
+    def skip(self):
+        """Restart the clock without recording (e.g. after an optional step that didn't happen)."""
+        self._last = time.perf_counter()
+
+step_metrics = StepMetrics()
@@ -0,0 +1,358 @@
+"""Local stand-in for the Shakti ERP, for offline benchmarks and regression runs.
+
+The pages reproduce the element ids and absolute XPaths the Selenium flows
+use (login form, #responseModal, #homePage MIS tile, the #02 menu,
+#day-information and #dayOpenConfirmation). They also serve the routes
+``http_engine`` calls. Latency and failures can be injected per request.
+
+    python mock_erp.py --port 8099 --latency 0.2 --jitter 0.1 --failure-rate 0.05
+"""
+import argparse
+import json
+import random
+import secrets
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# ============ CONFIGURABLE PARAMETERS ============
+DEFAULT_PORT = 8099
+DEFAULT_PASSWORD = "123456"
+TOKEN = "mock-antiforgery-token"
+
+# ---------------- PAGES ----------------
+LOGIN_PAGE = """<!DOCTYPE html>
+<html><head><title>Shakti ERP - Login</title></head>
+<body>
+<section>
+  <div class="brand"></div>
+  <div><div><div><div>
+    <form method="post" action="/Home/Login">
+      <div><input id="emailaddress" name="EmailAddress" type="text"></div>
+      <div><input id="password" name="Password" type="password"></div>
+      <div><input name="__RequestVerificationToken" type="hidden" value="%(token)s"></div>
+      <div>%(error)s</div>
+      <div><button type="submit">Log In</button></div>
+    </form>
+  </div></div></div></div>
+</section>
+</body></html>
+"""
+
+HOME_PAGE = """<!DOCTYPE html>
+<html><head><title>Shakti ERP</title>
+<meta name="__RequestVerificationToken" content="%(token)s">
+<style>.modal{display:none}.modal.show{display:block}</style>
+</head>
+<body>
+<div class="wrapper">
+  <div class="topbar"></div>
+  <div class="sidebar"></div>
+  <div class="content-page">
+    <div id="homePage">
+      <div class="tiles"><div><div class="row">
+        %(tiles)s
+        <div class="tile"><a href="#" id="mis-link"><div><div><p>MIS</p></div></div></a></div>
+      </div></div></div>
+    </div>
+  </div>
+</div>
+<div id="responseModal" class="modal show"><div><div>
+  <div>Notice</div><div>Welcome back</div>
+  <div><button type="button" onclick="document.getElementById('responseModal').classList.remove('show')">OK</button></div>
+</div></div></div>
+<script>
+const content = document.querySelector('.content-page > div');
+const headers = {'RequestVerificationToken': '%(token)s', 'X-Requested-With': 'XMLHttpRequest'};
+const MENU = '<div><div><div id="02"><div>MIS</div><div><div><div>Reports</div><div><div><ul>' +
+  '<li><a href="#" id="day-open-close-link">Day Open/Close</a></li><li><a href="#">Other</a></li>' +
+  '</ul></div></div></div></div></div></div></div>';
+const DAY = '<div class="panel"><div><div><div>Branch</div><div>Business date</div>' +
+  '<div><div><button type="button" id="day-close-btn">Day Close</button></div></div></div></div></div>' +
+  '<div></div><div></div><div id="toast"></div>' +
+  '<div id="dayOpenConfirmation" class="modal"><div><div><div>Confirm</div><div>Close the day?</div>' +
+  '<div><button type="button" id="confirm-no">No</button><button type="button" id="confirm-yes">Yes</button></div>' +
+  '</div></div></div>';
+
+document.getElementById('mis-link').addEventListener('click', async (e) => {
+  e.preventDefault();
+  await fetch('/Home/MisMenu', {headers});
+  content.id = 'mis';
+  content.innerHTML = MENU;
+  document.getElementById('day-open-close-link').addEventListener('click', openDayInformation);
+});
+
+async function openDayInformation(e) {
+  e.preventDefault();
+  const status = await (await fetch('/DayOpenClose/Status', {headers})).json();
+  content.id = 'day-information';
+  content.innerHTML = DAY;
+  const closeBtn = document.getElementById('day-close-btn');
+  const modal = document.getElementById('dayOpenConfirmation');
+  closeBtn.disabled = status.closed;
+  closeBtn.addEventListener('click', () => modal.classList.add('show'));
+  document.getElementById('confirm-no').addEventListener('click', () => modal.classList.remove('show'));
+  document.getElementById('confirm-yes').addEventListener('click', async () => {
+    const resp = await fetch('/DayOpenClose/DayClose', {method: 'POST', headers});
+    const reply = resp.ok ? await resp.json() : {success: false, message: 'HTTP ' + resp.status};
+    modal.classList.remove('show');
+    const toast = document.createElement('div');
+    toast.textContent = reply.message;
+    document.getElementById('toast').appendChild(toast);
+    if (reply.success) closeBtn.disabled = true;
+  });
+}
+</script>
+</body></html>
+"""
+
+DAY_INFO_PAGE = """<!DOCTYPE html>
+<html><head><title>Day Information</title></head>
+<body>
+<div id="day-information">
+  <input name="__RequestVerificationToken" type="hidden" value="%(token)s">
+  <div><div><div><div>Branch</div><div>Business date</div>
+    <div><div><button type="button" %(disabled)s>Day Close</button></div></div>
+  </div></div></div>
+</div>
+</body></html>
+"""
+
+# ---------------- SERVER ----------------
+class MockErpServer(ThreadingHTTPServer):
+    """Threaded mock ERP keeping sessions, per-user day status and per-session request timings."""
+
+    daemon_threads = True
+
+    def __init__(self, port=DEFAULT_PORT, host="127.0.0.1", latency=0.0, jitter=0.0,
+                 failure_rate=0.0, error_rate=0.0, stateful=False, password=DEFAULT_PASSWORD):
+        super().__init__((host, port), MockErpHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.error_rate = error_rate
+        self.stateful = stateful
+        self.password = password
+        self.lock = threading.Lock()
+        self.sessions = {}  # sid -> username (None until logged in)
+        self.closed_users = set()
+        self.requests = defaultdict(list)  # sid -> [(route, start, end)]
+        self.closes = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def login_url(self):
+        return f"{self.base_url}/Home/Login?ReturnUrl=%2F"
+
+    def start(self):
+        """Serve from a background thread; returns self for chaining."""
+        self._thread = threading.Thread(target=self.serve_forever, name="mock-erp", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def record(self, sid, route, start, end):
+        with self.lock:
+            self.requests[sid].append((route, start, end))
+
+    def step_timings(self):
+        """Per-step durations keyed by route.
+
+        A step is the time from the end of the previous request in the same
+        session (cookie) to the end of this one, i.e. client work plus server
+        time. Steps restart at each login-page load.
+        """
+        steps = defaultdict(list)
+        with self.lock:
+            sessions = [list(entries) for entries in self.requests.values()]
+        for entries in sessions:
+            entries.sort(key=lambda e: e[2])
+            previous_end = None
+            for route, start, end in entries:
+                if route == "GET /Home/Login":
+                    previous_end = None  # Every attempt starts from the login page
+                steps[route].append(end - (previous_end if previous_end is not None else start))
+                previous_end = end
+        return steps
+
+
+class MockErpHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # Headers and body go out as separate writes
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    # ---------------- PLUMBING ----------------
+    def _sid(self):
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        if "mock_sid" in cookie:
+            return cookie["mock_sid"].value, False
+        return secrets.token_hex(8), True
+
+    def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self._new_sid:
+            self.send_header("Set-Cookie", f"mock_sid={self._sid_value}; Path=/; HttpOnly")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _redirect(self, location):
+        self._send(302, headers={"Location": location})
+
+    def _json(self, payload, status=200):
+        self._send(status, json.dumps(payload), content_type="application/json")
+
+    def _handle(self, method):
+        server = self.server
+        start = time.perf_counter()
+        self._sid_value, self._new_sid = self._sid()
+        parts = urlsplit(self.path)
+        route = f"{method} {parts.path}"
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode("utf-8")) if length else {}
+
+        if server.latency or server.jitter:
+            time.sleep(max(0.0, server.latency + random.uniform(-server.jitter, server.jitter)))
+        try:
+            if server.error_rate and random.random() < server.error_rate:
+                self._send(500, "Internal Server Error", content_type="text/plain")
+            else:
+                handler = ROUTES.get((method, parts.path))
+                if handler is None:
+                    self._send(404, "Not Found", content_type="text/plain")
+                else:
+                    handler(self, form)
+        finally:
+            server.record(self._sid_value, route, start, time.perf_counter())
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    # ---------------- ROUTES ----------------
+    def _username(self):
+        with self.server.lock:
+            return self.server.sessions.get(self._sid_value)
+
+    def login_page(self, form, error=""):
+        self._send(200, LOGIN_PAGE % {"token": TOKEN, "error": error})
+
+    def login_post(self, form):
+        username = (form.get("EmailAddress") or [""])[0]
+        password = (form.get("Password") or [""])[0]
+        token = (form.get("__RequestVerificationToken") or [""])[0]
+        if not username or password != self.server.password or token != TOKEN:
+            self.login_page(form, error="Invalid username or password")
+            return
+        with self.server.lock:
+            self.server.sessions[self._sid_value] = username
+        self._redirect("/")
+
+    def logout(self, form):
+        with self.server.lock:
+            self.server.sessions.pop(self._sid_value, None)
+        self._redirect("/Home/Login")
+
+    def home(self, form):
+        if not self._username():
+            self._redirect("/Home/Login?ReturnUrl=%2F")
+            return
+        tiles = "\n        ".join(
+            f'<div class="tile"><a href="#"><div><div><p>Module {i}</p></div></div></a></div>' for i in range(1, 7)
+        )
+        self._send(200, HOME_PAGE % {"token": TOKEN, "tiles": tiles})
+
+    def mis_menu(self, form):
+        if not self._username():
+            self._json({"success": False, "message": "Session expired"}, status=401)
+            return
+        self._json({"success": True})
+
+    def day_status(self, form):
+        username = self._username()
+        if not username:
+            self._json({"success": False, "message": "Session expired"}, status=401)
+            return
+        with self.server.lock:
+            closed = self.server.stateful and username in self.server.closed_users
+        self._json({"success": True, "closed": closed})
+
+    def day_info_page(self, form):
+        username = self._username()
+        if not username:
+            self._redirect("/Home/Login?ReturnUrl=%2FDayOpenClose%2FIndex")
+            return
+        with self.server.lock:
+            closed = self.server.stateful and username in self.server.closed_users
+        self._send(200, DAY_INFO_PAGE % {"token": TOKEN, "disabled": "disabled" if closed else ""})
+
+    def day_close(self, form):
+        username = self._username()
+        if not username:
+            self._json({"success": False, "message": "Session expired"}, status=401)
+            return
+        server = self.server
+        if server.failure_rate and random.random() < server.failure_rate:
+            self._json({"success": False, "message": "Day close failed: server busy"})
+            return
+        with server.lock:
+            server.closed_users.add(username)
+            server.closes += 1
+        self._json({"success": True, "message": "Day Closed Successfully"})
+
+
+ROUTES = {
+    ("GET", "/Home/Login"): MockErpHandler.login_page,
+    ("POST", "/Home/Login"): MockErpHandler.login_post,
+    ("GET", "/Home/Logout"): MockErpHandler.logout,
+    ("GET", "/"): MockErpHandler.home,
+    ("GET", "/Home/MisMenu"): MockErpHandler.mis_menu,
+    ("GET", "/DayOpenClose/Status"): MockErpHandler.day_status,
+    ("GET", "/DayOpenClose/Index"): MockErpHandler.day_info_page,
+    ("POST", "/DayOpenClose/DayClose"): MockErpHandler.day_close,
+}
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Mock Shakti ERP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- random seconds around --latency")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="share of day-close actions rejected")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with HTTP 500")
+    parser.add_argument("--stateful", action="store_true", help="disable the close button once a user is closed")
+    args = parser.parse_args()
+
+    server = MockErpServer(port=args.port, host=args.host, latency=args.latency, jitter=args.jitter,
+                           failure_rate=args.failure_rate, error_rate=args.error_rate, stateful=args.stateful)
+    print(f"🧪 Mock ERP listening on {server.login_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
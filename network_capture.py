@@ -0,0 +1,345 @@
+"""Which ERP request made an attempt slow: per-request timings from Chrome's performance log.
+
+With capture on, Chrome logs its DevTools Network events; after each attempt
+they are paired by request id, split into blocking / connect / server wait /
+transfer time and attributed to the flow step (login, mis_nav, confirm, ...)
+that was running when the request was sent.
+
+    network_capture.enable_performance_log(options)      # when creating the driver
+    steps = step_metrics.timer(user, loop, windows=[])   # collect step windows
+    network_stats.record(username, loop, attempt, network_capture.drain(driver), steps.windows, seconds)
+    network_stats.write_json("results/day_close_network.json")
+    network_stats.write_har("results", "day_close_slowest")   # one HAR per slowest session
+"""
+import heapq
+import itertools
+import json
+import re
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from metrics import Histogram
+
+# ============ CONFIGURABLE PARAMETERS ============
+HAR_SLOWEST = 5  # Sessions kept in full for HAR export, slowest first
+NETWORK_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)  # Seconds; +Inf is implicit
+IGNORED_SCHEMES = ("data", "blob", "chrome", "chrome-extension", "about")
+ID_SEGMENT = re.compile(r"/(\d+|[0-9a-f]{8}-[0-9a-f-]{27,})(?=/|$)", re.IGNORECASE)
+PHASES = ("blocked", "dns", "connect", "ssl", "send", "wait", "receive")  # HAR timings; ssl is inside connect
+UNFINISHED_STEP = "unfinished"  # Requests sent after the last recorded step (the attempt failed mid-step)
+REDACTED_FIELDS = ("password", "pass", "pwd", "__requestverificationtoken")  # Form fields masked in HAR files
+REDACTED_HEADERS = ("cookie", "set-cookie", "authorization")  # HAR files get shared; sessions must not leak
+
+# ---------------- DRIVER SETUP ----------------
+def enable_performance_log(options):
+    """Turn on Chrome's performance log with Network events only (page/trace events stay off)."""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+    options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+    return options
+
+
+def drain(driver):
+    """Everything Chrome logged since the last call, or [] if the log is unavailable (driver gone)."""
+    try:
+        return driver.get_log("performance")
+    except Exception:
+        return []
+
+# ---------------- PARSING ----------------
+def endpoint(method, url):
+    """``METHOD /path`` with numeric/uuid path segments folded to ``{id}`` and the query dropped."""
+    parts = urlsplit(url)
+    return f"{method} {ID_SEGMENT.sub('/{id}', parts.path) or '/'}"
+
+
+def _phase(timing, start, end):
+    begin, finish = timing.get(start, -1), timing.get(end, -1)
+    return finish - begin if begin >= 0 and finish >= 0 else -1
+
+
+def split_timings(sent, timing, finished):
+    """HAR-style phases in ms from the send timestamp, Chrome's ResourceTiming and the finish timestamp.
+
+    ``blocked`` is queueing/stalled time before the connection is used,
+    ``wait`` is time to first byte after the request was sent (server time)
+    and ``receive`` the body transfer. Without ResourceTiming (served from
+    cache, failed early) everything lands in ``wait``.
+    """
+    total = max((finished - sent) * 1000, 0.0)
+    if not timing:
+        return dict({phase: -1 for phase in PHASES}, blocked=0.0, send=0.0, wait=total, receive=0.0), total
+    base = (timing["requestTime"] - sent) * 1000
+    first = next((timing[key] for key in ("dnsStart", "connectStart", "sendStart") if timing.get(key, -1) >= 0), 0)
+    send_end = timing.get("sendEnd", 0)
+    headers_end = timing.get("receiveHeadersEnd", send_end)
+    phases = {
+        "blocked": max(base + first, 0.0),
+        "dns": _phase(timing, "dnsStart", "dnsEnd"),
+        "connect": _phase(timing, "connectStart", "connectEnd"),
+        "ssl": _phase(timing, "sslStart", "sslEnd"),
+        "send": max(_phase(timing, "sendStart", "sendEnd"), 0.0),
+        "wait": max(headers_end - send_end, 0.0),
+        "receive": max((finished - timing["requestTime"]) * 1000 - headers_end, 0.0),
+    }
+    return phases, total
+
+
+def _headers(headers):
+    return [{"name": name, "value": "***" if name.lower() in REDACTED_HEADERS else str(value)}
+            for name, value in (headers or {}).items()]
+
+
+def _redact_form(text):
+    """Mask password-like fields in a form-encoded body; other bodies pass through."""
+    if not text or "=" not in text:
+        return text
+    fields = parse_qsl(text, keep_blank_values=True)
+    return urlencode([(k, "***" if k.lower() in REDACTED_FIELDS else v) for k, v in fields], safe="*") if fields else text
+
+
+def parse_requests(entries):
+    """Pair Network events from a performance log into finished requests, in send order.
+
+    Each request is a dict with url, method, endpoint, sent (epoch seconds),
+    status, phases (ms), total (ms), size and error. Redirect hops come back
+    as separate requests; requests still open at the end are dropped.
+    """
+    open_requests = {}
+    done = []
+
+    def finish(request, timestamp, error=None):
+        phases, total = split_timings(request["_ts"], request.pop("_timing", None), timestamp)
+        request.update(phases=phases, total=total, error=error)
+        del request["_ts"]
+        done.append(request)
+
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        method, params = message.get("method", ""), message.get("params", {})
+        request_id = params.get("requestId")
+        if method == "Network.requestWillBeSent":
+            request = params["request"]
+            if urlsplit(request["url"]).scheme in IGNORED_SCHEMES:
+                continue
+            previous = open_requests.pop(request_id, None)
+            if previous is not None and "redirectResponse" in params:
+                _apply_response(previous, params["redirectResponse"])
+                finish(previous, params["timestamp"])
+            open_requests[request_id] = {
+                "url": request["url"],
+                "method": request["method"],
+                "endpoint": endpoint(request["method"], request["url"]),
+                "sent": params.get("wallTime", 0.0),
+                "request_headers": request.get("headers", {}),
+                "post_data": request.get("postData"),
+                "status": 0,
+                "status_text": "",
+                "protocol": "",
+                "mime_type": "",
+                "response_headers": {},
+                "size": 0,
+                "_ts": params["timestamp"],
+            }
+        elif method == "Network.responseReceived" and request_id in open_requests:
+            _apply_response(open_requests[request_id], params["response"])
+        elif method == "Network.loadingFinished" and request_id in open_requests:
+            request = open_requests.pop(request_id)
+            request["size"] = params.get("encodedDataLength", request["size"])
+            finish(request, params["timestamp"])
+        elif method == "Network.loadingFailed" and request_id in open_requests:
+            finish(open_requests.pop(request_id), params["timestamp"], params.get("errorText", "failed"))
+    done.sort(key=lambda request: request["sent"])
+    return done
+
+
+def _apply_response(request, response):
+    request.update(status=response.get("status", 0), status_text=response.get("statusText", ""),
+                   protocol=response.get("protocol", ""), mime_type=response.get("mimeType", ""),
+                   response_headers=response.get("headers", {}), size=response.get("encodedDataLength", 0))
+    request["_timing"] = response.get("timing")
+
+
+def attribute(requests, windows, tail_step=UNFINISHED_STEP):
+    """Set ``request["step"]`` from the step windows [(step, start, end)] of the attempt.
+
+    A request belongs to the last step that had started when it was sent;
+    earlier ones go to the first step, later ones to ``tail_step``.
+    """
+    starts = [start for _, start, _ in windows]
+    for request in requests:
+        if not windows:
+            request["step"] = tail_step
+            continue
+        index = max(sum(1 for start in starts if start <= request["sent"]) - 1, 0)
+        step, _, end = windows[index]
+        request["step"] = tail_step if index == len(windows) - 1 and request["sent"] > end else step
+    return requests
+
+# ---------------- RUN STATS ----------------
+class EndpointStats:
+    def __init__(self):
+        self.total = Histogram(NETWORK_BUCKETS)
+        self.blocked = Histogram(NETWORK_BUCKETS)
+        self.connect = Histogram(NETWORK_BUCKETS)
+        self.wait = Histogram(NETWORK_BUCKETS)
+        self.receive = Histogram(NETWORK_BUCKETS)
+        self.failed = 0
+        self.bytes = 0
+        self.steps = {}
+
+    def observe(self, request):
+        phases = request["phases"]
+        self.total.observe(request["total"] / 1000)
+        self.blocked.observe(phases["blocked"] / 1000)
+        self.connect.observe(max(phases["dns"], 0) / 1000 + max(phases["connect"], 0) / 1000)
+        self.wait.observe(phases["wait"] / 1000)
+        self.receive.observe(phases["receive"] / 1000)
+        self.bytes += request["size"] or 0
+        if request["error"] or request["status"] >= 500:
+            self.failed += 1
+        self.steps[request["step"]] = self.steps.get(request["step"], 0) + 1
+
+    def to_dict(self):
+        return {
+            "count": self.total.count,
+            "failed": self.failed,
+            "avg_kb": round(self.bytes / self.total.count / 1024, 1) if self.total.count else 0.0,
+            "steps": dict(self.steps),
+            "total": self.total.to_dict(),
+            "blocked": self.blocked.to_dict(),
+            "connect": self.connect.to_dict(),
+            "wait": self.wait.to_dict(),
+            "receive": self.receive.to_dict(),
+        }
+
+
+class NetworkStats:
+    """Per-endpoint latency for a run, plus the full request list of the slowest sessions."""
+
+    def __init__(self, keep_slowest=HAR_SLOWEST):
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self.keep_slowest = keep_slowest
+        self.endpoints = {}
+        self.sessions = 0
+        self.slowest = []  # min-heap of (seconds, seq, session)
+
+    def record(self, username, loop, attempt, entries, windows, seconds, tail_step=UNFINISHED_STEP):
+        """Parse one attempt's performance-log ``entries`` and fold them into the run's stats."""
+        requests = attribute(parse_requests(entries), windows or [], tail_step)
+        session = {"username": username, "loop": loop, "attempt": attempt, "seconds": seconds,
+                   "windows": windows or [], "requests": requests}
+        with self._lock:
+            self.sessions += 1
+            for request in requests:
+                self.endpoints.setdefault(request["endpoint"], EndpointStats()).observe(request)
+            item = (seconds, next(self._seq), session)
+            if len(self.slowest) < self.keep_slowest:
+                heapq.heappush(self.slowest, item)
+            elif self.keep_slowest and seconds > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, item)
+        return requests
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "sessions": self.sessions,
+                "endpoints": {key: stats.to_dict() for key, stats in
+                              sorted(self.endpoints.items(), key=lambda item: item[1].total.sum, reverse=True)},
+                "slowest_sessions": [{"username": s["username"], "loop": s["loop"], "attempt": s["attempt"],
+                                      "seconds": round(s["seconds"], 3), "requests": len(s["requests"])}
+                                     for _, _, s in sorted(self.slowest, reverse=True)],
+            }
+
+    def summary(self, limit=15):
+        """Per-endpoint table (heaviest total time first) for the run log."""
+        endpoints = self.to_dict()["endpoints"]
+        lines = [f"🌐 {'endpoint':<48}{'n':>6}{'fail':>6}{'p50':>8}{'p95':>8}{'block':>8}{'conn':>8}"
+                 f"{'server':>8}{'xfer':>8}  (p95 in s; steps)"]
+        for key, e in list(endpoints.items())[:limit]:
+            steps = ",".join(e["steps"])
+            lines.append(f"🌐 {key[:48]:<48}{e['count']:>6}{e['failed']:>6}{e['total']['p50']:>8.3f}"
+                         f"{e['total']['p95']:>8.3f}{e['blocked']['p95']:>8.3f}{e['connect']['p95']:>8.3f}"
+                         f"{e['wait']['p95']:>8.3f}{e['receive']['p95']:>8.3f}  {steps}")
+        return "\n".join(lines)
+
+    def write_json(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2), encoding='utf-8')
+        return path
+
+    def write_har(self, directory, prefix):
+        """One HAR 1.2 file per kept session, slowest first; steps become HAR pages. Returns the paths."""
+        with self._lock:
+            sessions = [s for _, _, s in sorted(self.slowest, reverse=True)]
+        paths = []
+        for rank, session in enumerate(sessions, start=1):
+            path = Path(directory) / f"{prefix}_{rank}_{session['username']}.har"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(to_har(session), indent=1), encoding='utf-8')
+            paths.append(path)
+        return paths
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+            self.slowest.clear()
+            self.sessions = 0
+
+# ---------------- HAR ----------------
+def _iso(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat(timespec='milliseconds').replace("+00:00", "Z")
+
+
+def to_har(session):
+    """HAR 1.2 document for one session's requests (passwords and cookies masked)."""
+    pages = [{"id": step, "title": f"{session['username']} loop {session['loop']} attempt {session['attempt']}: {step}",
+              "startedDateTime": _iso(start), "pageTimings": {"onLoad": round((end - start) * 1000, 1)}}
+             for step, start, end in session["windows"]]
+    page_ids = {page["id"] for page in pages}
+    entries = []
+    for request in session["requests"]:
+        timings = {phase: round(value, 3) for phase, value in request["phases"].items()}
+        entry = {
+            "startedDateTime": _iso(request["sent"]),
+            "time": round(request["total"], 3),
+            "request": {
+                "method": request["method"],
+                "url": request["url"],
+                "httpVersion": request["protocol"] or "HTTP/1.1",
+                "headers": _headers(request["request_headers"]),
+                "queryString": [{"name": k, "value": v} for k, v in parse_qsl(urlsplit(request["url"]).query)],
+                "cookies": [],
+                "headersSize": -1,
+                "bodySize": len(request["post_data"] or ""),
+            },
+            "response": {
+                "status": request["status"],
+                "statusText": request["status_text"],
+                "httpVersion": request["protocol"] or "HTTP/1.1",
+                "headers": _headers(request["response_headers"]),
+                "cookies": [],
+                "content": {"size": request["size"] or 0, "mimeType": request["mime_type"]},
+                "redirectURL": next((v for k, v in request["response_headers"].items() if k.lower() == "location"), ""),
+                "headersSize": -1,
+                "bodySize": request["size"] or 0,
+            },
+            "cache": {},
+            "timings": timings,
+            "comment": request["step"] + (f" ({request['error']})" if request["error"] else ""),
+        }
+        if request["post_data"]:
+            entry["request"]["postData"] = {
+                "mimeType": request["request_headers"].get("Content-Type", ""), "text": _redact_form(request["post_data"])}
+        if request["step"] in page_ids:
+            entry["pageref"] = request["step"]
+        entries.append(entry)
+    return {"log": {"version": "1.2", "creator": {"name": "day-close network_capture", "version": "1.0"},
+                    "pages": pages, "entries": entries}}
+
+network_stats = NetworkStats()
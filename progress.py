@@ -0,0 +1,211 @@
+"""Live progress page for a running day-close loop.
+
+Worker threads only append to a deque (atomic in CPython, no lock); the
+HTTP handler folds those events into its own counters when a page is
+requested, so watching the run costs the workers next to nothing. When
+nobody is watching, the worker that pushes the backlog past FOLD_EVERY
+folds it, so the deque stays bounded on long runs.
+
+    http://127.0.0.1:8765/               auto-refreshing HTML
+    http://127.0.0.1:8765/progress.json  the same numbers as JSON
+"""
+import heapq
+import json
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from retry import CUTOFF, LATE_SUCCESS
+
+# ============ CONFIGURABLE PARAMETERS ============
+DEFAULT_PORT = 8765
+RATE_WINDOWS = (10, 60, 300)  # Seconds for the sliding attempts/sec figures
+STALL_AFTER = 30  # Seconds without a finished attempt (while some are in flight) that count as a stall
+RECENT_USERS = 50  # Most recently finished users shown on the page
+FOLD_EVERY = 1000  # Unread events a worker folds itself (skipped while a page request is folding)
+
+# ---------------- TRACKER ----------------
+class ProgressTracker:
+    """Run progress fed by ``record(result)`` from the workers and read by the progress server."""
+
+    def __init__(self):
+        self._events = deque()  # (monotonic time, status, reason, username, message); appended by workers
+        self._fold_lock = threading.Lock()  # Readers wait on this; workers only try it
+        self._recent = deque()  # Finish times within the largest rate window
+        self.counts = Counter()
+        self.reasons = Counter()
+        self.last_status = {}  # username → (status, reason or message, monotonic time)
+        self.closed = set()
+        self.total = 0
+        self.last_finish = None
+        self.started = None
+        self.deadline = None
+        self.scheduler = None
+
+    def start(self, scheduler=None, duration=None):
+        """Mark the window as open; ``scheduler`` supplies in-flight and user counts."""
+        self.scheduler = scheduler
+        self.started = time.monotonic()
+        self.deadline = self.started + duration if duration else None
+
+    def record(self, result):
+        """Called once per finished attempt, from any thread."""
+        self._events.append((time.monotonic(), result['status'], result.get('reason'),
+                             result['username'], result.get('message', '')))
+        if len(self._events) > FOLD_EVERY and self._fold_lock.acquire(blocking=False):
+            try:
+                self._fold()
+            finally:
+                self._fold_lock.release()
+
+    def _fold(self):
+        while True:
+            try:
+                at, status, reason, username, message = self._events.popleft()
+            except IndexError:
+                break
+            if reason == LATE_SUCCESS:
+                # The cutoff error already counted for this attempt becomes a success
+                self.counts['error'] -= 1
+                self.counts['success'] += 1
+                self.reasons[CUTOFF] -= 1
+                for counter, key in ((self.counts, 'error'), (self.reasons, CUTOFF)):
+                    if counter[key] <= 0:
+                        del counter[key]
+                self.closed.add(username)
+                self.last_status[username] = (status, reason, at)
+                continue
+            self.total += 1
+            self.counts[status] += 1
+            if status != 'success':
+                self.reasons[reason or status] += 1
+            else:
+                self.closed.add(username)
+            self.last_status[username] = (status, reason or message, at)
+            self._recent.append(at)
+            self.last_finish = at
+        horizon = time.monotonic() - max(RATE_WINDOWS)
+        while self._recent and self._recent[0] < horizon:
+            self._recent.popleft()
+
+    def snapshot(self):
+        """Everything the page shows, as a JSON-ready dict."""
+        with self._fold_lock:
+            self._fold()
+            now = time.monotonic()
+            elapsed = now - self.started if self.started else 0.0
+            rates = {}
+            for window in RATE_WINDOWS:
+                span = min(window, elapsed) or 1.0
+                rates[f"{window}s"] = round(sum(1 for at in self._recent if at >= now - window) / span, 3)
+            in_flight = self.scheduler.in_flight if self.scheduler is not None else 0
+            users_seen = len(self.scheduler.creds) if self.scheduler is not None else len(self.last_status)
+            remaining_users = max(users_seen - len(self.closed), 0)
+            close_rate = len(self.closed) / elapsed if elapsed else 0.0
+            since_last = now - (self.last_finish or self.started or now)
+            recent = heapq.nlargest(RECENT_USERS, self.last_status.items(), key=lambda item: item[1][2])
+            return {
+                "elapsed": round(elapsed, 1),
+                "window_left": round(max(self.deadline - now, 0.0), 1) if self.deadline else None,
+                "attempts": self.total,
+                "attempts_per_sec": dict(rates, overall=round(self.total / elapsed, 3) if elapsed else 0.0),
+                "in_flight": in_flight,
+                "counts": dict(self.counts),
+                "errors": dict(self.reasons),
+                "users_seen": users_seen,
+                "users_closed": len(self.closed),
+                "eta_all_closed": round(remaining_users / close_rate, 1) if close_rate and remaining_users else None,
+                "seconds_since_last_result": round(since_last, 1),
+                "stalled": in_flight > 0 and since_last > STALL_AFTER,
+                "users": [{"username": user, "status": status, "detail": detail, "ago": round(now - at, 1)}
+                          for user, (status, detail, at) in recent],
+            }
+
+# ---------------- PAGE ----------------
+PAGE = """<!DOCTYPE html>
+<html><head><title>Day close progress</title><meta charset="utf-8">
+<style>
+body{font-family:sans-serif;margin:2em}table{border-collapse:collapse}td,th{padding:2px 10px;text-align:left}
+.stalled{background:#c00;color:#fff;padding:4px 8px}.success{color:#080}.failure,.error{color:#c00}
+</style></head>
+<body>
+<h2>Day close progress</h2>
+<div id="summary">loading…</div>
+<h3>Recent users</h3>
+<table id="users"></table>
+<script>
+const fmt = (s) => s === null ? '–' : s + 's';
+const esc = (s) => String(s).replace(/[&<>"]/g, (c) => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}[c]));
+async function refresh() {
+  try {
+    const p = await (await fetch('progress.json')).json();
+    const rates = Object.entries(p.attempts_per_sec).map(([w, r]) => `${w}: ${r}/s`).join(' · ');
+    const errors = Object.entries(p.errors).map(([r, n]) => `${r} ${n}`).join(', ') || 'none';
+    document.getElementById('summary').innerHTML =
+      (p.stalled ? `<p class="stalled">STALLED: no attempt finished for ${p.seconds_since_last_result}s</p>` : '') +
+      `<p>Elapsed ${p.elapsed}s · window left ${fmt(p.window_left)} · in flight ${p.in_flight}</p>` +
+      `<p>Attempts ${p.attempts} · ${rates}</p>` +
+      `<p>Closed ${p.users_closed}/${p.users_seen} users · ETA ${fmt(p.eta_all_closed)}</p>` +
+      `<p>Status ${JSON.stringify(p.counts)} · errors: ${errors}</p>`;
+    document.getElementById('users').innerHTML = '<tr><th>user</th><th>status</th><th>detail</th><th>ago</th></tr>' +
+      p.users.map(u => `<tr><td>${esc(u.username)}</td><td class="${esc(u.status)}">${esc(u.status)}</td>` +
+                       `<td>${esc(u.detail || '')}</td><td>${u.ago}s</td></tr>`).join('');
+  } catch (e) {
+    document.getElementById('summary').textContent = 'run finished or server stopped';
+  }
+}
+refresh();
+setInterval(refresh, 2000);
+</script>
+</body></html>
+"""
+
+# ---------------- SERVER ----------------
+class ProgressServer(ThreadingHTTPServer):
+    """Serves a tracker's snapshot on localhost from a daemon thread."""
+
+    daemon_threads = True
+
+    def __init__(self, tracker, port=DEFAULT_PORT, host="127.0.0.1"):
+        super().__init__((host, port), ProgressHandler)
+        self.tracker = tracker
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        """Serve from a background thread; returns self for chaining."""
+        self._thread = threading.Thread(target=self.serve_forever, name="progress", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class ProgressHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass  # Page refreshes would flood the run log
+
+    def _send(self, status, body, content_type):
+        body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path in ("/", "/index.html"):
+            self._send(200, PAGE, "text/html; charset=utf-8")
+        elif path == "/progress.json":
+            self._send(200, json.dumps(self.server.tracker.snapshot()), "application/json")
+        else:
+            self._send(404, "not found", "text/plain")
@@ -0,0 +1,112 @@
+import csv
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+
+from retry import LATE_SUCCESS
+
+logger = logging.getLogger(__name__)
+
+# ============ CONFIGURABLE PARAMETERS ============
+FLUSH_EVERY = 50  # Write buffered results after this many arrive...
+FLUSH_INTERVAL = 5.0  # ...or after this many seconds, whichever comes first
+DETAIL_FIELDS = ['loop', 'attempt', 'username', 'status', 'timestamp', 'message', 'reason', 'duration']
+
+# ---------------- RESULT SINK ----------------
+class ResultSink:
+    """Append results to disk as they arrive and keep only per-user counters in memory.
+
+    ``fmt`` is ``"csv"`` (the detailed-results columns) or ``"jsonl"`` (every
+    field of each result dict). A crashed run leaves everything up to the last
+    flush on disk. A ``late_success`` row is written too, but counted as the
+    success of the cutoff attempt it follows, not as another attempt.
+    """
+
+    def __init__(self, path, fmt="csv", flush_every=FLUSH_EVERY, flush_interval=FLUSH_INTERVAL):
+        if fmt not in ("csv", "jsonl"):
+            raise ValueError(f"Unsupported result format: {fmt}")
+        self.path = Path(path)
+        self.fmt = fmt
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'w', newline='', encoding='utf-8')
+        self._writer = None
+        if fmt == "csv":
+            self._writer = csv.DictWriter(self._file, fieldnames=DETAIL_FIELDS, extrasaction='ignore')
+            self._writer.writeheader()
+            self._file.flush()
+        self._lock = threading.Lock()
+        self._buffer = []
+        self._last_flush = time.monotonic()
+        self.user_stats = {}
+        self.counts = {'success': 0, 'failure': 0, 'error': 0}
+        self.total = 0
+
+    def add(self, result):
+        """Record one result dict; safe to call from worker threads."""
+        with self._lock:
+            self._count(result)
+            self._buffer.append(result)
+            if (len(self._buffer) >= self.flush_every
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_locked()
+
+    def _count(self, result):
+        username = result['username']
+        stats = self.user_stats.get(username)
+        if stats is None:
+            stats = self.user_stats[username] = {
+                'username': username,
+                'total_attempts': 0,
+                'successes': 0,
+                'failures': 0,
+                'errors': 0
+            }
+        if result.get('reason') == LATE_SUCCESS:
+            # Same attempt as the cutoff error already counted: turn that error into a success
+            stats['errors'] -= 1
+            stats['successes'] += 1
+            self.counts['error'] -= 1
+            self.counts['success'] += 1
+            return
+        stats['total_attempts'] += 1
+        status = result['status'] if result['status'] in ('success', 'failure') else 'error'
+        stats[{'success': 'successes', 'failure': 'failures', 'error': 'errors'}[status]] += 1
+        self.counts[status] += 1
+        self.total += 1
+
+    def _flush_locked(self):
+        if self._buffer:
+            if self._writer is not None:
+                self._writer.writerows(self._buffer)
+            else:
+                self._file.writelines(json.dumps(r, default=str) + "\n" for r in self._buffer)
+            self._file.flush()
+            self._buffer.clear()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._flush_locked()
+            self._file.close()
+
+
+def read_results(path, fmt=None):
+    """Yield the result dicts of a detailed-results file (format from the suffix unless given)."""
+    fmt = fmt or ("jsonl" if str(path).endswith(".jsonl") else "csv")
+    with open(path, newline='', encoding='utf-8') as f:
+        if fmt == "jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
@@ -0,0 +1,222 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from collections import Counter, deque
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+logger = logging.getLogger(__name__)
+
+# ============ CONFIGURABLE PARAMETERS ============
+MAX_RETRIES = 3  # Retries per user after consecutive retryable failures; then the user is given up on
+BASE_DELAY = 2.0  # Seconds before the first retry; doubled for every further one
+MAX_DELAY = 60.0  # Cap on the backoff delay
+BREAKER_WINDOW = 20  # Recent attempts the circuit breaker looks at
+BREAKER_MIN_ATTEMPTS = 10  # Don't trip on fewer attempts than this
+BREAKER_ERROR_RATE = 0.5  # Open the circuit when more than this share of the window failed server-side
+BREAKER_COOLDOWN = 30.0  # Seconds the circuit stays open before a single probe attempt
+
+# ---------------- FAILURE CLASSIFICATION ----------------
+LOGIN_REJECTED = "login_rejected"
+TIMEOUT = "timeout"  # Element or request never arrived
+NOT_ACKNOWLEDGED = "not_acknowledged"  # Yes clicked, ERP never confirmed
+DRIVER_CRASH = "driver_crash"
+SERVER_ERROR = "server_error"
+OTHER = "other"
+CUTOFF = "cutoff"  # Stopped at a hard run deadline (scheduler.RollingScheduler with deadline_aware)
+LATE_SUCCESS = "late_success"  # A CUTOFF attempt that closed the day after all; replaces its CUTOFF row
+
+RETRYABLE = {TIMEOUT, NOT_ACKNOWLEDGED, DRIVER_CRASH, SERVER_ERROR}
+SERVER_SIDE = {TIMEOUT, NOT_ACKNOWLEDGED, SERVER_ERROR}  # What the circuit breaker counts against the ERP
+
+
+def reason_for_exception(e):
+    """Failure category for an exception raised while driving the browser."""
+    if isinstance(e, TimeoutException):
+        return TIMEOUT
+    if isinstance(e, WebDriverException):
+        return DRIVER_CRASH
+    return OTHER
+
+
+def classify(result):
+    """Failure category of a result dict, or None for a success.
+
+    Uses ``result['reason']`` when the producer set one, otherwise the message
+    (the HTTP engine and the csv/ scripts only return text).
+    """
+    if result['status'] == 'success':
+        return None
+    if result.get('reason'):
+        return result['reason']
+    message = str(result.get('message', '')).lower()
+    if 'login rejected' in message or 'not authenticated' in message:
+        return LOGIN_REJECTED
+    if 'not acknowledged' in message or 'rejected' in message:
+        return NOT_ACKNOWLEDGED
+    if 'timeout' in message or 'timed out' in message:
+        return TIMEOUT
+    if any(marker in message for marker in ('clientresponseerror: 5', 'clientconnector', 'serverdisconnected',
+                                            'connection reset', 'connection refused')):
+        return SERVER_ERROR
+    if ('session' in message and ('deleted' in message or 'invalid' in message)) or 'chrome not reachable' in message:
+        return DRIVER_CRASH
+    return OTHER
+
+# ---------------- BACKOFF ----------------
+def backoff_delay(retry_number, base=BASE_DELAY, cap=MAX_DELAY):
+    """Exponential backoff with equal jitter: half the step is fixed, half is random."""
+    step = min(cap, base * 2 ** (retry_number - 1))
+    return step / 2 + random.uniform(0, step / 2)
+
+
+class RetryQueue:
+    """Users waiting for a retry, ordered by when they are due.
+
+    Not locked: the scheduler calls it while holding its own condition lock.
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES, base_delay=BASE_DELAY, max_delay=MAX_DELAY):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._heap = []  # (due, seq, index, username)
+        self._seq = 0
+        self._waiting = set()
+        self._failures = Counter()  # Consecutive retryable failures per user
+        self.abandoned = set()  # Permanent failures or retries exhausted
+        self.retries = Counter()  # Retries scheduled per failure category
+        self.given_up = Counter()  # Users dropped per failure category
+
+    def record(self, index, result):
+        """Queue a retry for a retryable failure; returns the failure category (None on success)."""
+        username = result['username']
+        reason = classify(result)
+        if reason is None:
+            self._failures.pop(username, None)
+            return None
+        if reason not in RETRYABLE or self._failures[username] >= self.max_retries:
+            self.abandoned.add(username)
+            self.given_up[reason] += 1
+            logger.warning(f"🛑 Giving up on {username} ({reason}) after {self._failures[username]} retries")
+            return reason
+        self._failures[username] += 1
+        delay = backoff_delay(self._failures[username], self.base_delay, self.max_delay)
+        self._seq += 1
+        heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, index, username))
+        self._waiting.add(username)
+        self.retries[reason] += 1
+        logger.info(f"🔁 Retry {self._failures[username]}/{self.max_retries} for {username} ({reason}) in {delay:.1f}s")
+        return reason
+
+    def is_waiting(self, username):
+        return username in self._waiting
+
+    def pop_due(self, is_free):
+        """Index of the earliest due retry whose user ``is_free(username)``, or None."""
+        now = time.monotonic()
+        held = []
+        found = None
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            if is_free(entry[3]):
+                found = entry
+                break
+            held.append(entry)
+        for entry in held:
+            heapq.heappush(self._heap, entry)
+        if found is None:
+            return None
+        self._waiting.discard(found[3])
+        return found[2]
+
+    def summary(self):
+        retries = ", ".join(f"{reason} {n}" for reason, n in self.retries.items()) or "none"
+        given_up = ", ".join(f"{reason} {n}" for reason, n in self.given_up.items()) or "none"
+        return f"🔁 Retries: {retries} | 🛑 Given up: {given_up}"
+
+# ---------------- CIRCUIT BREAKER ----------------
+class CircuitBreaker:
+    """Stops new attempts while the ERP is failing, then lets one probe through.
+
+    closed → open when the server-side failure rate of the last ``window``
+    attempts exceeds ``error_rate``; open → half-open after ``cooldown``
+    seconds; the single half-open probe closes the circuit on success or
+    re-opens it on failure. Attempts that started before the last state change
+    are ignored, since they say nothing about the ERP's current health.
+    ``clock`` is the monotonic time source (swapped out by the tests).
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, window=BREAKER_WINDOW, min_attempts=BREAKER_MIN_ATTEMPTS,
+                 error_rate=BREAKER_ERROR_RATE, cooldown=BREAKER_COOLDOWN, clock=time.monotonic):
+        self.window = window
+        self.min_attempts = min_attempts
+        self.error_rate = error_rate
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self._changed_at = self.clock()
+        self._probe_out = False
+        self.trips = 0
+
+    def _set(self, state):
+        logger.warning(f"⚡ Circuit {self.state} → {state}")
+        self.state = state
+        self._changed_at = self.clock()
+        self._probe_out = False
+
+    def allow(self):
+        """May a new attempt start now? In half-open state only one probe is let through."""
+        with self._lock:
+            if self.state == self.OPEN and self.clock() - self._changed_at >= self.cooldown:
+                self._set(self.HALF_OPEN)
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probe_out:
+                self._probe_out = True
+                return True
+            return False
+
+    def release(self):
+        """Hand back an unused half-open probe (``allow()`` said yes but nothing was started)."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_out = False
+
+    def wait_until_allowed(self, poll=0.5):
+        """Blocking ``allow()`` for plain worker threads."""
+        while not self.allow():
+            time.sleep(poll)
+
+    def record(self, result, duration):
+        """Feed one finished attempt (result dict and how long it ran)."""
+        failed = classify(result) in SERVER_SIDE
+        with self._lock:
+            if self.clock() - duration < self._changed_at:
+                return
+            if self.state == self.HALF_OPEN:
+                if failed:
+                    self._set(self.OPEN)
+                else:
+                    self._outcomes.clear()
+                    self._set(self.CLOSED)
+                return
+            if self.state == self.OPEN:
+                return
+            self._outcomes.append(failed)
+            if len(self._outcomes) >= self.min_attempts:
+                rate = sum(self._outcomes) / len(self._outcomes)
+                if rate > self.error_rate:
+                    logger.warning(f"⚡ {rate:.0%} of the last {len(self._outcomes)} attempts failed server-side")
+                    self._outcomes.clear()
+                    self.trips += 1
+                    self._set(self.OPEN)
+
+    def summary(self):
+        return f"⚡ Circuit breaker: {self.trips} trips, now {self.state}"
@@ -0,0 +1,345 @@
+import logging
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from retry import CUTOFF, LATE_SUCCESS
+
+logger = logging.getLogger(__name__)
+
+# ============ CONFIGURABLE PARAMETERS ============
+DEADLINE_MARGIN = 1.2  # Deadline-aware runs only start an attempt if 1.2x its expected duration still fits
+DURATION_SMOOTHING = 0.3  # Weight of the newest attempt in a user's moving-average duration
+
+# ---------------- ROLLING SCHEDULER ----------------
+class RollingScheduler:
+    """Keep ``concurrency`` attempts in flight until the run window closes.
+
+    Credentials are cycled round-robin: as soon as an attempt finishes its
+    slot is refilled with the next user that is not already running, so a
+    slow user never holds the other slots idle and no user runs twice at once.
+    ``loop`` in each result is the pass number for that user. Results go to
+    ``on_result`` when given (e.g. a streaming sink), otherwise to ``results``.
+    With a ``controller`` (see ``concurrency.AdaptiveConcurrency``) the number
+    of slots follows ``controller.adjust()`` instead of staying fixed.
+    ``skip(username)`` (e.g. ``day_status.DayStatusStore.is_closed``) is asked
+    before every dispatch; the run ends early once every user is skipped.
+    With a ``retry`` queue (``retry.RetryQueue``) retryable failures come back
+    after their backoff ahead of the round-robin order, and users it gives up
+    on are dropped; a ``breaker`` (``retry.CircuitBreaker``) holds back new
+    attempts while it is open.
+
+    ``creds`` may be any iterable (e.g. ``credentials.iter_credentials``): it
+    is pulled one user at a time as slots free up, so the first attempts start
+    before the whole list is read, and unseen users go ahead of second passes.
+    ``route(cred)`` names a lane for each user and ``route_limits`` caps how
+    many attempts of a lane run at once (lanes without a limit share the rest).
+
+    With ``deadline_aware`` an attempt only starts if the user's moving-average
+    duration (or the run's, for users not tried yet) says it will finish
+    before the window closes. At the deadline ``cutoff`` (a threading.Event
+    tasks may check at safe points) is set, in-flight attempts get ``grace``
+    seconds to finish, and any still running are reported as ``cutoff``
+    errors. The run then waits up to ``late_wait`` seconds more for them: a
+    late success (the ERP did close that day) is still passed on, marked
+    ``late``, so a cutoff error never hides a close that happened; late
+    failures and anything finishing after ``late_wait`` are dropped.
+    """
+
+    def __init__(self, concurrency, on_result=None, poll_interval=0.5, controller=None, skip=None,
+                 retry=None, breaker=None, route=None, route_limits=None,
+                 deadline_aware=False, cutoff=None, grace=5.0, late_wait=30.0):
+        self.concurrency = controller.limit if controller else concurrency
+        self.on_result = on_result
+        self.poll_interval = poll_interval
+        self.controller = controller
+        self.skip = skip
+        self.retry = retry
+        self.breaker = breaker
+        self.route = route
+        self.route_limits = route_limits or {}
+        self.creds = []
+        self.skipped = set()
+        self._source = None
+        self._index_of = {}
+        self._routes = []
+        self._route_running = Counter()
+        self.deadline_aware = deadline_aware
+        self.cutoff = cutoff or threading.Event()
+        self.grace = grace
+        self.late_wait = late_wait
+        self._avg_duration = {}  # username → moving-average attempt seconds
+        self._avg_all = None
+        self._end_time = None
+        self._started = {}  # username → (loop, attempt, perf_counter start) while in flight
+        self._late = set()  # Users reported as cut off whose attempt is still running
+        self._held = False  # Someone was held back for the deadline in the current tick
+        self.held_back = set()  # Users not started because they would have overrun the deadline
+        self.cut_off = []  # Users whose attempt was still running after the grace period
+        self.late_successes = []  # Cut-off users whose attempt then succeeded (recorded anyway)
+        self._late_closed = False  # Past late_wait: on_result's sinks may be closed
+        self._cond = threading.Condition()
+        self._running = set()
+        self._passes = {}
+        self.results = []
+        self.busy_seconds = 0.0
+        self.capacity_seconds = 0.0
+        self.started_at = None
+        self.finished_at = None
+
+    # ---------------- DISPATCH ----------------
+    def _is_done(self, username):
+        return ((self.skip is not None and self.skip(username)) or
+                (self.retry is not None and username in self.retry.abandoned))
+
+    def _has_room(self, index):
+        limit = self.route_limits.get(self._routes[index])
+        return limit is None or self._route_running[self._routes[index]] < limit
+
+    def _fits(self, username):
+        """Would an attempt for ``username`` started now finish before the deadline?"""
+        if not self.deadline_aware:
+            return True
+        estimate = self._avg_duration.get(username, self._avg_all)
+        if estimate is None or time.perf_counter() + estimate * DEADLINE_MARGIN <= self._end_time:
+            return True
+        self.held_back.add(username)
+        self._held = True
+        return False
+
+    def _can_start(self, index):
+        return self._has_room(index) and self._fits(self.creds[index]['username'])
+
+    def _pull(self, order):
+        """Read the next user that still needs work from the source into ``order``; its index, or None."""
+        while self._source is not None:
+            try:
+                cred = next(self._source)
+            except StopIteration:
+                self._source = None
+                return None
+            username = cred['username']
+            if username in self._index_of:
+                continue  # Loader already dedupes; a plain list may not
+            if self._is_done(username):
+                self.skipped.add(username)
+                continue
+            index = len(self.creds)
+            self._index_of[username] = index
+            self.creds.append(cred)
+            self._routes.append(self.route(cred) if self.route else None)
+            order.append(index)
+            return index
+        return None
+
+    def _start(self, index):
+        username = self.creds[index]['username']
+        self._passes[username] = self._passes.get(username, 0) + 1
+        return index, self._passes[username]
+
+    def _next_job(self, order):
+        """Next job: a due retry first, then a user not tried yet, then rotate to the next
+        user not in flight, skipped, backing off or over its lane's limit; None if nobody fits."""
+        if self.retry is not None:
+            index = self.retry.pop_due(lambda u: u not in self._running and not self._is_done(u)
+                                       and self._can_start(self._index_of[u]))
+            if index is not None:
+                return self._start(index)
+        while self._source is not None:
+            index = self._pull(order)
+            if index is not None and self._can_start(index):
+                return self._start(index)  # First passes go before anyone's second
+            if index is not None and self.creds[index]['username'] in self.held_back:
+                break  # New users all share the run's average, so none of the rest would fit either
+        for _ in range(len(order)):
+            index = order[0]
+            username = self.creds[index]['username']
+            if self._is_done(username):
+                order.popleft()  # Done for good; stop rotating over it
+                self.skipped.add(username)
+                continue
+            order.rotate(-1)
+            if self.retry is not None and self.retry.is_waiting(username):
+                continue  # Comes back through the retry queue once its backoff is over
+            if username not in self._running and self._can_start(index):
+                return self._start(index)
+        return None
+
+    def _on_done(self, future, index, username, loop_num, attempt_num, started):
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"Thread exception: {e}")
+            result = {
+                "loop": loop_num,
+                "attempt": attempt_num,
+                "username": username,
+                "status": "error",
+                "timestamp": datetime.now().strftime("%H:%M:%S.%f")[:-3],
+                "message": str(e)
+            }
+        duration = time.perf_counter() - started
+        with self._cond:
+            if username in self._late:
+                self._late.discard(username)
+                self._cond.notify_all()
+                if result['status'] != 'success':
+                    logger.info(f"⏰ {username} finished {result['status']} after the cutoff; result dropped")
+                elif self._late_closed:
+                    logger.warning(f"⏰ {username} closed successfully after the run ended; not recorded, "
+                                   f"check that user's day status before the next run")
+                else:
+                    # The ERP closed the day: record it (under the lock, so run() cannot return mid-way)
+                    logger.warning(f"⏰ {username} succeeded after the cutoff; recording the late success")
+                    result["late"] = True
+                    result["reason"] = LATE_SUCCESS  # Sinks swap this attempt's CUTOFF error for this success
+                    result["message"] = f"{result.get('message', '')} (after the cutoff)".strip()
+                    result["duration"] = round(duration, 3)
+                    self.late_successes.append(username)
+                    if self.on_result is not None:
+                        self.on_result(result)
+                    else:
+                        self.results.append(result)
+                return
+            previous = self._avg_duration.get(username)
+            self._avg_duration[username] = duration if previous is None else (
+                DURATION_SMOOTHING * duration + (1 - DURATION_SMOOTHING) * previous)
+            self._avg_all = duration if self._avg_all is None else (
+                DURATION_SMOOTHING * duration + (1 - DURATION_SMOOTHING) * self._avg_all)
+        result.setdefault("duration", round(duration, 3))
+        if self.on_result is not None:
+            self.on_result(result)
+        if self.controller is not None:
+            self.controller.record(result['status'] == 'error', duration)
+        if self.breaker is not None:
+            self.breaker.record(result, duration)
+        with self._cond:
+            if self.retry is not None:
+                self.retry.record(index, result)
+            self._running.discard(username)
+            self._started.pop(username, None)
+            self._route_running[self._routes[index]] -= 1
+            self.busy_seconds += duration
+            if self.on_result is None:
+                self.results.append(result)
+            self._cond.notify_all()
+
+    def run(self, creds, task, duration):
+        """Run ``task(username, password, loop_num, attempt_num)`` for ``duration`` seconds."""
+        order = deque()
+        self._source = iter(creds)
+        self.started_at = time.perf_counter()
+        end_time = self._end_time = self.started_at + duration
+        max_workers = self.controller.maximum if self.controller else self.concurrency
+        last_tick = self.started_at
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dayclose")
+        try:
+            with self._cond:
+                while time.perf_counter() < end_time:
+                    now = time.perf_counter()
+                    self.capacity_seconds += self.concurrency * (now - last_tick)
+                    last_tick = now
+                    if self.controller is not None:
+                        self.concurrency = self.controller.adjust()
+                    self._held = False
+                    while len(self._running) < self.concurrency:
+                        if self.breaker is not None and not self.breaker.allow():
+                            break  # Circuit open (or its probe is out); try again next tick
+                        job = self._next_job(order)
+                        if job is None:
+                            if self.breaker is not None:
+                                self.breaker.release()
+                            break  # Every remaining user is already in flight, skipped or backing off
+                        index, loop_num = job
+                        cred = self.creds[index]
+                        username = cred['username']
+                        self._running.add(username)
+                        self._route_running[self._routes[index]] += 1
+                        started = time.perf_counter()
+                        self._started[username] = (loop_num, index + 1, started)
+                        future = executor.submit(task, username, cred['password'], loop_num, index + 1)
+                        future.add_done_callback(
+                            lambda f, i=index, u=username, l=loop_num, a=index + 1, s=started: self._on_done(f, i, u, l, a, s)
+                        )
+                    if self._source is None and not order and not self._running:
+                        logger.info("🗓️  Every user is done or given up on; ending the run early")
+                        break
+                    if not self._running and self._held:
+                        logger.info("⏰ No remaining attempt fits before the deadline; ending the run early")
+                        break
+                    self._cond.wait(timeout=min(self.poll_interval, max(end_time - time.perf_counter(), 0)))
+                if self.deadline_aware:
+                    self._cut_off()
+            # Without a hard deadline, attempts already started are allowed to finish
+        finally:
+            executor.shutdown(wait=not self.deadline_aware, cancel_futures=True)
+        self.finished_at = time.perf_counter()
+        self.capacity_seconds += self.concurrency * (self.finished_at - last_tick)
+        self._wait_late()
+        return self.results
+
+    def _wait_late(self):
+        """Give cut-off attempts ``late_wait`` seconds to report, so a late success is still recorded."""
+        with self._cond:
+            wait_end = time.perf_counter() + self.late_wait
+            if self._late:
+                logger.info(f"⏰ Waiting up to {self.late_wait:.0f}s for {len(self._late)} cut-off attempts "
+                            f"to report (late successes are recorded)")
+            while self._late and time.perf_counter() < wait_end:
+                self._cond.wait(timeout=min(self.poll_interval, wait_end - time.perf_counter()))
+            self._late_closed = True
+
+    def _cut_off(self):
+        """Stop in-flight attempts at the deadline (called with the condition held)."""
+        self.cutoff.set()
+        grace_end = time.perf_counter() + self.grace
+        while self._running and time.perf_counter() < grace_end:
+            self._cond.wait(timeout=min(self.poll_interval, grace_end - time.perf_counter()))
+        for username in list(self._running):
+            loop_num, attempt_num, started = self._started.pop(username)
+            logger.warning(f"⏰ {username} still running {time.perf_counter() - started:.1f}s into its attempt "
+                           f"at the deadline; marked as cut off")
+            result = {
+                "loop": loop_num,
+                "attempt": attempt_num,
+                "username": username,
+                "status": "error",
+                "timestamp": datetime.now().strftime("%H:%M:%S.%f")[:-3],
+                "message": "Still running at the run deadline",
+                "reason": CUTOFF,
+                "duration": round(time.perf_counter() - started, 3)
+            }
+            self._late.add(username)
+            self.cut_off.append(username)
+            if self.on_result is not None:
+                self.on_result(result)
+            else:
+                self.results.append(result)
+        self._running.clear()
+
+    # ---------------- REPORTING ----------------
+    @property
+    def elapsed(self):
+        end = self.finished_at or time.perf_counter()
+        return end - self.started_at if self.started_at else 0.0
+
+    @property
+    def in_flight(self):
+        return len(self._running)
+
+    @property
+    def loop_count(self):
+        return max(self._passes.values(), default=0)
+
+    @property
+    def overrun(self):
+        """Seconds the run went past its deadline (negative if it ended early)."""
+        return (self.finished_at or time.perf_counter()) - self._end_time if self._end_time else 0.0
+
+    def utilization(self):
+        """Share of available slot-seconds spent running attempts."""
+        capacity = self.capacity_seconds
+        return self.busy_seconds / capacity if capacity else 0.0
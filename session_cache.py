@@ -0,0 +1,76 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ============ CONFIGURABLE PARAMETERS ============
+SESSION_TTL = 600  # Seconds a cached login is trusted before forcing a fresh one
+LOGIN_PATH = "/Home/Login"
+LOGOUT_PATH = "/Home/Logout"  # Ends the server-side session (the route mock_erp.py serves; confirm on the real ERP)
+
+# ---------------- SESSION CACHE ----------------
+class SessionCache:
+    """Per-user auth cookies kept between attempts so repeat visits skip the login form."""
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def get(self, username):
+        """Cached cookies for ``username``, or None if absent or expired."""
+        with self._lock:
+            entry = self._sessions.get(username)
+            if entry and entry[1] > time.time():
+                return entry[0]
+            self._sessions.pop(username, None)
+            return None
+
+    def put(self, username, cookies):
+        """Cache cookies until the TTL or the earliest cookie expiry, whichever is sooner."""
+        expires = time.time() + self.ttl
+        for cookie in cookies:
+            if cookie.get('expiry'):
+                expires = min(expires, cookie['expiry'])
+        with self._lock:
+            self._sessions[username] = (cookies, expires)
+
+    def invalidate(self, username):
+        with self._lock:
+            self._sessions.pop(username, None)
+
+    # ---------------- SELENIUM HELPERS ----------------
+    def restore(self, driver, username, home_url):
+        """Inject cached cookies and open ``home_url``; False means a full login is needed.
+
+        The driver must already be on the ERP origin (cookies can only be set for
+        the current domain). A redirect back to the login page evicts the entry.
+        """
+        cookies = self.get(username)
+        if cookies is None:
+            with self._lock:
+                self.misses += 1
+            return False
+        for cookie in cookies:
+            driver.add_cookie({k: v for k, v in cookie.items() if k != 'sameSite' or v in ('Strict', 'Lax', 'None')})
+        driver.get(home_url)
+        if LOGIN_PATH.lower() in driver.current_url.lower():
+            logger.info(f"🔑 Cached session for {username} was rejected; logging in again")
+            self.invalidate(username)
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def save(self, driver, username):
+        self.put(username, driver.get_cookies())
+
+    def summary(self):
+        return (f"🔑 Session cache: {self.hits} reused, {self.misses + self.rejected} full logins "
+                f"({self.rejected} after a rejected cached session)")
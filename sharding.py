@@ -0,0 +1,183 @@
+"""Sharded runs: split the credential set across worker processes and hosts, then merge.
+
+Users are assigned to shards by a stable hash of the username, so every
+host computes the same split from the same CSV without coordinating.
+
+    # one host, 4 worker processes (each runs Multipleselem with CONCURRENCY sessions)
+    python sharding.py run --processes 4
+
+    # 3 hosts x 4 processes: run this on each host with --host-index 0, 1 and 2
+    python sharding.py run --processes 4 --hosts 3 --host-index 0
+
+    # copy every host's results/ into one place, then
+    python sharding.py merge results/ host2_results/ host3_results/
+
+Shards of one run share a run id (``--run-id``, default today's date), so
+the merge step ignores manifests left over from other runs.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import socket
+from datetime import datetime
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_GLOB = "day_close_manifest_{run_id}_shard*.json"
+
+# ---------------- SHARDING ----------------
+def shard_of(username, shard_count):
+    """Deterministic shard index for a username (same on every host and Python run)."""
+    digest = hashlib.sha1(username.encode('utf-8')).hexdigest()
+    return int(digest, 16) % shard_count
+
+
+def split_credentials(creds, shard_count):
+    shards = [[] for _ in range(shard_count)]
+    for cred in creds:
+        shards[shard_of(cred['username'], shard_count)].append(cred)
+    return shards
+
+
+def shard_tag(shard_index, shard_count):
+    return f"_shard{shard_index:03d}of{shard_count:03d}"
+
+# ---------------- WORKER ----------------
+def default_run_id():
+    return datetime.now().strftime('%Y%m%d')
+
+
+def run_worker(shard_index, shard_count, run_id):
+    """Run the normal day-close loop on one shard and write a manifest for the merge step."""
+    import Multipleselem as M
+
+    tag = shard_tag(shard_index, shard_count)
+    M.logger.info(f"🧩 Shard {shard_index + 1}/{shard_count}")
+    M.install_watchdog()
+
+    manifest = {
+        "run_id": run_id,
+        "shard": shard_index,
+        "shards": shard_count,
+        "host": socket.gethostname(),
+        "users": 0,  # Users of this shard read from the CSV before the run ended
+        "elapsed": 0.0,
+        "loop_count": 0,
+        "detailed": None,
+    }
+
+    def shard_creds(creds):
+        for cred in creds:
+            if shard_of(cred['username'], shard_count) == shard_index:
+                manifest["users"] += 1
+                yield cred
+
+    creds = M.load_credentials(M.CSV_FILE)
+    if creds is not None:
+        outcome = M.run(shard_creds(creds), tag)
+        if outcome is not None:
+            sink, elapsed, loop_count = outcome
+            manifest.update(elapsed=elapsed, loop_count=loop_count, detailed=sink.path.name,
+                            format=M.RESULTS_FORMAT)
+
+    Path(M.RESULTS_DIR).mkdir(exist_ok=True)
+    manifest_file = Path(M.RESULTS_DIR) / f"day_close_manifest_{run_id}{tag}.json"
+    manifest_file.write_text(json.dumps(manifest, indent=2), encoding='utf-8')
+    M.logger.info(f"🧩 Shard manifest: {manifest_file}")
+
+
+def run_local(processes, hosts=1, host_index=0, run_id=None):
+    """Start this host's share of ``processes * hosts`` shards as separate processes."""
+    shard_count = processes * hosts
+    run_id = run_id or default_run_id()
+    ctx = multiprocessing.get_context("spawn")  # Fresh interpreter, logging and driver pool per worker
+    workers = [ctx.Process(target=run_worker, args=(host_index * processes + p, shard_count, run_id),
+                           name=f"shard-{host_index * processes + p}")
+               for p in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+        if worker.exitcode:
+            logger.error(f"❌ {worker.name} exited with code {worker.exitcode}")
+
+# ---------------- MERGE ----------------
+def merge(result_dirs, run_id=None):
+    """Combine one run's shard outputs into one detailed file and the usual per-user summary."""
+    import Multipleselem as M
+    from result_sink import ResultSink, read_results
+
+    run_id = run_id or default_run_id()
+    manifests = []
+    for directory in result_dirs:
+        for manifest_file in sorted(Path(directory).glob(MANIFEST_GLOB.format(run_id=run_id))):
+            manifest = json.loads(manifest_file.read_text(encoding='utf-8'))
+            manifest["dir"] = manifest_file.parent
+            manifests.append(manifest)
+    if not manifests:
+        M.logger.error(f"❌ No shard manifests for run {run_id} in {', '.join(map(str, result_dirs))}")
+        return None
+
+    shard_count = manifests[0]["shards"]
+    missing = set(range(shard_count)) - {m["shard"] for m in manifests}
+    if missing:
+        M.logger.warning(f"⚠️  Missing shards: {sorted(missing)} of {shard_count}")
+
+    sink = ResultSink(Path(M.RESULTS_DIR) / f"day_close_detailed_{run_id}_merged.{M.RESULTS_FORMAT}",
+                      fmt=M.RESULTS_FORMAT)
+    try:
+        for manifest in manifests:
+            if manifest["detailed"]:
+                for result in read_results(manifest["dir"] / manifest["detailed"], manifest.get("format", "csv")):
+                    sink.add(result)
+    finally:
+        sink.close()
+
+    # Shards run side by side, so the merged window is the longest shard
+    elapsed = max(m["elapsed"] for m in manifests) or 1e-9
+    loop_count = max(m["loop_count"] for m in manifests)
+    M.logger.info(f"🧩 Merged {len(manifests)} shards from {len({m['host'] for m in manifests})} hosts")
+    if M.log_final_results(sink, elapsed, loop_count):
+        M.write_summary(sink.user_stats, elapsed, loop_count, f"_{run_id}_merged")
+
+    if M.RECORD_HISTORY:
+        from history import DETAILED_PATTERN, HistoryStore, run_started_at
+        # The shards were recorded as they finished; the merged run is the one reports compare
+        matches = [DETAILED_PATTERN.match(m["detailed"]) for m in manifests if m["detailed"]]
+        starts = [run_started_at(match.group("run")) for match in matches if match]
+        history = HistoryStore(Path(M.RESULTS_DIR) / "history.db")
+        history.ingest_run(sink.path, f"{run_id}_merged", elapsed=elapsed,
+                           started_at=min(filter(None, starts), default=None))
+        history.close()
+    return sink
+
+# ---------------- MAIN ----------------
+def main():
+    parser = argparse.ArgumentParser(description="Sharded day-close runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_parser = sub.add_parser("run", help="run this host's shards")
+    run_parser.add_argument("--processes", type=int, default=2, help="worker processes on this host")
+    run_parser.add_argument("--hosts", type=int, default=1, help="total hosts taking part")
+    run_parser.add_argument("--host-index", type=int, default=0, help="this host's index (0-based)")
+    run_parser.add_argument("--run-id", default=None, help="shared by every host of one run (default: today)")
+    merge_parser = sub.add_parser("merge", help="merge shard results into one summary")
+    merge_parser.add_argument("dirs", nargs="+", help="results directories holding shard manifests")
+    merge_parser.add_argument("--run-id", default=None, help="run to merge (default: today)")
+    args = parser.parse_args()
+
+    if args.command == "run":
+        if not 0 <= args.host_index < args.hosts:
+            parser.error("--host-index must be between 0 and --hosts - 1")
+        run_id = args.run_id or default_run_id()
+        run_local(args.processes, args.hosts, args.host_index, run_id)
+        if args.hosts == 1:
+            import Multipleselem as M
+            merge([M.RESULTS_DIR], run_id)
+    else:
+        merge(args.dirs, args.run_id)
+
+if __name__ == "__main__":
+    main()
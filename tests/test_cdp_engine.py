@@ -0,0 +1,54 @@
+import shutil
+
+import pytest
+
+import cdp_engine
+import retry
+from cdp_engine import CdpDayCloseEngine
+from day_status import ALREADY_CLOSED_MESSAGE
+from mock_erp import DEFAULT_PASSWORD, MockErpServer
+
+# Only a local Chrome: chrome_binary() would otherwise ask Selenium Manager to download one
+CHROME = cdp_engine.CHROME_BINARY or next(filter(None, map(shutil.which, cdp_engine.CHROME_CANDIDATES)), None)
+pytestmark = pytest.mark.skipif(CHROME is None, reason="Chrome/Chromium not installed")
+
+
+@pytest.fixture
+def erp():
+    server = MockErpServer(port=0, stateful=True).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def engine(erp):
+    engine = CdpDayCloseEngine(erp.login_url, browsers=1, limit=2, completion_timeout=10)
+    yield engine
+    engine.close()
+
+
+def test_day_close_in_real_chrome(erp, engine):
+    status, message, reason, timings = engine.day_close("10001", DEFAULT_PASSWORD)
+    assert (status, reason) == ("success", None), message
+    assert erp.closes == 1
+    assert [step for step, _ in timings][:2] == ["context_start", "page_load"]
+
+    # A second attempt gets a fresh browser context, logs in again and finds the day closed
+    assert engine.day_close("10001", DEFAULT_PASSWORD)[:2] == ("success", ALREADY_CLOSED_MESSAGE)
+    assert erp.closes == 1
+
+
+def test_wrong_password_in_real_chrome(erp, engine):
+    status, _, reason, timings = engine.day_close("10001", "wrong")
+    assert (status, reason) == ("failure", retry.LOGIN_REJECTED)
+    steps = [step for step, _ in timings]
+    assert steps[:2] == ["context_start", "page_load"]
+    assert {"fill_username", "fill_password", "login"} <= set(steps)
+    assert erp.closes == 0
+
+
+def test_benchmark_cdp_flow():
+    import benchmark
+
+    report = benchmark.run_benchmark("cdp", users=4, concurrency=2, duration=5)
+    assert report["attempts"] and report["confirmed_closes"]
@@ -0,0 +1,59 @@
+from credentials import LoadStats, iter_credentials, parse_annotation, route_by_tags
+
+
+def write_csv(tmp_path, text):
+    path = tmp_path / "creds.csv"
+    path.write_text(text, encoding="utf-8")
+    return path
+
+
+def test_parse_annotation_normalises_tags():
+    assert parse_annotation("123456") == ("123456", frozenset())
+    assert parse_annotation("  123456   -- without otr ") == ("123456", frozenset({"without otr"}))
+    assert parse_annotation("123456 ---Without  OTR, Slow") == ("123456", frozenset({"without otr", "slow"}))
+    assert parse_annotation(None) == ("", frozenset())
+
+
+def test_duplicates_and_invalid_rows_are_skipped(tmp_path):
+    path = write_csv(tmp_path, "Username , Password\n"
+                               "05158,123456\n"
+                               "05159,\n"
+                               "bad user,123456\n"
+                               "05158,other -- without otr\n"
+                               "05160,654321\n")
+    stats = LoadStats()
+    creds = list(iter_credentials(path, stats))
+
+    assert [(c["username"], c["password"]) for c in creds] == [("05158", "123456"), ("05160", "654321")]
+    assert creds[0]["tags"] == frozenset()  # The first row wins, tags included
+    assert (stats.rows, stats.loaded, stats.duplicates, stats.invalid) == (5, 2, 1, 2)
+    assert stats.tags == {}
+
+
+def test_tags_from_any_cell_and_alternative_columns(tmp_path):
+    path = write_csv(tmp_path, "id,pwd\n"
+                               "05158 -- slow,123456 -- without otr\n"
+                               "05159,123456 -- Without OTR\n")
+    stats = LoadStats()
+    creds = list(iter_credentials(path, stats))
+
+    assert creds[0] == {"username": "05158", "password": "123456", "tags": frozenset({"slow", "without otr"})}
+    assert creds[1]["tags"] == frozenset({"without otr"})
+    assert stats.tags == {"slow": 1, "without otr": 2}
+    assert "tags: slow 1, without otr 2" in stats.summary()
+
+
+def test_rows_are_streamed(tmp_path):
+    path = write_csv(tmp_path, "username,password\n05158,1\n05159,2\n")
+    stats = LoadStats()
+    rows = iter_credentials(path, stats)
+    assert next(rows)["username"] == "05158"
+    assert stats.rows == 1  # The second row is not read yet
+
+
+def test_route_by_tags_takes_the_first_matching_route():
+    route = route_by_tags({"without otr": 2, "slow": 1})
+    assert route({"username": "a", "tags": frozenset({"slow", "without otr"})}) == "without otr"
+    assert route({"username": "b", "tags": frozenset({"slow"})}) == "slow"
+    assert route({"username": "c", "tags": frozenset()}) is None
+    assert route({"username": "d"}) is None
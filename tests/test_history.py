@@ -0,0 +1,67 @@
+import os
+import sqlite3
+from datetime import datetime
+
+from history import HistoryStore
+from result_sink import ResultSink
+
+
+def write_run(results_dir, run_id, users=("u1",), duration=1.0):
+    sink = ResultSink(results_dir / f"day_close_detailed_{run_id}.csv")
+    for user in users:
+        sink.add({"loop": 1, "attempt": 1, "username": user, "status": "success", "timestamp": "",
+                  "message": "Day close completed", "duration": duration})
+    sink.close()
+    return sink.path
+
+
+def test_runs_are_ordered_by_start_time_without_shards(tmp_path):
+    write_run(tmp_path, "20250101_213000")
+    write_run(tmp_path, "20250102_213000_shard000of002")
+    write_run(tmp_path, "20250102_213001_shard001of002")
+    merged = write_run(tmp_path, "20250102_merged", users=("u1", "u2"))
+    os.utime(merged, (datetime(2025, 1, 2, 22).timestamp(),) * 2)  # No stamp in the id: the file time is used
+    write_run(tmp_path, "nightly_20241231")
+    os.utime(tmp_path / "day_close_detailed_nightly_20241231.csv", (datetime(2024, 12, 31, 21).timestamp(),) * 2)
+
+    store = HistoryStore(tmp_path / "history.db")
+    assert len(store.ingest_dir(tmp_path)) == 5
+
+    assert [row[0] for row in store.runs()] == ["20250102_merged", "20250101_213000", "nightly_20241231"]
+    assert [row[5] for row in store.runs()] == ["merged", "single", "single"]
+    assert len(store.runs(shards=True)) == 5
+    assert store.previous_run("20250102_merged") == "20250101_213000"
+    assert store.previous_run("20250101_213000") == "nightly_20241231"
+    assert store.previous_run("nightly_20241231") is None
+    # u1 is in both shards too, but only the merged run counts
+    assert [row[0] for row in store.trend("u1")] == ["nightly_20241231", "20250101_213000", "20250102_merged"]
+    store.close()
+
+
+def test_merged_run_takes_the_given_start(tmp_path):
+    write_run(tmp_path, "20250101_213000")
+    merged = write_run(tmp_path, "20250101_merged")
+    store = HistoryStore(tmp_path / "history.db")
+    store.ingest_run(tmp_path / "day_close_detailed_20250101_213000.csv")
+    store.ingest_run(merged, "20250101_merged", elapsed=60.0, started_at="2025-01-01T21:00:00")
+
+    assert [row[0] for row in store.runs()] == ["20250101_213000", "20250101_merged"]
+    assert store.run_stats("20250101_merged")["rate"] == 1 / 60.0
+    store.close()
+
+
+def test_store_without_kind_column_is_migrated(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "history.db"))
+    conn.execute("CREATE TABLE runs (run_id TEXT PRIMARY KEY, started_at TEXT, elapsed REAL, attempts INTEGER NOT NULL, "
+                 "successes INTEGER NOT NULL, source TEXT NOT NULL, ingested_at TEXT NOT NULL)")
+    conn.executemany("INSERT INTO runs VALUES (?, ?, NULL, 1, 1, 'x', '')",
+                     [("20250101_213000", "2025-01-01T21:30:00"),
+                      ("20250101_213000_shard000of002", "2025-01-01T21:30:00")])
+    conn.commit()
+    conn.close()
+
+    store = HistoryStore(tmp_path / "history.db")
+    assert [(row[0], row[5]) for row in store.runs(shards=True)] == [
+        ("20250101_213000_shard000of002", "shard"), ("20250101_213000", "single")]
+    assert [row[0] for row in store.runs()] == ["20250101_213000"]
+    store.close()
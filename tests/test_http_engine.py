@@ -0,0 +1,48 @@
+import pytest
+
+from day_status import ALREADY_CLOSED_MESSAGE
+from http_engine import HttpDayCloseEngine
+from mock_erp import DEFAULT_PASSWORD, MockErpServer
+
+
+@pytest.fixture
+def erp():
+    server = MockErpServer(port=0, stateful=True).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def engine(erp):
+    engine = HttpDayCloseEngine(erp.login_url, limit=4)
+    yield engine
+    engine.close()
+
+
+def test_login_and_day_close(erp, engine):
+    status, message = engine.day_close("10001", DEFAULT_PASSWORD)
+    assert (status, message) == ("success", "Day Closed Successfully")
+    assert erp.closes == 1 and "10001" in erp.closed_users
+
+
+def test_wrong_password_is_rejected_at_login(erp, engine):
+    assert engine.day_close("10001", "wrong") == ("failure", "Login rejected")
+    assert erp.closes == 0
+
+
+def test_already_closed_day_is_not_closed_again(erp, engine):
+    engine.day_close("10001", DEFAULT_PASSWORD)
+    assert engine.day_close("10001", DEFAULT_PASSWORD) == ("success", ALREADY_CLOSED_MESSAGE)
+    assert erp.closes == 1
+
+
+def test_rejected_close_is_a_failure(erp, engine):
+    erp.failure_rate = 1.0
+    assert engine.day_close("10001", DEFAULT_PASSWORD) == ("failure", "Day close failed: server busy")
+    assert erp.closes == 0
+
+
+def test_server_error_is_an_error(erp, engine):
+    erp.error_rate = 1.0
+    status, message = engine.day_close("10001", DEFAULT_PASSWORD)
+    assert status == "error" and "500" in message
@@ -0,0 +1,41 @@
+import threading
+
+import progress
+from progress import ProgressTracker
+
+
+def result(username, status="success", reason=None):
+    return {"username": username, "status": status, "reason": reason, "message": ""}
+
+
+def test_unread_events_are_folded_by_the_workers(monkeypatch):
+    monkeypatch.setattr(progress, "FOLD_EVERY", 10)
+    tracker = ProgressTracker()
+    tracker.start()
+
+    def worker(n):
+        for i in range(500):
+            tracker.record(result(f"u{n}_{i}", "error" if i % 5 == 0 else "success", "timeout" if i % 5 == 0 else None))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(tracker._events) <= 10 + len(threads)
+    snapshot = tracker.snapshot()
+    assert snapshot["attempts"] == 2000
+    assert snapshot["counts"] == {"success": 1600, "error": 400}
+    assert snapshot["errors"] == {"timeout": 400}
+
+
+def test_worker_does_not_wait_for_a_folding_reader(monkeypatch):
+    monkeypatch.setattr(progress, "FOLD_EVERY", 1)
+    tracker = ProgressTracker()
+    tracker.start()
+    with tracker._fold_lock:  # A page request is folding
+        for i in range(5):
+            tracker.record(result(f"u{i}"))
+        assert len(tracker._events) == 5
+    assert tracker.snapshot()["attempts"] == 5
@@ -0,0 +1,107 @@
+import time
+
+import numpy as np
+import pytest
+
+from coordinator import replay
+from coordinator.replay import ReplayEngine, ReplayStep, ReplayTimeout, changed_fraction, match_template
+
+
+class FakeScreen:
+    """Synthetic grey frames: ``frames(t)`` gives the screen ``t`` seconds after the first click."""
+
+    def __init__(self, frames, size=(200, 100)):
+        self.frames = frames
+        self.clicked = None
+        self._size = size
+
+    def size(self):
+        return self._size
+
+    def grab(self, region=None):
+        t = time.monotonic() - self.clicked if self.clicked is not None else 0.0
+        return self.frames(t)
+
+    def click(self, x, y):
+        if self.clicked is None:
+            self.clicked = time.monotonic()
+
+    def type(self, text):
+        pass
+
+
+def blank():
+    return np.full((100, 200), 255, dtype=np.int16)
+
+
+def page_after(delay, settle=0.0):
+    """Blank until ``delay``, then a dark panel that keeps moving until ``delay + settle``."""
+    def frames(t):
+        frame = blank()
+        if t >= delay:
+            shift = int(min(t, delay + settle) * 100) % 20
+            frame[20:60, 40 + shift:120 + shift] = 30
+        return frame
+    return frames
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(replay, "POLL_INTERVAL", 0.01)
+
+
+def test_step_waits_for_a_late_change_and_for_it_to_settle():
+    screen = FakeScreen(page_after(0.3, settle=0.2))
+    engine = ReplayEngine({"next": {"x": 10, "y": 10}}, screen=screen, step_timeout=3)
+
+    [(name, seconds)] = engine.run([ReplayStep("next")])
+
+    assert name == "next"
+    assert 0.5 <= seconds < 1.5  # Past the change and its animation, well before the timeout
+
+
+def test_step_without_a_change_times_out_and_optional_steps_are_skipped():
+    engine = ReplayEngine({"dead": {"x": 10, "y": 10}}, screen=FakeScreen(lambda t: blank()), step_timeout=0.2)
+
+    with pytest.raises(ReplayTimeout) as e:
+        engine.run([ReplayStep("dead")])
+    assert e.value.step == "dead"
+    assert engine.run([ReplayStep("maybe", "dead", optional=True, timeout=0.2)]) == [("maybe", None)]
+
+
+def test_noise_below_the_tolerance_is_not_a_change():
+    before = blank()
+    noisy = before - np.random.default_rng(0).integers(0, replay.PIXEL_TOLERANCE, before.shape, dtype=np.int16)
+    assert changed_fraction(before, noisy) == 0.0
+    assert changed_fraction(before, blank()[:50]) == 1.0
+
+
+def test_template_that_appears_late_is_found():
+    template = np.full((10, 16), 30, dtype=np.int16)
+    template[3:7, 4:12] = 200
+
+    def frames(t):
+        frame = blank()
+        if t >= 0.3:
+            frame[57:67, 101:117] = template
+        return frame
+
+    engine = ReplayEngine({}, screen=FakeScreen(frames))
+    engine.screen.click(0, 0)
+    assert not engine.wait_for_template(None, template, 0.1)
+    assert engine.wait_for_template(None, template, 2)
+    assert match_template(frames(1.0), template) == (101, 57)
+
+
+def test_match_template_agrees_with_the_per_pixel_sum():
+    rng = np.random.default_rng(1)
+    frame = rng.integers(0, 256, (40, 60), dtype=np.int16)
+    template = frame[12:20, 30:41].copy()
+    sad = np.array([[np.abs(frame[y:y + 8, x:x + 11] - template).sum() for x in range(50)] for y in range(33)])
+    assert np.unravel_index(sad.argmin(), sad.shape) == (12, 30)
+
+    assert match_template(frame, template) == (30, 12)
+    noisy = template + rng.integers(-10, 11, template.shape, dtype=np.int16)  # Anti-aliasing, JPEG-ish noise
+    assert match_template(frame, noisy) == (30, 12)
+    assert match_template(frame, template + 100) is None
+    assert match_template(frame[:5], template) is None
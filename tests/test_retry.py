@@ -0,0 +1,154 @@
+import pytest
+from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
+
+import flows
+import retry
+from retry import CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def failure(message="", reason=None, status="error"):
+    return {"username": "u1", "status": status, "message": message, "reason": reason}
+
+
+OK = {"username": "u1", "status": "success", "message": "Day close completed"}
+
+
+# ---------------- CLASSIFICATION ----------------
+@pytest.mark.parametrize("message, reason", [
+    ("Login rejected", retry.LOGIN_REJECTED),
+    ("401: not authenticated", retry.LOGIN_REJECTED),
+    ("Day close not acknowledged within 30s", retry.NOT_ACKNOWLEDGED),
+    ("Close rejected by the ERP", retry.NOT_ACKNOWLEDGED),
+    ("TimeoutException: page load", retry.TIMEOUT),
+    ("Request timed out", retry.TIMEOUT),
+    ("ClientResponseError: 502, message='Bad Gateway'", retry.SERVER_ERROR),
+    ("ClientConnectorError: Cannot connect to host", retry.SERVER_ERROR),
+    ("ServerDisconnectedError", retry.SERVER_ERROR),
+    ("Connection reset by peer", retry.SERVER_ERROR),
+    ("invalid session id", retry.DRIVER_CRASH),
+    ("Session deleted because of page crash", retry.DRIVER_CRASH),
+    ("chrome not reachable", retry.DRIVER_CRASH),
+    ("ClientResponseError: 404", retry.OTHER),
+    ("", retry.OTHER),
+])
+def test_classify_falls_back_to_the_message(message, reason):
+    assert retry.classify(failure(message)) == reason
+
+
+def test_classify_prefers_the_reason_and_ignores_successes():
+    assert retry.classify(failure("Request timed out", reason=retry.CUTOFF)) == retry.CUTOFF
+    assert retry.classify(OK) is None
+    assert retry.classify(dict(OK, reason=retry.LATE_SUCCESS)) is None
+
+
+def test_reason_for_exception():
+    assert retry.reason_for_exception(TimeoutException()) == retry.TIMEOUT
+    assert retry.reason_for_exception(flows.FlowTimeout("homepage", "login")) == retry.TIMEOUT
+    assert retry.reason_for_exception(NoSuchElementException()) == retry.DRIVER_CRASH
+    assert retry.reason_for_exception(WebDriverException("chrome not reachable")) == retry.DRIVER_CRASH
+    assert retry.reason_for_exception(ValueError("bad row")) == retry.OTHER
+
+# ---------------- BACKOFF ----------------
+def test_backoff_doubles_with_equal_jitter_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: high)
+    assert [retry.backoff_delay(n, base=2, cap=60) for n in range(1, 7)] == [2, 4, 8, 16, 32, 60]
+    monkeypatch.setattr(retry.random, "uniform", lambda low, high: low)
+    assert [retry.backoff_delay(n, base=2, cap=60) for n in range(1, 7)] == [1, 2, 4, 8, 16, 30]
+
+
+def test_retry_queue_gives_up_after_max_retries_and_on_permanent_failures(monkeypatch):
+    monkeypatch.setattr(retry, "backoff_delay", lambda n, base, cap: 0.0)
+    queue = retry.RetryQueue(max_retries=2)
+    timeout = failure("Request timed out")
+
+    assert queue.record(0, timeout) == retry.TIMEOUT and queue.is_waiting("u1")
+    assert queue.pop_due(lambda user: False) is None  # Busy user: stays queued
+    assert queue.pop_due(lambda user: True) == 0 and not queue.is_waiting("u1")
+    queue.record(0, timeout)
+    queue.pop_due(lambda user: True)
+    queue.record(0, timeout)
+    assert "u1" in queue.abandoned and queue.retries[retry.TIMEOUT] == 2 and queue.given_up[retry.TIMEOUT] == 1
+
+    queue.record(1, dict(failure("Login rejected"), username="u2"))
+    assert "u2" in queue.abandoned and not queue.is_waiting("u2")
+
+# ---------------- CIRCUIT BREAKER ----------------
+def tripped_breaker(clock):
+    breaker = CircuitBreaker(window=4, min_attempts=4, error_rate=0.5, cooldown=30, clock=clock)
+    clock.now += 1
+    for result in (OK, failure("Request timed out"), failure("Bad Gateway", reason=retry.SERVER_ERROR)):
+        breaker.record(result, 0.5)
+    assert breaker.state == CircuitBreaker.CLOSED  # 2 of 3: under min_attempts
+    breaker.record(failure("Day close not acknowledged"), 0.5)
+    assert breaker.state == CircuitBreaker.OPEN and breaker.trips == 1
+    return breaker
+
+
+def test_breaker_ignores_client_side_failures():
+    clock = FakeClock()
+    breaker = CircuitBreaker(window=4, min_attempts=4, error_rate=0.5, cooldown=30, clock=clock)
+    clock.now += 1
+    for _ in range(10):
+        breaker.record(failure("Login rejected"), 0.5)
+        breaker.record(failure("invalid session id"), 0.5)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_breaker_opens_then_lets_a_single_probe_through_after_the_cooldown():
+    clock = FakeClock()
+    breaker = tripped_breaker(clock)
+    assert not breaker.allow()
+    clock.now += 29.9
+    assert not breaker.allow()
+    clock.now += 0.1
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()  # Only one probe at a time
+
+    clock.now += 2
+    breaker.record(OK, 1.0)
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens_the_circuit():
+    clock = FakeClock()
+    breaker = tripped_breaker(clock)
+    clock.now += 30
+    assert breaker.allow()
+    clock.now += 2
+    breaker.record(failure("Request timed out"), 1.0)
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+    clock.now += 30
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+
+
+def test_attempts_started_before_the_state_change_are_ignored():
+    clock = FakeClock()
+    breaker = tripped_breaker(clock)
+    clock.now += 30
+    assert breaker.allow()
+    clock.now += 2
+    breaker.record(OK, 5.0)  # Started while the circuit was still open
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    breaker.record(OK, 1.0)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_release_hands_back_an_unused_probe():
+    clock = FakeClock()
+    breaker = tripped_breaker(clock)
+    clock.now += 30
+    assert breaker.allow() and not breaker.allow()
+    breaker.release()
+    assert breaker.allow() and not breaker.allow()
+    breaker.release()
+    breaker.record(OK, 0.0)
+    breaker.release()  # No effect once closed
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
@@ -0,0 +1,101 @@
+import threading
+import time
+
+from day_status import CLOSED, DayStatusStore
+from history import HistoryStore
+from progress import ProgressTracker
+from result_sink import ResultSink
+from scheduler import RollingScheduler
+
+
+def slow_success(release):
+    """Task whose attempt only finishes once ``release`` is set (well after the cutoff)."""
+    def task(username, password, loop_num, attempt_num):
+        release.wait(5)
+        return {"loop": loop_num, "attempt": attempt_num, "username": username,
+                "status": "success", "timestamp": "", "message": "Day close completed"}
+    return task
+
+
+def test_late_success_is_recorded_after_cutoff_error(tmp_path):
+    day_status = DayStatusStore(str(tmp_path / "day_status.db"))
+    results = []
+
+    def on_result(result):
+        results.append(result)
+        day_status.record_result(result)
+
+    release = threading.Event()
+    scheduler = RollingScheduler(1, on_result=on_result, poll_interval=0.05,
+                                 deadline_aware=True, grace=0.1, late_wait=5)
+    threading.Timer(0.5, release.set).start()  # Finishes after deadline + grace
+    scheduler.run([{"username": "u1", "password": "p"}], slow_success(release), 0.2)
+
+    assert [r["status"] for r in results] == ["error", "success"]
+    assert results[0]["reason"] == "cutoff"
+    assert results[1]["late"] and results[1]["reason"] == "late_success"
+    assert scheduler.cut_off == ["u1"] and scheduler.late_successes == ["u1"]
+    assert day_status.is_closed("u1")
+    assert day_status.status("u1")[0] == CLOSED
+    day_status.close()
+
+
+def test_success_after_late_wait_is_not_recorded():
+    results = []
+    release = threading.Event()
+    scheduler = RollingScheduler(1, on_result=results.append, poll_interval=0.05,
+                                 deadline_aware=True, grace=0.1, late_wait=0.1)
+    scheduler.run([{"username": "u1", "password": "p"}], slow_success(release), 0.2)
+    release.set()
+    time.sleep(0.2)
+
+    assert [r["status"] for r in results] == ["error"]  # The sink may be closed by now
+    assert scheduler.late_successes == []
+
+
+def test_late_failure_keeps_cutoff_error():
+    results = []
+    release = threading.Event()
+
+    def task(username, password, loop_num, attempt_num):
+        release.wait(5)
+        return {"loop": loop_num, "attempt": attempt_num, "username": username,
+                "status": "failure", "timestamp": "", "message": "Not acknowledged"}
+
+    scheduler = RollingScheduler(1, on_result=results.append, poll_interval=0.05,
+                                 deadline_aware=True, grace=0.1, late_wait=5)
+    threading.Timer(0.5, release.set).start()
+    scheduler.run([{"username": "u1", "password": "p"}], task, 0.2)
+
+    assert [r["reason"] for r in results] == ["cutoff"]
+
+
+def test_late_success_replaces_the_cutoff_attempt_in_every_count(tmp_path):
+    sink = ResultSink(tmp_path / "day_close_detailed_20250101_000000.csv")
+    tracker = ProgressTracker()
+    tracker.start()
+
+    def on_result(result):
+        sink.add(result)
+        tracker.record(result)
+
+    release = threading.Event()
+    scheduler = RollingScheduler(1, on_result=on_result, poll_interval=0.05,
+                                 deadline_aware=True, grace=0.1, late_wait=5)
+    threading.Timer(0.5, release.set).start()
+    scheduler.run([{"username": "u1", "password": "p"}], slow_success(release), 0.2)
+    sink.close()
+
+    assert sink.user_stats["u1"] == {"username": "u1", "total_attempts": 1, "successes": 1,
+                                     "failures": 0, "errors": 0}
+    assert sink.total == 1 and sink.counts == {"success": 1, "failure": 0, "error": 0}
+
+    progress = tracker.snapshot()
+    assert progress["attempts"] == 1 and progress["counts"] == {"success": 1}
+    assert progress["errors"] == {} and progress["users_closed"] == 1
+
+    history = HistoryStore(tmp_path / "history.db")
+    history.ingest_run(sink.path, elapsed=1.0)
+    stats = history.run_stats("20250101_000000")
+    assert stats["attempts"] == 1 and stats["success_rate"] == 1.0 and stats["failures"] == {}
+    history.close()
@@ -0,0 +1,92 @@
+import csv
+import json
+from collections import Counter
+
+import pytest
+
+import sharding
+from history import HistoryStore
+from result_sink import ResultSink, read_results
+
+
+@pytest.fixture
+def M(tmp_path, monkeypatch):
+    """Multipleselem with its results (and run log) in ``tmp_path``."""
+    monkeypatch.chdir(tmp_path)
+    import Multipleselem
+
+    monkeypatch.setattr(Multipleselem, "RESULTS_DIR", str(tmp_path))
+    return Multipleselem
+
+
+def test_shard_worker_installs_the_watchdog_before_running(M, tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(M.watchdog, "install", lambda: calls.append(("install", M.watchdog.deadline)))
+    monkeypatch.setattr(M.watchdog, "deadline", None)
+    monkeypatch.setattr(M, "load_credentials", lambda csv_file: [{"username": "u1", "password": "p"}])
+
+    def run(creds, tag=""):
+        calls.append(("run", [c["username"] for c in creds]))
+        return None
+
+    monkeypatch.setattr(M, "run", run)
+    for index in range(2):
+        sharding.run_worker(index, 2, "t")
+
+    shard = sharding.shard_of("u1", 2)
+    assert calls[0] == ("install", M.SESSION_DEADLINE) and calls[2] == ("install", M.SESSION_DEADLINE)
+    assert [users for name, users in calls if name == "run"] == [["u1"] if i == shard else [] for i in range(2)]
+    manifest = json.loads((tmp_path / f"day_close_manifest_t{sharding.shard_tag(shard, 2)}.json").read_text())
+    assert manifest["users"] == 1
+
+
+def test_shard_of_is_stable_and_spreads_users():
+    users = [f"{n:05d}" for n in range(4000)]
+    assert [sharding.shard_of(user, 4) for user in users] == [sharding.shard_of(user, 4) for user in users]
+    # Pinned: every host and Python version must agree (no hash() randomisation)
+    assert [sharding.shard_of(user, 7) for user in ("05158", "08341", "10001", "a@b.com")] == [0, 6, 6, 0]
+    sizes = Counter(sharding.shard_of(user, 4) for user in users)
+    assert set(sizes) == {0, 1, 2, 3} and min(sizes.values()) > 900
+
+    shards = sharding.split_credentials([{"username": user} for user in users], 4)
+    assert sorted(c["username"] for shard in shards for c in shard) == users
+    assert all(sharding.shard_of(c["username"], 4) == i for i, shard in enumerate(shards) for c in shard)
+    assert sharding.shard_tag(3, 12) == "_shard003of012"
+
+
+def write_shard(results_dir, run_id, index, count, stamp, users, elapsed):
+    tag = sharding.shard_tag(index, count)
+    sink = ResultSink(results_dir / f"day_close_detailed_{stamp}{tag}.csv")
+    for user in users:
+        sink.add({"loop": 1, "attempt": 1, "username": user, "status": "success", "timestamp": "",
+                  "message": "Day close completed", "duration": 1.0})
+    sink.close()
+    manifest = {"run_id": run_id, "shard": index, "shards": count, "host": f"host{index}", "users": len(users),
+                "elapsed": elapsed, "loop_count": 1, "detailed": sink.path.name, "format": "csv"}
+    (results_dir / f"day_close_manifest_{run_id}{tag}.json").write_text(json.dumps(manifest))
+
+
+def test_merge_combines_shards_of_one_run(M, tmp_path, caplog):
+    host2 = tmp_path / "host2"
+    host2.mkdir()
+    write_shard(tmp_path, "r1", 0, 3, "20250101_213000", ["u1", "u2"], 40.0)
+    write_shard(host2, "r1", 2, 3, "20250101_212959", ["u3"], 55.0)
+    write_shard(tmp_path, "r0", 1, 3, "20241231_213000", ["old"], 10.0)  # Another run: ignored
+
+    sink = sharding.merge([tmp_path, host2], "r1")
+
+    assert sorted(r["username"] for r in read_results(sink.path)) == ["u1", "u2", "u3"]
+    assert sink.path.name == "day_close_detailed_r1_merged.csv"
+    assert "Missing shards: [1] of 3" in caplog.text
+    [summary] = tmp_path.glob("day_close_summary_*_r1_merged.csv")
+    with open(summary, encoding="utf-8") as f:
+        assert sorted(row["username"] for row in csv.DictReader(f)) == ["u1", "u2", "u3"]
+
+    history = HistoryStore(tmp_path / "history.db")
+    [(run_id, started_at, elapsed, attempts, successes, kind)] = history.runs()
+    assert (run_id, started_at, elapsed, attempts, kind) == ("r1_merged", "2025-01-01T21:29:59", 55.0, 3, "merged")
+    history.close()
+
+
+def test_merge_without_manifests_returns_none(M, tmp_path):
+    assert sharding.merge([tmp_path], "missing") is None
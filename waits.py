@@ -0,0 +1,144 @@
+import json
+import logging
+import threading
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+logger = logging.getLogger(__name__)
+
+# ============ CONFIGURABLE PARAMETERS ============
+POLL_FREQUENCY = 0.1  # WebDriverWait poll interval (Selenium default is 0.5s)
+JS_TICK_MS = 100  # Fallback re-check inside the page for changes MutationObserver can't see
+NETWORK_QUIET_MS = 300  # No XHR/fetch activity for this long counts as network idle
+
+# ---------------- WAIT TIMINGS ----------------
+class WaitStats:
+    """Thread-safe record of how long each named wait actually took."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waits = {}
+
+    def record(self, name, seconds, ok):
+        with self._lock:
+            entry = self._waits.setdefault(name, {"count": 0, "timeouts": 0, "total": 0.0, "max": 0.0})
+            entry["count"] += 1
+            entry["total"] += seconds
+            entry["max"] = max(entry["max"], seconds)
+            if not ok:
+                entry["timeouts"] += 1
+
+    def summary(self):
+        with self._lock:
+            lines = [f"⏱️  {name}: avg {e['total']/e['count']:.2f}s, max {e['max']:.2f}s, "
+                     f"{e['count']} waits, {e['timeouts']} timeouts"
+                     for name, e in self._waits.items()]
+        return "\n".join(lines)
+
+wait_stats = WaitStats()
+
+# ---------------- PAGE PREDICATES (JavaScript expressions) ----------------
+def text_present(text):
+    return f"document.body && document.body.innerText.includes({json.dumps(text)})"
+
+
+def xpath_gone_or_disabled(xpath):
+    return ("(() => { const el = document.evaluate(" + json.dumps(xpath) +
+            ", document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;"
+            " return !el || el.disabled || el.offsetParent === null; })()")
+
+
+def xpath_disabled(xpath):
+    """Element exists but is disabled (e.g. the Day Close button once the day is closed)."""
+    return ("(() => { const el = document.evaluate(" + json.dumps(xpath) +
+            ", document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;"
+            " return !!el && el.disabled; })()")
+
+
+def element_settled(element_id):
+    """Element is displayed and any fade-in transition has finished (e.g. a Bootstrap modal)."""
+    return ("(() => { const el = document.getElementById(" + json.dumps(element_id) + ");"
+            " if (!el) return false; const style = getComputedStyle(el);"
+            " return style.display !== 'none' && style.opacity === '1'; })()")
+
+
+def network_idle(quiet_ms=NETWORK_QUIET_MS):
+    """True once tracked XHR/fetch calls have settled; needs track_network() first."""
+    return (f"window.__dcPending === 0 && Date.now() - window.__dcLastActivity >= {int(quiet_ms)}")
+
+
+def any_of(*predicates):
+    return " || ".join(f"({p})" for p in predicates)
+
+
+TRACK_NETWORK_JS = """
+if (!window.__dcTracking) {
+    window.__dcTracking = true;
+    window.__dcPending = 0;
+    window.__dcLastActivity = Date.now();
+    const begin = () => { window.__dcPending++; window.__dcLastActivity = Date.now(); };
+    const end = () => { window.__dcPending = Math.max(0, window.__dcPending - 1); window.__dcLastActivity = Date.now(); };
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        begin();
+        this.addEventListener('loadend', end);
+        return send.apply(this, arguments);
+    };
+    if (window.fetch) {
+        const origFetch = window.fetch;
+        window.fetch = function () {
+            begin();
+            return origFetch.apply(this, arguments).finally(end);
+        };
+    }
+}
+"""
+
+
+def track_network(driver):
+    """Hook XHR/fetch on the current page so network_idle() can be evaluated."""
+    driver.execute_script(TRACK_NETWORK_JS)
+
+# ---------------- WAITS ----------------
+def until(driver, condition, timeout, name):
+    """WebDriverWait with a fast poll; records the real wait time under ``name``."""
+    start = time.perf_counter()
+    ok = False
+    try:
+        result = WebDriverWait(driver, timeout, poll_frequency=POLL_FREQUENCY).until(condition)
+        ok = True
+        return result
+    finally:
+        wait_stats.record(name, time.perf_counter() - start, ok)
+
+
+def until_js(driver, predicate, timeout, name):
+    """Block until the JS ``predicate`` holds, resolving on the DOM mutation that makes it true.
+
+    Only valid while the page stays put (no navigation). Returns False on timeout.
+    """
+    script = """
+        const done = arguments[arguments.length - 1];
+        const check = () => { try { return !!(%s); } catch (e) { return false; } };
+        if (check()) { done(true); return; }
+        let finished = false;
+        const observer = new MutationObserver(() => { if (check()) finish(true); });
+        const tick = setInterval(() => { if (check()) finish(true); }, %d);
+        const timer = setTimeout(() => finish(false), %d);
+        function finish(ok) {
+            if (finished) return;
+            finished = true;
+            observer.disconnect(); clearInterval(tick); clearTimeout(timer);
+            done(ok);
+        }
+        observer.observe(document, {subtree: true, childList: true, attributes: true, characterData: true});
+    """ % (predicate, JS_TICK_MS, int(timeout * 1000))
+    start = time.perf_counter()
+    ok = False
+    try:
+        driver.set_script_timeout(timeout + 5)
+        ok = bool(driver.execute_async_script(script))
+        return ok
+    finally:
+        wait_stats.record(name, time.perf_counter() - start, ok)
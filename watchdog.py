@@ -0,0 +1,349 @@
+"""Keeps track of every Chrome/chromedriver process tree we launch, so none outlive the run.
+
+``driver_pool.start_chrome`` registers each new driver here and the pool
+marks it busy/idle around every attempt. A background thread samples each
+session's RSS and CPU (chromedriver plus every Chrome process under it) and
+kills a session that stays busy past its deadline; the worker blocked on it
+then gets an error and the pool retires the driver. After ``quit()`` any
+process of the tree still alive is killed, and at exit or on SIGTERM/SIGHUP
+everything still tracked is reaped.
+
+    watchdog.install()            # in main(): reap on SIGTERM/SIGHUP as well as at exit
+    ...
+    logger.info(watchdog.summary())   # per-session peak memory and a CONCURRENCY estimate
+"""
+import atexit
+import logging
+import signal
+import threading
+import time
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# ============ CONFIGURABLE PARAMETERS ============
+SAMPLE_INTERVAL = 2.0  # Seconds between RSS/CPU samples of every tracked session
+SESSION_DEADLINE = 240  # Seconds a checked-out session may stay busy before its processes are killed
+MEMORY_BUDGET = 0.8  # Share of the host's RAM the sizing hint lets browser sessions use
+ORPHAN_MARKERS = (".org.chromium.Chromium.", ".com.google.Chrome.", "dayclose-cdp-")  # Temp profiles of automated Chrome
+HUNG = "hung"
+LEFTOVER = "leftover"
+
+# ---------------- PROCESS HELPERS ----------------
+def process_tree(pid):
+    """psutil.Process objects for ``pid`` and all its descendants (empty if it is gone)."""
+    try:
+        root = psutil.Process(pid)
+        return [root] + root.children(recursive=True)
+    except psutil.Error:
+        return []
+
+
+def kill_processes(processes):
+    """SIGKILL every process given (children first); returns how many were still alive."""
+    killed = 0
+    for proc in reversed(processes):
+        try:
+            proc.kill()
+            killed += 1
+        except psutil.Error:
+            pass
+    if processes:
+        psutil.wait_procs(processes, timeout=3)
+    return killed
+
+
+def kill_tree(pid):
+    """Kill ``pid`` and its descendants; returns how many processes were killed."""
+    return kill_processes(process_tree(pid))
+
+
+def driver_pid(driver):
+    """Pid of a local WebDriver's chromedriver, or None (remote driver, already stopped)."""
+    try:
+        return driver.service.process.pid
+    except AttributeError:
+        return None
+
+# ---------------- SESSIONS ----------------
+class Session:
+    """One tracked process tree: its pids, resource peaks and current owner."""
+
+    def __init__(self, pid, label):
+        self.pid = pid
+        self.label = label
+        self.started = time.time()
+        self.ended = None
+        self.pids = {pid}  # Every pid ever seen in the tree, for reaping after quit()
+        self.peak_rss = 0
+        self.cpu_seconds = 0.0
+        self.peak_cpu_percent = 0.0
+        self.samples = 0
+        self.checkouts = 0
+        self.owner = None
+        self.busy_since = None
+        self.killed = None  # HUNG / LEFTOVER when the watchdog had to kill processes
+        self._cpu = {}  # pid → last cpu seconds seen
+
+    def sample(self, interval):
+        """Refresh pids, RSS and CPU of the tree; False once the root process is gone."""
+        processes = process_tree(self.pid)
+        if not processes:
+            return False
+        rss = 0
+        cpu_delta = 0.0
+        for proc in processes:
+            try:
+                rss += proc.memory_info().rss
+                times = proc.cpu_times()
+            except psutil.Error:
+                continue
+            self.pids.add(proc.pid)
+            cpu = times.user + times.system
+            cpu_delta += cpu - self._cpu.get(proc.pid, cpu if self.samples else 0.0)
+            self._cpu[proc.pid] = cpu
+        self.samples += 1
+        self.peak_rss = max(self.peak_rss, rss)
+        self.cpu_seconds = sum(self._cpu.values())
+        if interval:
+            self.peak_cpu_percent = max(self.peak_cpu_percent, cpu_delta / interval * 100)
+        return True
+
+    def to_dict(self):
+        lifetime = (self.ended or time.time()) - self.started
+        return {
+            "pid": self.pid,
+            "label": self.label,
+            "lifetime": round(lifetime, 1),
+            "checkouts": self.checkouts,
+            "peak_rss_mb": round(self.peak_rss / 1024 / 1024, 1),
+            "cpu_seconds": round(self.cpu_seconds, 2),
+            "avg_cpu_percent": round(self.cpu_seconds / lifetime * 100, 1) if lifetime else 0.0,
+            "peak_cpu_percent": round(self.peak_cpu_percent, 1),
+            "killed": self.killed,
+        }
+
+# ---------------- WATCHDOG ----------------
+class BrowserWatchdog:
+    """Registry of live browser sessions with a sampling/killing thread and exit-time reaping."""
+
+    def __init__(self, interval=SAMPLE_INTERVAL, deadline=SESSION_DEADLINE):
+        self.interval = interval
+        self.deadline = deadline
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.sessions = {}  # root pid → Session (live)
+        self.finished = []  # Sessions that were quit or killed
+        self.hung_killed = 0
+        self.leftovers_reaped = 0
+        self.orphans_reaped = 0
+
+    # ---------------- REGISTRATION ----------------
+    def track(self, pid, label="chrome"):
+        """Start watching the process tree under ``pid``."""
+        if pid is None:
+            return None
+        session = Session(pid, label)
+        session.sample(0)
+        with self._lock:
+            self.sessions[pid] = session
+        self.start()
+        return session
+
+    def track_driver(self, driver, label="chrome"):
+        return self.track(driver_pid(driver), label)
+
+    def busy(self, driver, owner=None):
+        """The driver was checked out (for ``owner``); its deadline clock starts."""
+        with self._lock:
+            session = self.sessions.get(driver_pid(driver))
+            if session is not None:
+                session.busy_since = time.monotonic()
+                session.owner = owner
+                session.checkouts += 1
+
+    def idle(self, driver):
+        with self._lock:
+            session = self.sessions.get(driver_pid(driver))
+            if session is not None:
+                session.busy_since = None
+                session.owner = None
+
+    def killed(self, driver):
+        """Why the watchdog killed this driver's processes (``HUNG``), or None."""
+        pid = driver_pid(driver)
+        with self._lock:
+            session = self.sessions.get(pid) or next((s for s in self.finished if s.pid == pid), None)
+        return session.killed if session is not None else None
+
+    def release(self, pid):
+        """The session was quit: kill whatever survived of its tree and stop tracking it."""
+        with self._lock:
+            session = self.sessions.pop(pid, None)
+        if session is None:
+            return
+        session.ended = time.time()
+        survivors = []
+        for child_pid in session.pids:
+            try:
+                proc = psutil.Process(child_pid)
+                # A recycled pid would have a later create_time than the session itself
+                if proc.create_time() <= session.started + 1:
+                    survivors.append(proc)
+            except psutil.Error:
+                pass
+        reaped = kill_processes(survivors)
+        if reaped:
+            session.killed = session.killed or LEFTOVER
+            logger.warning(f"🐕 Reaped {reaped} leftover processes of {session.label} (pid {pid}) after quit")
+            with self._lock:
+                self.leftovers_reaped += reaped
+        with self._lock:
+            self.finished.append(session)
+
+    def release_driver(self, driver):
+        self.release(driver_pid(driver))
+
+    # ---------------- SAMPLING / KILLING ----------------
+    def start(self):
+        """Start the sampling thread (idempotent)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="browser-watchdog", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def check(self):
+        """One pass: sample every session and kill the ones busy past the deadline."""
+        with self._lock:
+            sessions = list(self.sessions.values())
+        now = time.monotonic()
+        for session in sessions:
+            if not session.sample(self.interval):
+                continue  # Quit in the meantime; release() will book it
+            if self.deadline and session.busy_since is not None and now - session.busy_since > self.deadline:
+                logger.error(f"🐕 {session.label} (pid {session.pid}) busy for {now - session.busy_since:.0f}s "
+                             f"with user {session.owner}; killing its {len(session.pids)} processes")
+                session.killed = HUNG
+                session.busy_since = None
+                kill_tree(session.pid)
+                with self._lock:
+                    self.hung_killed += 1
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+
+    # ---------------- REAPING ----------------
+    def reap(self):
+        """Kill every process tree still tracked (exit, signals); returns how many processes died."""
+        self.stop()
+        with self._lock:
+            pids = list(self.sessions)
+        killed = 0
+        for pid in pids:
+            killed += kill_tree(pid)
+            self.release(pid)
+        if killed:
+            logger.warning(f"🐕 Reaped {killed} browser processes still running at shutdown")
+        return killed
+
+    def reap_orphans(self, since=None):
+        """Kill automated Chrome/chromedriver nobody owns any more: ours, parentless, on a temp profile.
+
+        With ``since`` (a ``time.time()``) only processes started after it, e.g. by a launch that failed.
+        """
+        me = psutil.Process().username()
+        with self._lock:
+            tracked = {pid for session in self.sessions.values() for pid in session.pids}
+        victims = []
+        for proc in psutil.process_iter(["pid", "ppid", "name", "username", "cmdline", "create_time"]):
+            info = proc.info
+            name = (info["name"] or "").lower()
+            if info["pid"] in tracked or info["username"] != me or "chrome" not in name:
+                continue
+            if since is not None and (info["create_time"] or 0) < since - 1:
+                continue
+            try:
+                orphaned = info["ppid"] in (0, 1) or not psutil.pid_exists(info["ppid"])
+            except psutil.Error:
+                continue
+            cmdline = " ".join(info["cmdline"] or [])
+            automated = "chromedriver" in name or (
+                "--remote-debugging-port" in cmdline and any(marker in cmdline for marker in ORPHAN_MARKERS))
+            if orphaned and automated:
+                victims.extend(process_tree(info["pid"]))
+        killed = kill_processes(victims)
+        if killed:
+            logger.warning(f"🐕 Reaped {killed} orphaned Chrome/chromedriver processes")
+        with self._lock:
+            self.orphans_reaped += killed
+        return killed
+
+    def install(self, reap_orphans=True):
+        """Reap on SIGTERM/SIGHUP (must run in the main thread) and orphans of earlier runs now."""
+        def handle(signum, frame):
+            logger.warning(f"🐕 Signal {signum}: reaping browser processes")
+            self.reap()
+            raise SystemExit(128 + signum)
+
+        for name in ("SIGTERM", "SIGHUP"):
+            if hasattr(signal, name):
+                signal.signal(getattr(signal, name), handle)
+        if reap_orphans:
+            self.reap_orphans()
+
+    # ---------------- REPORTING ----------------
+    def to_dict(self):
+        with self._lock:
+            sessions = [s.to_dict() for s in self.finished + list(self.sessions.values()) if s.samples]
+        peaks = sorted(s["peak_rss_mb"] for s in sessions)
+        p95 = peaks[max(0, -(-95 * len(peaks) // 100) - 1)] if peaks else 0.0
+        report = {
+            "sessions": len(sessions),
+            "avg_peak_rss_mb": round(sum(peaks) / len(peaks), 1) if peaks else 0.0,
+            "p95_peak_rss_mb": p95,
+            "max_peak_rss_mb": peaks[-1] if peaks else 0.0,
+            "avg_cpu_percent": round(sum(s["avg_cpu_percent"] for s in sessions) / len(sessions), 1) if sessions else 0.0,
+            "hung_killed": self.hung_killed,
+            "leftovers_reaped": self.leftovers_reaped,
+            "orphans_reaped": self.orphans_reaped,
+            "suggested_concurrency": None,
+            "per_session": sessions,
+        }
+        if p95:
+            budget = psutil.virtual_memory().total * MEMORY_BUDGET / 1024 / 1024
+            report["host_memory_mb"] = round(psutil.virtual_memory().total / 1024 / 1024)
+            report["suggested_concurrency"] = int(budget // p95)
+        return report
+
+    def reset(self):
+        """Forget finished sessions and counters (live sessions stay tracked)."""
+        with self._lock:
+            self.finished = []
+            self.hung_killed = self.leftovers_reaped = self.orphans_reaped = 0
+
+    def summary(self):
+        r = self.to_dict()
+        if not r["sessions"]:
+            return "🐕 Watchdog: no browser sessions sampled"
+        lines = [f"🐕 Watchdog: {r['sessions']} sessions | peak RSS per session avg {r['avg_peak_rss_mb']:.0f} MB, "
+                 f"p95 {r['p95_peak_rss_mb']:.0f} MB, max {r['max_peak_rss_mb']:.0f} MB | "
+                 f"CPU avg {r['avg_cpu_percent']:.0f}% | hung killed {r['hung_killed']} | "
+                 f"leftovers reaped {r['leftovers_reaped']} | orphans reaped {r['orphans_reaped']}"]
+        if r["suggested_concurrency"] is not None:
+            lines.append(f"📐 Sizing: {r['host_memory_mb'] / 1024:.1f} GB RAM × {MEMORY_BUDGET:.0%} / "
+                         f"p95 {r['p95_peak_rss_mb']:.0f} MB per session → CONCURRENCY up to "
+                         f"~{r['suggested_concurrency']} on this host")
+        return "\n".join(lines)
+
+watchdog = BrowserWatchdog()
+atexit.register(watchdog.reap)